@@ -41,6 +41,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'flight_management.metrics.RequestMetricsMiddleware',
+    'flight_management.replicas.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -56,7 +58,9 @@ ROOT_URLCONF = 'aeropulse.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates with render timing for the request metrics
+        'BACKEND': 'flight_management.metrics.InstrumentedDjangoTemplates',
+        'NAME': 'django',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -88,6 +92,69 @@ DATABASES = {
     }
 }
 
+# Read replicas: add their aliases to DATABASES and list them here, e.g.
+#   DATABASES['replica'] = {**DATABASES['default'], 'HOST': 'replica-1.internal'}
+#   DATABASE_REPLICAS = ['replica']
+# aeropulse/settings_local_replicas.py does this with two SQLite files.
+DATABASE_ROUTERS = ['flight_management.replicas.ReplicaRouter']
+DATABASE_REPLICAS = []
+
+# Views whose GET requests may read from a replica, with the replication lag each
+# tolerates: a client that wrote less than that many seconds ago reads from the primary.
+REPLICA_READ_VIEWS = {
+    'search_results': 5,
+    'explorer_results': 5,
+    'price_map_api': 5,
+    'flight_detail': 30,
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Every worker must see the same caches. 'default' holds the notification summaries
+# and photo URLs, and may evict them; 'coordination' tells each process when its
+# in-memory airports, airlines, timetable and account filter are out of date, and
+# must never evict a live key (see flight_management/coordination.py). The default
+# directories are shared by the workers of one machine; set REDIS_URL (needs the
+# redis package) when they run on several, with maxmemory-policy noeviction or
+# volatile-* on that server.
+
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        },
+        'coordination': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+            'KEY_PREFIX': 'coordination',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(BASE_DIR, 'var', 'cache'),
+            'OPTIONS': {'MAX_ENTRIES': 50000},
+        },
+        'coordination': {
+            'BACKEND': 'flight_management.coordination.PersistentFileBasedCache',
+            'LOCATION': os.path.join(BASE_DIR, 'var', 'coordination'),
+            'OPTIONS': {'MAX_ENTRIES': 50000},
+        },
+    }
+
+
+# Request metrics (flight_management/metrics.py)
+# Prometheus scrapes /metrics with "Authorization: Bearer <METRICS_TOKEN>"; without a
+# token the endpoint refuses every request. Each worker writes its counters to
+# METRICS_DIR, which must be shared by all of them; scrapes fold exited workers' files
+# into one, keeping their counts.
+
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(BASE_DIR, 'var', 'metrics'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
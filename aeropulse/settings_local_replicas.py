@@ -0,0 +1,19 @@
+# aeropulse/settings_local_replicas.py
+# Two SQLite files standing in for a primary and one read replica, to try the replica
+# router without MySQL. Nothing replicates between them: run migrate for both aliases
+# (`migrate --database=replica`) and load the same data into each, or see rows go
+# missing exactly where reads are routed to the replica.
+#
+#   python manage.py runserver --settings=aeropulse.settings_local_replicas
+#   python manage.py test flight_management.tests.ReplicaRoutingTests --settings=aeropulse.settings_local_replicas
+#
+# (The rest of the suite expects every read on 'default'; run it with the usual settings,
+# where the replica tests are skipped.)
+
+from .settings import *  # noqa: F401,F403
+
+DATABASES = {
+    'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / 'primary.sqlite3'},
+    'replica': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / 'replica.sqlite3'},
+}
+DATABASE_REPLICAS = ['replica']
@@ -1,33 +1,97 @@
 # flight_management/admin.py
+from django.conf import settings
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from .confirmation import confirm_bookings
 from .models import (
     Airport, Airline, Flight, PassengerProfile,
     Booking, Payment, Ticket, Invoice, Review, Notification, Cancellation
 )
 
+# === CHANGELIST PERFORMANCE ===
+# Unfiltered changelists of tables with more rows than this show the database's own
+# row estimate instead of running COUNT(*), which reads the whole table.
+ADMIN_EXACT_COUNT_LIMIT = getattr(settings, 'ADMIN_EXACT_COUNT_LIMIT', 10_000)
+
+
+def estimated_row_count(model, using):
+    """The planner's row count for model's table, or None where the backend keeps none (SQLite)."""
+    connection = connections[using]
+    table = model._meta.db_table
+    if connection.vendor == 'postgresql':
+        sql, params = 'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [connection.ops.quote_name(table)]
+    elif connection.vendor == 'mysql':
+        sql = 'SELECT table_rows FROM information_schema.tables WHERE table_schema = DATABASE() AND table_name = %s'
+        params = [table]
+    else:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+    # PostgreSQL reports -1 for a table that was never vacuumed or analyzed.
+    return row[0] if row and row[0] is not None and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > ADMIN_EXACT_COUNT_LIMIT:
+                return estimate
+        return super().count
+
+
+class PerformanceAdmin(admin.ModelAdmin):
+    # Filtered pages still count their matches exactly, but skip the second, unfiltered COUNT(*).
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class AirportAdmin(admin.ModelAdmin):
+    search_fields = ('airport_code', 'airport_name', 'location')
+
+
+class AirlineAdmin(admin.ModelAdmin):
+    search_fields = ('airline_code', 'airline_name')
+
 # Customizing how the Flight model is displayed
-class FlightAdmin(admin.ModelAdmin):
+class FlightAdmin(PerformanceAdmin):
     # CORRECTED: Uses the new class-based field names
     list_display = (
         'flight_id', 'airline', 'departure_airport', 'destination_airport',
         'departure_time', 'economy_price', 'economy_seats', 'business_price', 'business_seats'
     )
+    list_select_related = ('airline', 'departure_airport', 'destination_airport')
+    autocomplete_fields = ('airline', 'departure_airport', 'destination_airport')
     list_filter = ('airline', 'departure_airport', 'destination_airport')
     search_fields = ('flight_id', 'airline__airline_name')
 
 # Customizing the Booking model display
-class BookingAdmin(admin.ModelAdmin):
+class BookingAdmin(PerformanceAdmin):
     # CORRECTED: Uses the new passenger and class detail names
     list_display = (
         'booking_id', 'user', 'flight', 'booking_date', 'status',
         'seat_class', 'num_adults', 'num_children', 'total_fare'
     )
+    # The flight column is Flight.__str__, which reads its airline and both airports.
+    list_select_related = ('user', 'flight__airline', 'flight__departure_airport', 'flight__destination_airport')
+    autocomplete_fields = ('user', 'flight')
     list_filter = ('status', 'seat_class', 'flight__airline')
     search_fields = ('booking_id', 'user__username', 'flight__flight_id')
+    actions = ['confirm_selected']
+
+    @admin.action(description='Confirm selected pending bookings and issue their tickets')
+    def confirm_selected(self, request, queryset):
+        confirmed = confirm_bookings(queryset.values_list('pk', flat=True))
+        self.message_user(request, f'Confirmed {len(confirmed)} booking(s).')
 
 # Registering models with their custom admin classes
-admin.site.register(Airport)
-admin.site.register(Airline)
+admin.site.register(Airport, AirportAdmin)
+admin.site.register(Airline, AirlineAdmin)
 admin.site.register(Flight, FlightAdmin)
 admin.site.register(PassengerProfile)
 admin.site.register(Booking, BookingAdmin)
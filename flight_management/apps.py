@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class FlightManagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'flight_management'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
@@ -0,0 +1,206 @@
+# flight_management/availability.py
+# Username and email availability for registration. Every existing username and email
+# sits in a Bloom filter held by each process: a miss means no account has the value,
+# answered without a query, and only a possible hit (a taken value, or the rare false
+# positive) is confirmed against the User table. New accounts are published to the
+# shared cache as numbered entries, as timetable.py does, and every check first
+# replays the entries it has not seen; until it has caught up, checks go to the
+# database. The unique constraint on username stays the final word (see
+# register_step4_photo).
+
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+
+from .coordination import cache
+from .replicas import primary
+
+# How long a published account stays readable, and how many a worker replays before rebuilding instead.
+ACCOUNT_CHANGE_SECONDS = getattr(settings, 'ACCOUNT_CHANGE_SECONDS', 10 * 60)
+ACCOUNT_MAX_REPLAY = 1000
+# An entry number handed out but not yet written is waited for this long before it counts as lost.
+MISSING_ACCOUNT_SECONDS = 5
+
+CHANGES_KEY = 'accounts:changes'
+
+
+def _change_key(number):
+    return f'accounts:change:{number}'
+
+
+class BloomFilter:
+    """k bit positions per item, derived from one BLAKE2b digest by double hashing."""
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = max(capacity, 1)
+        self.size = max(64, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        positions = self._positions(item)
+        if self._all_set(positions):
+            # Already present (or indistinguishable from it): don't count it twice.
+            return
+        for position in positions:
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def _all_set(self, positions):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in positions)
+
+    def __contains__(self, item):
+        return self._all_set(self._positions(item))
+
+
+def normalize_email(email):
+    return (email or '').strip().lower()
+
+
+class AccountIndex:
+    """
+    Bloom filters of every username and email, built in one streamed query on first
+    use and extended by publish(), which the User signal in signals.py calls for
+    every process. Filters never forget, so
+    renamed or deleted accounts only cost an extra query; once more accounts were
+    added than the filters were sized for, they are rebuilt larger on the next check.
+    """
+
+    error_rate = 0.01
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._usernames = None
+        self._emails = None
+        self._sync_lock = threading.Lock()
+        # Accounts created while a rebuild streams the table, replayed into the new filters.
+        self._pending = None
+        # The last published entry the filters hold, and an entry found missing: (number, first seen).
+        self._seen = 0
+        self._missing = None
+
+    def rebuild(self):
+        with self._lock:
+            self._pending = []
+        # Read before the rows, so an account published during the load is replayed as well.
+        seen = cache.get(CHANGES_KEY, 0)
+        try:
+            with primary():
+                # Twice the current size leaves room for sign-ups before a rebuild is due.
+                capacity = max(1024, 2 * User.objects.count())
+                usernames, emails = BloomFilter(capacity, self.error_rate), BloomFilter(capacity, self.error_rate)
+                for username, email in User.objects.values_list('username', 'email').iterator(chunk_size=10000):
+                    usernames.add(username)
+                    if email:
+                        emails.add(normalize_email(email))
+        finally:
+            with self._lock:
+                pending, self._pending = self._pending, None
+        with self._lock:
+            for username, email in pending:
+                usernames.add(username)
+                if email:
+                    emails.add(email)
+            self._usernames, self._emails = usernames, emails
+            self._seen, self._missing = seen, None
+
+    def ensure_loaded(self):
+        if self._usernames is None:
+            with self._build_lock:
+                if self._usernames is None:
+                    self.rebuild()
+
+    def add(self, username, email):
+        email = normalize_email(email)
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((username, email))
+            if self._usernames is None:
+                return
+            self._usernames.add(username)
+            if email:
+                self._emails.add(email)
+            if self._usernames.count > self._usernames.capacity:
+                self._usernames = self._emails = None
+
+    def invalidate(self):
+        with self._lock:
+            self._usernames = self._emails = None
+
+    def publish(self, username, email):
+        """Add a committed account here and tell every other process about it."""
+        self.add(username, email)
+        while True:
+            try:
+                number = cache.incr(CHANGES_KEY)
+            except ValueError:
+                cache.add(CHANGES_KEY, 0, None)
+                continue
+            # A cache without atomic increments (the file cache) can hand two writers one number.
+            if cache.add(_change_key(number), (username, normalize_email(email)), ACCOUNT_CHANGE_SECONDS):
+                return number
+
+    def sync(self):
+        """Add the accounts published since the last sync. True if the filters are now current."""
+        if self._usernames is None or not self._sync_lock.acquire(blocking=False):
+            # Being rebuilt, or another thread is catching up: this answer comes from the database.
+            return False
+        try:
+            latest = cache.get(CHANGES_KEY, 0)
+            if latest == self._seen:
+                return True
+            if latest < self._seen or latest - self._seen > ACCOUNT_MAX_REPLAY:
+                # The counter was lost from the cache, or there is too much to replay.
+                self.invalidate()
+                return False
+            numbers = range(self._seen + 1, latest + 1)
+            found = cache.get_many([_change_key(number) for number in numbers])
+            for number in numbers:
+                change = found.get(_change_key(number))
+                if change is None:
+                    # Not written yet, or lost: wait a little, then stop trusting the log.
+                    since = self._missing[1] if self._missing and self._missing[0] == number else time.monotonic()
+                    if time.monotonic() - since > MISSING_ACCOUNT_SECONDS:
+                        self.invalidate()
+                    else:
+                        self._missing = (number, since)
+                    return False
+                self.add(*change)
+                self._seen = number
+            self._missing = None
+            return True
+        finally:
+            self._sync_lock.release()
+
+    def _absent(self, attribute, value):
+        # A definite "no account has this": the filters are current and do not hold the value.
+        self.ensure_loaded()
+        current = self.sync()
+        bloom = getattr(self, attribute)
+        return current and bloom is not None and value not in bloom
+
+    def username_taken(self, username):
+        username = User.normalize_username(username)
+        if self._absent('_usernames', username):
+            return False
+        return User.objects.filter(username=username).exists()
+
+    def email_taken(self, email):
+        email = normalize_email(email)
+        if self._absent('_emails', email):
+            return False
+        return User.objects.filter(email__iexact=email).exists()
+
+
+accounts = AccountIndex()
@@ -0,0 +1,317 @@
+# flight_management/bench.py
+# Shared helpers for the bench_* management commands: synthetic data, timing and
+# the end-to-end endpoint suite.
+
+import random
+import re
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.conf import settings
+from django.db import connection
+from django.db.models import Max
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Airline, Airport, Booking, Flight, Invoice, PassengerProfile, Payment, Review, Ticket
+from .ratings import rebuild_ratings
+from .reference import reference
+from .summaries import refresh_booking_summaries
+from .timetable import timetable
+
+BENCH_PASSWORD = 'bench-password'
+
+
+def ensure_reference_data(num_airports=40, num_airlines=10):
+    """Return (airport_codes, airline_codes), creating synthetic rows if the tables are short."""
+    airports = list(Airport.objects.values_list('airport_code', flat=True))
+    if len(airports) < num_airports:
+        Airport.objects.bulk_create([
+            Airport(airport_code=f'Z{i:02d}', airport_name=f'Bench Airport {i}', location=f'Bench City {i}, Benchland')
+            for i in range(num_airports - len(airports))
+        ], ignore_conflicts=True)
+        airports = list(Airport.objects.values_list('airport_code', flat=True))
+    airlines = list(Airline.objects.values_list('airline_code', flat=True))
+    if len(airlines) < num_airlines:
+        Airline.objects.bulk_create([
+            Airline(airline_code=f'ZB{i:02d}', airline_name=f'Bench Air {i}')
+            for i in range(num_airlines - len(airlines))
+        ], ignore_conflicts=True)
+        airlines = list(Airline.objects.values_list('airline_code', flat=True))
+    # bulk_create() sends no signals.
+    reference.bump()
+    return airports, airlines
+
+
+@contextmanager
+def throwaway_database():
+    """Run the block against a fresh test database, as the test runner does, and drop it after."""
+    settings.DEBUG = False
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def seed_flights(count, airports, airlines, days=30, seed=42, batch_size=5000):
+    rng = random.Random(seed)
+    start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    batch = []
+    for _ in range(count):
+        origin, destination = rng.sample(airports, 2)
+        departure = start + timedelta(days=rng.randrange(days), minutes=5 * rng.randrange(288))
+        batch.append(Flight(
+            airline_id=rng.choice(airlines),
+            departure_airport_id=origin,
+            destination_airport_id=destination,
+            departure_time=departure,
+            arrival_time=departure + timedelta(minutes=rng.randrange(60, 900)),
+            economy_price=Decimal(rng.randrange(8000, 120000)) / 100,
+            economy_seats=rng.randrange(0, 200),
+            business_price=Decimal(rng.randrange(60000, 500000)) / 100,
+            business_seats=rng.randrange(0, 30),
+        ))
+        if len(batch) >= batch_size:
+            Flight.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Flight.objects.bulk_create(batch)
+
+
+def time_calls(fn, args_list):
+    """Call fn once per args tuple and return the per-call latencies in milliseconds."""
+    samples = []
+    for args in args_list:
+        started = time.perf_counter()
+        fn(*args)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def count_queries(using=connection):
+    """Count executed queries without relying on the (capped) debug query log."""
+    counter = QueryCounter()
+    with using.execute_wrapper(counter):
+        yield counter
+
+
+# --- Seeding for bench_endpoints ---
+
+def _created_since(model, last_pk):
+    # bulk_create() only returns primary keys on some backends; read them back instead.
+    return list(model.objects.filter(pk__gt=last_pk or 0).order_by('pk').values_list('pk', flat=True))
+
+
+def seed_users(count, batch_size=5000):
+    """Create count users with profiles, all sharing BENCH_PASSWORD. Returns their ids."""
+    password = make_password(BENCH_PASSWORD)
+    last_pk = User.objects.aggregate(last=Max('pk'))['last']
+    User.objects.bulk_create([
+        User(username=f'bench-{last_pk or 0}-{i}', email=f'bench{i}@example.com', password=password)
+        for i in range(count)
+    ], batch_size=batch_size)
+    user_ids = _created_since(User, last_pk)
+    PassengerProfile.objects.bulk_create([
+        PassengerProfile(user_id=user_id, phone_number='0000000000', address='Bench Street')
+        for user_id in user_ids
+    ], batch_size=batch_size)
+    return user_ids
+
+
+def seed_bookings(count, user_ids, flight_ids, seed=42, batch_size=5000):
+    """
+    Create count bookings spread over user_ids; about three quarters are paid and
+    confirmed with their Payment, Ticket and Invoice. Summaries are refreshed at the end.
+    """
+    rng = random.Random(seed)
+    last_booking = Booking.objects.aggregate(last=Max('pk'))['last']
+    last_payment = Payment.objects.aggregate(last=Max('pk'))['last']
+    Booking.objects.bulk_create([
+        Booking(
+            user_id=rng.choice(user_ids), flight_id=rng.choice(flight_ids),
+            status=rng.choice(('CONFIRMED', 'CONFIRMED', 'CONFIRMED', 'CANCELLED')),
+            seat_class=rng.choice(('ECONOMY', 'ECONOMY', 'BUSINESS')),
+            num_adults=rng.randrange(1, 4), num_children=rng.randrange(0, 2),
+            total_fare=Decimal(rng.randrange(10000, 300000)) / 100,
+        )
+        for _ in range(count)
+    ], batch_size=batch_size)
+    confirmed = list(Booking.objects.filter(pk__gt=last_booking or 0, status='CONFIRMED').values_list('pk', 'total_fare'))
+    Payment.objects.bulk_create([
+        Payment(booking_id=booking_id, amount=fare, method='Credit Card (Simulated)') for booking_id, fare in confirmed
+    ], batch_size=batch_size)
+    Ticket.objects.bulk_create([Ticket(booking_id=booking_id) for booking_id, _ in confirmed], batch_size=batch_size)
+    Invoice.objects.bulk_create([
+        Invoice(payment_id=payment_id) for payment_id in _created_since(Payment, last_payment)
+    ], batch_size=batch_size)
+    booking_ids = _created_since(Booking, last_booking)
+    for start in range(0, len(booking_ids), batch_size):
+        refresh_booking_summaries(booking_ids[start:start + batch_size])
+    return booking_ids
+
+
+def seed_reviews(count, user_ids, flight_ids, seed=42, batch_size=5000):
+    rng = random.Random(seed)
+    Review.objects.bulk_create([
+        Review(user_id=rng.choice(user_ids), flight_id=rng.choice(flight_ids), rating=rng.randrange(1, 6),
+               comment='Seeded by bench_endpoints.')
+        for _ in range(count)
+    ], batch_size=batch_size)
+    # bulk_create() sends no signals.
+    rebuild_ratings()
+
+
+# --- End-to-end endpoint runs ---
+
+def endpoint_stats(samples, queries, statuses):
+    total_seconds = sum(samples) / 1000
+    return {
+        'requests': len(samples),
+        'p50_ms': round(percentile(samples, 50), 3),
+        'p95_ms': round(percentile(samples, 95), 3),
+        'p99_ms': round(percentile(samples, 99), 3),
+        'mean_ms': round(sum(samples) / len(samples), 3) if samples else 0.0,
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else 0.0,
+        'max_queries': max(queries, default=0),
+        'throughput_rps': round(len(samples) / total_seconds, 1) if total_seconds else 0.0,
+        'statuses': {str(code): statuses.count(code) for code in sorted(set(statuses))},
+    }
+
+
+class EndpointSuite:
+    """
+    Drive the real views through the test client, one request at a time, and
+    record latency and query counts per endpoint. Booking and payment run as a
+    pair: each measured payment pays the booking the preceding request created.
+    """
+
+    endpoints = ('search_results', 'book_flight', 'payment', 'dashboard', 'price_map_api')
+
+    def __init__(self, user_ids, seed=42, clients=20):
+        self.rng = random.Random(seed)
+        self.airports = list(Airport.objects.values_list('airport_code', flat=True))
+        self.bookable = list(Flight.objects.filter(
+            economy_seats__gte=20, departure_time__gt=timezone.now(),
+        ).values_list('pk', flat=True)) or list(Flight.objects.values_list('pk', flat=True))
+        self.clients = []
+        for user in User.objects.filter(pk__in=self.rng.sample(user_ids, min(clients, len(user_ids)))):
+            client = Client()
+            client.force_login(user)
+            self.clients.append(client)
+        self.pending = []
+
+    def request(self, name):
+        client = self.rng.choice(self.clients)
+        if name == 'search_results':
+            origin, destination = self.rng.sample(self.airports, 2)
+            return client.get(reverse('search_results'), {
+                'departure_airport': origin, 'destination_airport': destination, 'seat_class': 'ECONOMY',
+                'num_adults': 1, 'num_children': 0, 'num_infants': 0,
+            })
+        if name == 'book_flight':
+            url = reverse('book_flight', args=[self.rng.choice(self.bookable)])
+            response = client.post(f'{url}?adults=1&children=0&infants=0&class=ECONOMY')
+            match = re.search(r'/payment/(\d+)/', response.get('Location', ''))
+            if match:
+                self.pending.append((client, int(match.group(1))))
+            return response
+        if name == 'payment':
+            if self.pending:
+                client, booking_id = self.pending.pop()
+                return client.post(reverse('payment', args=[booking_id]))
+            return None
+        if name == 'dashboard':
+            return client.get(reverse('dashboard'))
+        if name == 'price_map_api':
+            return client.get(reverse('price_map_api'), {'origin': self.rng.choice(self.airports)})
+        raise ValueError(f'Unknown endpoint {name}')
+
+    def measure(self, name, requests):
+        samples, queries, statuses = [], [], []
+        for _ in range(requests):
+            with count_queries() as counter:
+                started = time.perf_counter()
+                response = self.request(name)
+                elapsed = (time.perf_counter() - started) * 1000
+            if response is None:
+                continue
+            samples.append(elapsed)
+            queries.append(counter.count)
+            statuses.append(response.status_code)
+        return endpoint_stats(samples, queries, statuses)
+
+    def run(self, requests=200, warmup=5):
+        # Warm the timetable, fare matrix and template caches outside the measurements.
+        for name in self.endpoints:
+            for _ in range(warmup):
+                self.request(name)
+        results = {}
+        for name in self.endpoints:
+            if name == 'payment':
+                continue
+            if name == 'book_flight':
+                self.pending = []
+                results['book_flight'] = self.measure('book_flight', requests)
+                results['payment'] = self.measure('payment', requests)
+            else:
+                results[name] = self.measure(name, requests)
+        return results
+
+
+def run_endpoint_suite(flights=10_000, users=200, bookings=2_000, reviews=2_000, requests=200,
+                       warmup=5, seed=42, stdout=None):
+    """Seed the current database, drive every endpoint and return the results as a dict."""
+    def log(message):
+        if stdout is not None:
+            stdout.write(message)
+
+    started = time.perf_counter()
+    airports, airlines = ensure_reference_data()
+    seed_flights(flights, airports, airlines, seed=seed)
+    flight_ids = list(Flight.objects.values_list('pk', flat=True))
+    user_ids = seed_users(users)
+    seed_bookings(bookings, user_ids, flight_ids, seed=seed)
+    seed_reviews(reviews, user_ids, flight_ids, seed=seed)
+    seed_seconds = time.perf_counter() - started
+    log(f'Seeded {flights} flights, {users} users, {bookings} bookings, {reviews} reviews in {seed_seconds:.1f}s')
+
+    timetable.invalidate()
+    suite = EndpointSuite(user_ids, seed=seed)
+    return {
+        'volumes': {
+            'airports': len(airports), 'airlines': len(airlines), 'flights': flights,
+            'users': users, 'bookings': bookings, 'reviews': reviews,
+        },
+        'requests_per_endpoint': requests,
+        'seed': seed,
+        'seed_seconds': round(seed_seconds, 2),
+        'endpoints': suite.run(requests, warmup),
+    }
@@ -0,0 +1,17 @@
+# flight_management/bulk.py
+
+from django.db import connections, router
+
+
+def bulk_upsert(model, objs, unique_fields, update_fields, batch_size=None):
+    """
+    INSERT ... ON CONFLICT DO UPDATE through bulk_create(). MySQL's ON DUPLICATE KEY
+    UPDATE can't name the conflict target, so unique_fields is only passed to
+    backends that accept it.
+    """
+    features = connections[router.db_for_write(model)].features
+    if not features.supports_update_conflicts_with_target:
+        unique_fields = None
+    return model.objects.bulk_create(
+        objs, batch_size=batch_size, update_conflicts=True, unique_fields=unique_fields, update_fields=update_fields,
+    )
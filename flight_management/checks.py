@@ -0,0 +1,51 @@
+# flight_management/checks.py
+# Airports, airlines and the timetable are held in memory by every worker, which
+# learn of changes made by the others through the coordination cache; notification
+# summaries are cached in the default one. A cache private to each process leaves
+# the other workers stale, and a coordination cache that culls live keys at random
+# loses their change logs, so both are flagged at startup.
+
+from django.conf import settings
+from django.core import checks
+
+from .coordination import COORDINATION_CACHE_ALIAS
+
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+# Backends that drop live keys at random once full.
+CULLING_CACHES = {
+    'django.core.cache.backends.filebased.FileBasedCache',
+    'django.core.cache.backends.db.DatabaseCache',
+}
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    errors = []
+    for alias in ('default', COORDINATION_CACHE_ALIAS):
+        backend = settings.CACHES.get(alias, {}).get('BACKEND')
+        if backend in PROCESS_LOCAL_CACHES:
+            errors.append(checks.Warning(
+                f'The {alias} cache ({backend}) is not shared between processes.',
+                hint='Other workers will show stale timetables, airports, airlines and notification counts. Configure '
+                     'a shared CACHES backend, or silence flight_management.W001 if only one process serves requests.',
+                id='flight_management.W001',
+            ))
+    coordination = settings.CACHES.get(COORDINATION_CACHE_ALIAS)
+    if coordination is None:
+        errors.append(checks.Error(
+            f'CACHES has no {COORDINATION_CACHE_ALIAS!r} alias.',
+            hint='Add one whose backend never evicts live keys, e.g. '
+                 'flight_management.coordination.PersistentFileBasedCache.',
+            id='flight_management.E001',
+        ))
+    elif coordination.get('BACKEND') in CULLING_CACHES:
+        errors.append(checks.Warning(
+            f'The {COORDINATION_CACHE_ALIAS} cache ({coordination["BACKEND"]}) culls live keys when full.',
+            hint='Workers would lose the change logs they sync through. Use '
+                 'flight_management.coordination.PersistentFileBasedCache or Redis.',
+            id='flight_management.W002',
+        ))
+    return errors
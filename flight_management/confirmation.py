@@ -0,0 +1,75 @@
+# flight_management/confirmation.py
+# Turning a held (PENDING) booking into a paid one: status, Payment, Ticket and
+# Invoice are written in a single transaction, so a booking is never left half
+# confirmed. An idempotency key on the Payment makes client retries no-ops.
+
+from django.db import IntegrityError, connections, router, transaction
+
+from .holds import hold_cutoff
+from .models import Booking, Invoice, Payment, Ticket
+from .summaries import schedule_summary_refresh
+
+PAYMENT_METHOD = 'Credit Card (Simulated)'
+
+
+def _payable(booking_ids):
+    return Booking.objects.filter(pk__in=booking_ids, status='PENDING', booking_date__gt=hold_cutoff())
+
+
+def confirm_booking(booking, idempotency_key=None, method=PAYMENT_METHOD):
+    """
+    Confirm one booking: a conditional UPDATE plus three INSERTs in one transaction.
+    Returns (payment, created). Replaying the idempotency key of a confirmation that
+    already went through returns its payment with created=False; a booking that can
+    no longer be paid returns (None, False).
+    """
+    try:
+        with transaction.atomic():
+            # The conditional update is the guard: it loses cleanly to the hold reaper and to a concurrent retry.
+            if _payable([booking.pk]).update(status='CONFIRMED'):
+                payment = Payment.objects.create(
+                    booking_id=booking.pk, amount=booking.total_fare, method=method, idempotency_key=idempotency_key,
+                )
+                Ticket.objects.create(booking_id=booking.pk)
+                Invoice.objects.create(payment=payment)
+                return payment, True
+    except IntegrityError:
+        # The key is already used by another booking's payment; nothing was written.
+        return None, False
+    # Looked up after the transaction so a concurrent confirmation's commit is visible.
+    payment = Payment.objects.filter(booking_id=booking.pk).first()
+    if payment is not None and idempotency_key and payment.idempotency_key == idempotency_key:
+        return payment, False
+    return None, False
+
+
+def confirm_bookings(booking_ids, idempotency_key=None, method=PAYMENT_METHOD):
+    """
+    Batch confirmation for agency and back-office flows. Every payable booking in
+    booking_ids is confirmed in one transaction with a fixed number of statements,
+    however many bookings there are. Returns {booking_id: payment_id} for the
+    bookings this call confirmed and, when idempotency_key is given, for those a
+    previous call with the same key already confirmed.
+    """
+    booking_ids = list(booking_ids)
+    key_for = (lambda pk: f'{idempotency_key}:{pk}') if idempotency_key else (lambda pk: None)
+    with transaction.atomic():
+        payable = list(_payable(booking_ids).select_for_update().values_list('pk', 'total_fare'))
+        if payable:
+            Booking.objects.filter(pk__in=[pk for pk, _ in payable]).update(status='CONFIRMED')
+            payments = Payment.objects.bulk_create([
+                Payment(booking_id=pk, amount=fare, method=method, idempotency_key=key_for(pk)) for pk, fare in payable
+            ])
+            if not connections[router.db_for_write(Payment)].features.can_return_rows_from_bulk_insert:
+                payments = list(Payment.objects.filter(booking_id__in=[pk for pk, _ in payable]).only('pk', 'booking_id'))
+            Ticket.objects.bulk_create([Ticket(booking_id=pk) for pk, _ in payable])
+            Invoice.objects.bulk_create([Invoice(payment_id=payment.pk) for payment in payments])
+            # bulk_create() skips the signals that normally schedule these.
+            schedule_summary_refresh(*(pk for pk, _ in payable))
+        confirmed = {payment.booking_id: payment.pk for payment in payments} if payable else {}
+    if idempotency_key:
+        replayed = Payment.objects.filter(
+            booking_id__in=set(booking_ids) - set(confirmed), idempotency_key__startswith=f'{idempotency_key}:',
+        ).values_list('booking_id', 'pk')
+        confirmed.update(replayed)
+    return confirmed
@@ -1,11 +1,16 @@
 # flight_management/context_processors.py
-from .models import Notification
+from django.utils.functional import SimpleLazyObject
+
+from .notifications import unread_summary
 
 def notifications_processor(request):
     if request.user.is_authenticated:
-        unread_notifications = Notification.objects.filter(user=request.user, is_read=False).order_by('-sent_date')
+        # Lazy: nothing is fetched unless a template actually reads these, and both
+        # names share one cached lookup.
+        user_id = request.user.pk
+        summary = SimpleLazyObject(lambda: unread_summary(user_id))
         return {
-            'unread_notifications': unread_notifications,
-            'unread_count': unread_notifications.count()
+            'unread_notifications': SimpleLazyObject(lambda: summary['latest']),
+            'unread_count': SimpleLazyObject(lambda: summary['count']),
         }
     return {}
\ No newline at end of file
@@ -0,0 +1,46 @@
+# flight_management/coordination.py
+# The keys workers coordinate through: the timetable and account change logs and
+# their counters, the reference data version and document digests. Losing one to
+# make room leaves workers stale or replaying, so they live in their own cache
+# alias, COORDINATION_CACHE_ALIAS, whose backend must never evict a live key: the
+# file-based one below, or Redis with maxmemory-policy noeviction or volatile-*.
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.utils.connection import ConnectionProxy
+
+COORDINATION_CACHE_ALIAS = getattr(settings, 'COORDINATION_CACHE_ALIAS', 'coordination')
+# A full cache is swept for expired entries at most this often.
+SWEEP_SECONDS = 60
+
+cache = ConnectionProxy(caches, COORDINATION_CACHE_ALIAS)
+
+
+class PersistentFileBasedCache(FileBasedCache):
+    """
+    FileBasedCache that, past MAX_ENTRIES, removes expired entries only instead of
+    a random sample: a key without a timeout stays until it is deleted.
+    """
+
+    _swept_at = {}
+    _sweep_lock = threading.Lock()
+
+    def _cull(self):
+        filelist = self._list_cache_files()
+        if len(filelist) < self._max_entries:
+            return
+        with self._sweep_lock:
+            # Live entries can outnumber MAX_ENTRIES; don't rescan the directory on every write.
+            if time.monotonic() - self._swept_at.get(self._dir, float('-inf')) < SWEEP_SECONDS:
+                return
+            self._swept_at[self._dir] = time.monotonic()
+        for fname in filelist:
+            try:
+                with open(fname, 'rb') as f:
+                    self._is_expired(f)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,147 @@
+# flight_management/documents.py
+# Tickets and invoices are rendered once, when issued or when their booking changes,
+# and written under MEDIA_ROOT/documents/<user id>/ named by the SHA-256 of their
+# bytes. A document URL therefore never changes meaning and can be cached forever;
+# viewing a ticket is a cache lookup and a file read, with no queries. Edits to a
+# flight, airport or airline only expire the documents they touch, which are
+# rendered again when next viewed; a re-rendered document deletes its old files.
+
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils.module_loading import import_string
+
+from .coordination import cache
+from .models import Booking, Invoice, Ticket
+
+logger = logging.getLogger(__name__)
+
+# Entries only go stale through expire_documents, so by default they are kept until then;
+# a timed expiry would make every ticket older than it re-render on its next view.
+DOCUMENT_CACHE_SECONDS = getattr(settings, 'DOCUMENT_CACHE_SECONDS', None)
+CONTENT_TYPES = {'html': 'text/html; charset=utf-8', 'pdf': 'application/pdf'}
+# Dotted path to a callable turning a document's HTML into PDF bytes, e.g. a small
+# wrapper around weasyprint. No PDF is produced when unset.
+DOCUMENT_PDF_RENDERER = getattr(settings, 'DOCUMENT_PDF_RENDERER', None)
+
+
+def _cache_key(kind, pk):
+    return f'documents:{kind}:{pk}'
+
+
+def document_path(user_id, digest, extension):
+    return os.path.join(settings.MEDIA_ROOT, 'documents', str(user_id), f'{digest}.{extension}')
+
+
+def _store(user_id, content, extension):
+    digest = hashlib.sha256(content).hexdigest()
+    path = document_path(user_id, digest, extension)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Written aside and renamed, so a concurrent reader never sees half a file.
+        partial = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(partial, 'wb') as fp:
+            fp.write(content)
+        os.replace(partial, path)
+    return digest
+
+
+def _retire(user_id, kind, pk, entry):
+    # <kind>-<pk>.current names the files the document uses, so the previous ones can go.
+    current = os.path.join(settings.MEDIA_ROOT, 'documents', str(user_id), f'{kind}-{pk}.current')
+    try:
+        with open(current) as fp:
+            previous = json.load(fp)
+    except (OSError, ValueError):
+        previous = {}
+    partial = f'{current}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(partial, 'w') as fp:
+        json.dump({'html': entry['html'], 'pdf': entry['pdf']}, fp)
+    os.replace(partial, current)
+    for extension in CONTENT_TYPES:
+        digest = previous.get(extension)
+        if digest and digest != entry[extension]:
+            try:
+                os.remove(document_path(user_id, digest, extension))
+            except FileNotFoundError:
+                pass
+
+
+def _publish(user_id, kind, pk, template, context):
+    html = render_to_string(template, context)
+    entry = {'user_id': user_id, 'html': _store(user_id, html.encode(), 'html'), 'pdf': None}
+    if DOCUMENT_PDF_RENDERER:
+        entry['pdf'] = _store(user_id, import_string(DOCUMENT_PDF_RENDERER)(html), 'pdf')
+    _retire(user_id, kind, pk, entry)
+    return entry
+
+
+def render_documents(booking_ids):
+    """
+    Render and store the ticket and invoice of every ticketed booking in booking_ids
+    (an iterable or a values_list queryset) with a single query, point the cache at
+    the new files and delete the ones they replace.
+    """
+    bookings = Booking.objects.filter(pk__in=booking_ids, ticket__isnull=False).select_related(
+        'user', 'flight__airline', 'flight__departure_airport', 'flight__destination_airport',
+        'ticket', 'payment__invoice',
+    )
+    entries = {}
+    for booking in bookings.iterator(chunk_size=500):
+        try:
+            entries[_cache_key('ticket', booking.ticket.pk)] = _publish(
+                booking.user_id, 'ticket', booking.ticket.pk, 'ticket.html', {'ticket': booking.ticket},
+            )
+            invoice = getattr(getattr(booking, 'payment', None), 'invoice', None)
+            if invoice is not None:
+                entries[_cache_key('invoice', invoice.pk)] = _publish(
+                    booking.user_id, 'invoice', invoice.pk, 'invoice.html', {'invoice': invoice},
+                )
+        except OSError:
+            # Lookups render on demand, so a failed write only costs the next viewer some queries.
+            logger.exception('Could not store the documents of booking %s', booking.pk)
+    cache.set_many(entries, DOCUMENT_CACHE_SECONDS)
+
+
+def expire_documents(*conditions, **filters):
+    """
+    Forget the stored documents of every ticketed booking matching the filters, e.g.
+    flight_id=..., in one query: each is rendered again when next viewed, so editing
+    a busy flight costs no rendering.
+    """
+    rows = Booking.objects.filter(*conditions, ticket__isnull=False, **filters).values_list(
+        'ticket__pk', 'payment__invoice__pk',
+    )
+    keys = []
+    for ticket_id, invoice_id in rows.iterator(chunk_size=2000):
+        keys.append(_cache_key('ticket', ticket_id))
+        if invoice_id is not None:
+            keys.append(_cache_key('invoice', invoice_id))
+    for start in range(0, len(keys), 1000):
+        cache.delete_many(keys[start:start + 1000])
+
+
+def lookup(kind, pk, user_id):
+    """
+    Return {'user_id', 'html', 'pdf'} (digests; 'pdf' may be None) for the 'ticket'
+    or 'invoice' pk, or None if it does not exist or belongs to someone else. A
+    cache miss renders the document from the database.
+    """
+    entry = cache.get(_cache_key(kind, pk))
+    if entry is None:
+        documents = Ticket.objects.filter(pk=pk) if kind == 'ticket' else Invoice.objects.filter(pk=pk)
+        booking_id = documents.values_list(
+            'booking_id' if kind == 'ticket' else 'payment__booking_id', flat=True,
+        ).first()
+        if booking_id is None:
+            return None
+        render_documents([booking_id])
+        entry = cache.get(_cache_key(kind, pk))
+    if entry is None or entry['user_id'] != user_id:
+        return None
+    return entry
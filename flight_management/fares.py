@@ -0,0 +1,293 @@
+# flight_management/fares.py
+
+import hashlib
+import json
+import threading
+from bisect import bisect_right
+from collections import deque
+from datetime import datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Min, Q, Window
+from django.db.models.functions import RowNumber, TruncDate
+from django.utils import timezone
+
+from .inventory import seat_field
+from .models import Flight
+from .replicas import primary
+from .timetable import SEAT_CLASSES, timetable
+
+PRICE_FIELDS = {'ECONOMY': 'economy_price', 'BUSINESS': 'business_price'}
+
+
+def airport_country(location):
+    # Airport.location is "City, Country" (or just the country, e.g. "Singapore").
+    return (location or '').split(',')[-1].strip()
+
+
+EMPTY_PAYLOAD = (hashlib.sha1(b'{}').hexdigest(), b'{}', {})
+
+
+class FareMatrix:
+    """
+    Cheapest bookable fare from every origin airport to every destination country,
+    for both classes, derived from the in-memory timetable.
+
+    A row (one origin) is built on first request. After that, timetable changes mark
+    just the (origin, destination) cells dirty and only those countries are
+    recomputed on the next read. Each row keeps its serialized JSON and an ETag
+    hashed from the content, so every worker agrees on the ETag for the same data.
+    """
+
+    def __init__(self, index=timetable):
+        self.index = index
+        self._lock = threading.Lock()
+        # Written by the timetable listener without taking self._lock (see add_listener).
+        self._events = deque()
+        self._rows = {}
+        self._dirty = {}
+        self._payloads = {}
+        self._country_airports = None
+        self._airport_country = {}
+        index.add_listener(self._changed)
+
+    def _changed(self, origin, destination):
+        self._events.append((origin, destination))
+
+    def _drain(self):
+        while self._events:
+            origin, destination = self._events.popleft()
+            if origin is None:
+                self._rows.clear()
+                self._dirty.clear()
+                self._payloads.clear()
+                self._country_airports = None
+            elif origin in self._rows:
+                self._dirty.setdefault(origin, set()).add(destination)
+
+    def _countries(self):
+        if self._country_airports is None:
+            self._country_airports = {}
+            self._airport_country = {}
+            for airport in self.index.airports():
+                country = airport_country(airport.location)
+                if country:
+                    self._country_airports.setdefault(country, set()).add(airport.airport_code)
+                    self._airport_country[airport.airport_code] = country
+        return self._country_airports
+
+    def _cell(self, origin, country, destinations):
+        cell = {}
+        for seat_class in SEAT_CLASSES:
+            prices = [
+                record.price
+                for destination in self._country_airports[country] & destinations
+                for record in self.index.route_records(origin, destination, seat_class)
+                if record.seats > 0
+            ]
+            if prices:
+                cell[seat_class] = min(prices)
+        return cell
+
+    def _row(self, origin):
+        countries = self._countries()
+        destinations = self.index.destinations_from(origin)
+        if origin not in self._rows:
+            affected = {self._airport_country.get(code) for code in destinations}
+            self._rows[origin] = {}
+        else:
+            affected = {self._airport_country.get(code) for code in self._dirty.pop(origin, ())}
+        affected.discard(None)
+        if affected:
+            row = self._rows[origin]
+            for country in affected:
+                cell = self._cell(origin, country, destinations) if country in countries else {}
+                if cell:
+                    row[country] = cell
+                else:
+                    row.pop(country, None)
+            for seat_class in SEAT_CLASSES:
+                self._payloads.pop((origin, seat_class), None)
+        return self._rows[origin]
+
+    def payload(self, origin, seat_class='ECONOMY'):
+        """Return (etag, json_bytes) of {country: cheapest price} for origin in seat_class."""
+        etag, body, _ = self._payload(origin, seat_class)
+        return etag, body
+
+    def prices(self, origin, seat_class='ECONOMY'):
+        """Return (etag, {country: cheapest price}) for origin in seat_class."""
+        etag, _, prices = self._payload(origin, seat_class)
+        return etag, prices
+
+    def _payload(self, origin, seat_class):
+        if seat_class not in SEAT_CLASSES:
+            seat_class = 'ECONOMY'
+        if self.index.airport(origin) is None:
+            return EMPTY_PAYLOAD
+        with self._lock:
+            self._drain()
+            row = self._row(origin)
+            cached = self._payloads.get((origin, seat_class))
+            if cached is None:
+                prices = {country: cell[seat_class] for country, cell in sorted(row.items()) if seat_class in cell}
+                body = json.dumps(prices, cls=DjangoJSONEncoder).encode()
+                cached = (hashlib.sha1(body).hexdigest(), body, prices)
+                self._payloads[(origin, seat_class)] = cached
+            return cached
+
+
+def cheapest_per_destination(origin, seat_class='ECONOMY'):
+    """
+    The cheapest bookable flight from origin to each destination, in one query.
+    A ROW_NUMBER() window ranks flights per destination, so this runs on MySQL 8,
+    PostgreSQL and SQLite alike, unlike DISTINCT ON.
+    """
+    price = PRICE_FIELDS.get(seat_class, 'economy_price')
+    return Flight.objects.filter(
+        departure_airport_id=origin, **{f'{seat_field(seat_class)}__gt': 0},
+    ).annotate(destination_rank=Window(
+        RowNumber(),
+        partition_by=F('destination_airport'),
+        order_by=[F(price).asc(), F('departure_time').asc(), F('flight_id').asc()],
+    )).filter(destination_rank=1).select_related(
+        'airline', 'departure_airport', 'destination_airport',
+    ).order_by(price, 'destination_airport')
+
+
+class DestinationFares:
+    """
+    Per (origin, seat class), the cheapest flight to every destination sorted by
+    price, loaded with cheapest_per_destination(). Any budget is then a
+    bisect over the price column. A list is dropped whenever the timetable
+    reports a change to one of its origin's routes.
+    """
+
+    def __init__(self, index=timetable):
+        self.index = index
+        self._lock = threading.Lock()
+        self._events = deque()
+        self._drained = 0
+        self._lists = {}
+        index.add_listener(self._changed)
+
+    def _changed(self, origin, destination):
+        self._events.append(origin)
+
+    def _drain(self):
+        while self._events:
+            origin = self._events.popleft()
+            self._drained += 1
+            if origin is None:
+                self._lists.clear()
+            else:
+                for seat_class in SEAT_CLASSES:
+                    self._lists.pop((origin, seat_class), None)
+
+    def sorted_fares(self, origin, seat_class='ECONOMY'):
+        """Return (prices, flights): parallel lists in ascending price order."""
+        if seat_class not in SEAT_CLASSES:
+            seat_class = 'ECONOMY'
+        # Changes only reach the listener once the index is loaded.
+        self.index.ensure_loaded()
+        with self._lock:
+            self._drain()
+            cached = self._lists.get((origin, seat_class))
+            drained = self._drained
+        if cached is None:
+            with primary():
+                flights = list(cheapest_per_destination(origin, seat_class))
+            price = PRICE_FIELDS[seat_class]
+            cached = ([getattr(flight, price) for flight in flights], flights)
+            with self._lock:
+                # Don't keep the result if the timetable changed while the query ran.
+                self._drain()
+                if self._drained == drained:
+                    self._lists[(origin, seat_class)] = cached
+        return cached
+
+    def under_budget(self, origin, seat_class, max_budget):
+        prices, flights = self.sorted_fares(origin, seat_class)
+        return flights[:bisect_right(prices, max_budget)]
+
+
+class FareCalendar:
+    """
+    Lowest fare with seats left, per departure day, on one route. Each window is
+    one grouped query, kept until the timetable reports a change on that route.
+    """
+
+    min_days = 30
+    max_days = 90
+    max_cached = 1024
+
+    def __init__(self, index=timetable):
+        self.index = index
+        self._lock = threading.Lock()
+        self._events = deque()
+        self._drained = 0
+        self._calendars = {}
+        index.add_listener(self._changed)
+
+    def _changed(self, origin, destination):
+        self._events.append((origin, destination))
+
+    def _drain(self):
+        while self._events:
+            route = self._events.popleft()
+            self._drained += 1
+            if route[0] is None:
+                self._calendars.clear()
+            else:
+                self._calendars.pop(route, None)
+
+    def query(self, origin, destination, start, days):
+        window_start = timezone.make_aware(datetime.combine(start, time.min))
+        rows = Flight.objects.filter(
+            departure_airport_id=origin, destination_airport_id=destination,
+            departure_time__gte=window_start, departure_time__lt=window_start + timedelta(days=days),
+        ).annotate(day=TruncDate('departure_time')).values('day').annotate(
+            economy=Min('economy_price', filter=Q(economy_seats__gt=0)),
+            business=Min('business_price', filter=Q(business_seats__gt=0)),
+        ).order_by('day')
+        fares = {row['day']: (row['economy'], row['business']) for row in rows}
+        calendar = []
+        for offset in range(days):
+            day = start + timedelta(days=offset)
+            economy, business = fares.get(day, (None, None))
+            calendar.append({'date': day, 'economy_price': economy, 'business_price': business})
+        return calendar
+
+    def calendar(self, origin, destination, start, days=30):
+        """
+        Return a list of {date, economy_price, business_price} for days days from start.
+        Raises ValueError for a window shorter than min_days, longer than max_days or past date.max.
+        """
+        if not self.min_days <= days <= self.max_days:
+            raise ValueError(f'A calendar covers {self.min_days} to {self.max_days} days.')
+        try:
+            start + timedelta(days=days)
+        except OverflowError as exc:
+            raise ValueError('The window ends after the last representable date.') from exc
+        key = (start, days)
+        # Changes only reach the listener once the index is loaded.
+        self.index.ensure_loaded()
+        with self._lock:
+            self._drain()
+            cached = self._calendars.get((origin, destination), {}).get(key)
+            drained = self._drained
+        if cached is None:
+            with primary():
+                cached = self.query(origin, destination, start, days)
+            with self._lock:
+                self._drain()
+                if self._drained == drained:
+                    if sum(len(windows) for windows in self._calendars.values()) >= self.max_cached:
+                        self._calendars.clear()
+                    self._calendars.setdefault((origin, destination), {})[key] = cached
+        return cached
+
+
+fare_matrix = FareMatrix()
+destination_fares = DestinationFares()
+fare_calendar = FareCalendar()
@@ -3,6 +3,7 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth.models import User
+from .availability import accounts
 from .models import Review, PassengerProfile
 
 
@@ -17,6 +18,13 @@ class ReviewForm(forms.ModelForm):
             'comment': forms.Textarea(attrs={'class': 'form-control', 'rows': 4}),
         }
 
+    def clean_rating(self):
+        # The select only offers 1-5, but the field itself takes any positive number.
+        rating = self.cleaned_data['rating']
+        if not 1 <= rating <= 5:
+            raise forms.ValidationError('Please choose a rating from 1 to 5 stars.')
+        return rating
+
 class CustomLoginForm(AuthenticationForm):
     def __init__(self, *args, **kwargs):
         super(CustomLoginForm, self).__init__(*args, **kwargs)
@@ -62,6 +70,12 @@ class RegistrationStep1Form(forms.ModelForm): # Names & Email
             'email': forms.EmailInput(attrs={'class': 'form-control'}),
         }
 
+    def clean_email(self):
+        email = self.cleaned_data['email']
+        if email and accounts.email_taken(email):
+            raise forms.ValidationError('An account with this email address already exists.')
+        return email
+
 class RegistrationStep2Form(forms.ModelForm): # Contact Info
     class Meta:
         model = PassengerProfile
@@ -80,6 +94,18 @@ class RegistrationStep3Form(forms.ModelForm): # Username & Password
         fields = ['username']
         widgets = { 'username': forms.TextInput(attrs={'class': 'form-control'}) }
 
+    def clean_username(self):
+        username = self.cleaned_data['username']
+        if accounts.username_taken(username):
+            raise forms.ValidationError(User._meta.get_field('username').error_messages['unique'])
+        return username
+
+    def validate_unique(self):
+        # clean_username() has already checked: in the database, unless the filters, caught up
+        # with every worker's sign-ups, say no account has the name. The unique constraint has
+        # the final word when register_step4_photo creates the user.
+        pass
+
     def clean_password2(self):
         cd = self.cleaned_data
         if cd['password'] != cd['password2']:
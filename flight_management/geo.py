@@ -0,0 +1,222 @@
+# flight_management/geo.py
+# Build-time geometry pipeline for the price map: simplify the country outlines at a
+# few detail levels, quantize them and encode as TopoJSON. At request time the
+# prebuilt topology only needs prices dropped into each geometry's properties.
+
+import gzip
+import json
+import os
+import threading
+
+from django.conf import settings
+
+from .fares import airport_country
+
+SOURCE_GEOJSON = os.path.join(settings.BASE_DIR, 'static', 'js', 'countries.geo.json')
+TOPOLOGY_DIR = os.path.join(settings.BASE_DIR, 'static', 'geo')
+
+# Douglas-Peucker tolerance in degrees for each detail level.
+DETAIL_LEVELS = {'low': 0.5, 'medium': 0.15, 'high': 0.03}
+QUANTIZATION = 10_000
+
+# Spellings used by the map outlines or by airport locations that name the same country.
+COUNTRY_ALIASES = {
+    'united states of america': 'usa', 'united states': 'usa', 'us': 'usa',
+    'united kingdom': 'uk', 'great britain': 'uk',
+    'united arab emirates': 'uae',
+    'republic of serbia': 'serbia',
+    'united republic of tanzania': 'tanzania',
+    'the bahamas': 'bahamas',
+    'czechia': 'czech republic',
+    'korea': 'south korea', 'republic of korea': 'south korea',
+    'russian federation': 'russia',
+}
+
+
+def country_key(name):
+    key = ' '.join((name or '').casefold().split())
+    return COUNTRY_ALIASES.get(key, key)
+
+
+def topology_path(detail):
+    return os.path.join(TOPOLOGY_DIR, f'countries.{detail}.topo.json')
+
+
+# --- Simplification and quantization ---
+
+def _distance_sq(point, start, end):
+    (px, py), (ax, ay), (bx, by) = point, start, end
+    dx, dy = bx - ax, by - ay
+    if dx == 0 and dy == 0:
+        return (px - ax) ** 2 + (py - ay) ** 2
+    t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / (dx * dx + dy * dy)))
+    return (px - ax - t * dx) ** 2 + (py - ay - t * dy) ** 2
+
+
+def simplify_ring(ring, tolerance):
+    """Douglas-Peucker on a closed ring; returns None if the ring collapses."""
+    if len(ring) <= 4 or tolerance <= 0:
+        return ring
+    keep = [False] * len(ring)
+    keep[0] = keep[-1] = True
+    tolerance_sq = tolerance * tolerance
+    stack = [(0, len(ring) - 1)]
+    while stack:
+        first, last = stack.pop()
+        best, best_index = 0.0, None
+        for i in range(first + 1, last):
+            d = _distance_sq(ring[i], ring[first], ring[last])
+            if d > best:
+                best, best_index = d, i
+        if best_index is not None and best > tolerance_sq:
+            keep[best_index] = True
+            stack.append((first, best_index))
+            stack.append((best_index, last))
+    simplified = [point for point, kept in zip(ring, keep) if kept]
+    return simplified if len(simplified) >= 4 else None
+
+
+def _polygons(geometry):
+    if geometry['type'] == 'Polygon':
+        return [geometry['coordinates']]
+    return geometry['coordinates']
+
+
+def build_topology(features, tolerance, quantization=QUANTIZATION):
+    """
+    Encode GeoJSON features as a quantized, delta-encoded TopoJSON topology with
+    one object, "countries". Every ring becomes its own arc; borders shared by two
+    countries are not merged.
+    """
+    points = [
+        point for f in features for polygon in _polygons(f['geometry']) for ring in polygon for point in ring
+    ]
+    x0, y0 = min(x for x, _ in points), min(y for _, y in points)
+    kx = (max(x for x, _ in points) - x0) / (quantization - 1) or 1
+    ky = (max(y for _, y in points) - y0) / (quantization - 1) or 1
+
+    arcs, geometries = [], []
+
+    def add_arc(ring):
+        arc, last = [], None
+        for x, y in ring:
+            point = (round((x - x0) / kx), round((y - y0) / ky))
+            if point != last:
+                arc.append([point[0] - last[0], point[1] - last[1]] if last else list(point))
+                last = point
+        if len(arc) < 4:
+            return None
+        arcs.append(arc)
+        return [len(arcs) - 1]
+
+    for feature in features:
+        source = _polygons(feature['geometry'])
+        polygons = []
+        for polygon in source:
+            exterior = simplify_ring(polygon[0], tolerance)
+            exterior_arc = add_arc(exterior) if exterior else None
+            if exterior_arc is None:
+                continue
+            holes = (simplify_ring(ring, tolerance) for ring in polygon[1:])
+            hole_arcs = (add_arc(ring) for ring in holes if ring)
+            polygons.append([exterior_arc] + [arc for arc in hole_arcs if arc])
+        if not polygons:
+            # Small islands vanish at low detail; keep the largest outline unsimplified.
+            exterior_arc = add_arc(max(source, key=lambda p: len(p[0]))[0])
+            if exterior_arc is None:
+                continue
+            polygons = [[exterior_arc]]
+        name = feature['properties']['name']
+        geometries.append({
+            'type': 'Polygon' if len(polygons) == 1 else 'MultiPolygon',
+            'arcs': polygons[0] if len(polygons) == 1 else polygons,
+            'properties': {'name': name, 'key': country_key(name)},
+        })
+    return {
+        'type': 'Topology',
+        'transform': {'scale': [kx, ky], 'translate': [x0, y0]},
+        'objects': {'countries': {'type': 'GeometryCollection', 'geometries': geometries}},
+        'arcs': arcs,
+    }
+
+
+def build_all(airport_locations=()):
+    """
+    Build every detail level from SOURCE_GEOJSON. Outline names are resolved once
+    against the countries in airport_locations, so the prices joined at request
+    time carry the same spelling the airports use.
+    """
+    with open(SOURCE_GEOJSON, encoding='utf-8') as fp:
+        features = json.load(fp)['features']
+    airport_countries = {}
+    for location in airport_locations:
+        country = airport_country(location)
+        if country:
+            airport_countries.setdefault(country_key(country), country)
+    topologies = {}
+    for detail, tolerance in DETAIL_LEVELS.items():
+        topology = build_topology(features, tolerance)
+        for geometry in topology['objects']['countries']['geometries']:
+            properties = geometry['properties']
+            properties['name'] = airport_countries.get(properties['key'], properties['name'])
+        topologies[detail] = topology
+    return topologies
+
+
+# --- Request-time join ---
+
+class PriceMapLayers:
+    """
+    Prebuilt topologies split around their geometry list, so a priced layer is the
+    cached prefix and suffix around a freshly joined geometries array. Each joined
+    layer is kept gzip-compressed, keyed by the fare ETag it was built from.
+    """
+
+    max_cached = 256
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._templates = {}
+        self._layers = {}
+
+    def _template(self, detail):
+        template = self._templates.get(detail)
+        if template is None:
+            try:
+                with open(topology_path(detail), encoding='utf-8') as fp:
+                    topology = json.load(fp)
+            except FileNotFoundError:
+                topology = build_all()[detail]
+            geometries = topology['objects']['countries'].pop('geometries')
+            topology['objects']['countries']['geometries'] = '__GEOMETRIES__'
+            prefix, suffix = json.dumps(topology, separators=(',', ':')).split('"__GEOMETRIES__"')
+            template = (prefix.encode(), geometries, suffix.encode())
+            self._templates[detail] = template
+        return template
+
+    def layer(self, detail, fare_etag, prices):
+        """Return (raw_bytes, gzip_bytes) of the topology with a price on every geometry."""
+        key = (detail, fare_etag)
+        with self._lock:
+            cached = self._layers.get(key)
+            if cached is not None:
+                return cached
+            prefix, geometries, suffix = self._template(detail)
+        priced = {country_key(country): price for country, price in prices.items()}
+        joined = [
+            dict(geometry, properties={
+                'name': geometry['properties']['name'],
+                'price': float(priced[geometry['properties']['key']]) if geometry['properties']['key'] in priced else None,
+            })
+            for geometry in geometries
+        ]
+        raw = prefix + json.dumps(joined, separators=(',', ':')).encode() + suffix
+        cached = (raw, gzip.compress(raw, compresslevel=9))
+        with self._lock:
+            if len(self._layers) >= self.max_cached:
+                self._layers.clear()
+            self._layers[key] = cached
+        return cached
+
+
+price_map_layers = PriceMapLayers()
@@ -0,0 +1,63 @@
+# flight_management/holds.py
+# PENDING bookings hold their seats for SEAT_HOLD_MINUTES; after that the reaper
+# marks them EXPIRED and hands the seats back to the flight.
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .inventory import release_seats_bulk
+from .models import Booking
+from .summaries import schedule_summary_refresh
+
+SEAT_HOLD_MINUTES = getattr(settings, 'SEAT_HOLD_MINUTES', 15)
+
+
+def hold_cutoff(now=None):
+    # Holds created at or before this moment have expired.
+    return (now or timezone.now()) - timedelta(minutes=SEAT_HOLD_MINUTES)
+
+
+def hold_expires_at(booking):
+    return booking.booking_date + timedelta(minutes=SEAT_HOLD_MINUTES)
+
+
+def hold_expired(booking, now=None):
+    return booking.status == 'PENDING' and booking.booking_date <= hold_cutoff(now)
+
+
+def release_expired_holds(batch_size=1000, now=None, booking_ids=None):
+    """
+    Expire stale PENDING bookings in batches and release their seats with one
+    grouped UPDATE per seat class. Returns (bookings expired, seats released).
+    """
+    cutoff = hold_cutoff(now)
+    expired = Booking.objects.filter(status='PENDING', booking_date__lte=cutoff)
+    if booking_ids is not None:
+        expired = expired.filter(pk__in=booking_ids)
+    total_bookings = total_seats = 0
+    while True:
+        with transaction.atomic():
+            # skip_locked lets several reapers (or a reaper and payment_view) run side by side.
+            batch = list(
+                expired.select_for_update(skip_locked=True).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not batch:
+                break
+            Booking.objects.filter(pk__in=batch, status='PENDING').update(status='EXPIRED')
+            seat_totals = {
+                (row['flight_id'], row['seat_class']): row['seats']
+                for row in Booking.objects.filter(pk__in=batch, status='EXPIRED')
+                .values('flight_id', 'seat_class')
+                .annotate(seats=Sum(F('num_adults') + F('num_children')))
+            }
+            release_seats_bulk(seat_totals)
+            schedule_summary_refresh(*batch)
+        total_bookings += len(batch)
+        total_seats += sum(seat_totals.values())
+        if len(batch) < batch_size:
+            break
+    return total_bookings, total_seats
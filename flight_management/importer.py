@@ -0,0 +1,232 @@
+# flight_management/importer.py
+# Streaming loader behind `manage.py import_schedule`. Rows are read one at a time,
+# checked against in-memory code maps and written in bulk upserts, one transaction
+# per chunk, so memory stays flat however large the timetable file is.
+
+import csv
+import gzip
+import io
+import json
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.color import no_style
+from django.db import connections, router, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .bulk import bulk_upsert
+from .documents import expire_documents
+from .models import Airline, Airport, Booking, Flight
+from .reference import reference
+from .summaries import refresh_airline_names, refresh_booking_summaries
+from .timetable import ALL_FLIGHTS, timetable
+
+FORMATS = ('csv', 'jsonl')
+FLIGHT_UPDATE_FIELDS = [
+    'airline', 'departure_airport', 'destination_airport', 'departure_time', 'arrival_time',
+    'economy_price', 'economy_seats', 'business_price', 'business_seats',
+]
+
+
+class RowError(ValueError):
+    pass
+
+
+def open_rows(path, file_format=None):
+    """Yield (line_number, dict) from a CSV or JSON-lines file, optionally gzipped."""
+    name = path[:-3] if path.endswith('.gz') else path
+    if file_format is None:
+        file_format = 'csv' if name.endswith('.csv') else 'jsonl'
+    raw = gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')
+    with io.TextIOWrapper(raw, encoding='utf-8-sig', newline='') as fp:
+        if file_format == 'csv':
+            reader = csv.DictReader(fp)
+            for row in reader:
+                yield reader.line_num, row
+        else:
+            for line_number, line in enumerate(fp, 1):
+                if line.strip():
+                    try:
+                        yield line_number, json.loads(line)
+                    except ValueError:
+                        yield line_number, None
+
+
+def _text(row, field, max_length):
+    value = str(row.get(field) or '').strip()
+    if not value:
+        raise RowError(f'{field} is required')
+    if len(value) > max_length:
+        raise RowError(f'{field} is longer than {max_length} characters')
+    return value
+
+
+def _decimal(row, field):
+    try:
+        value = Decimal(str(row.get(field)).strip())
+    except (InvalidOperation, TypeError):
+        raise RowError(f'{field} is not a number')
+    if not value.is_finite() or value < 0 or value >= 10 ** 8:
+        raise RowError(f'{field} is out of range')
+    return value.quantize(Decimal('0.01'))
+
+
+def _count(row, field):
+    try:
+        value = int(str(row.get(field)).strip())
+    except (TypeError, ValueError):
+        raise RowError(f'{field} is not a whole number')
+    if value < 0:
+        raise RowError(f'{field} is negative')
+    return value
+
+
+def _datetime(row, field, tz):
+    try:
+        value = parse_datetime(str(row.get(field) or '').strip())
+    except ValueError:
+        value = None
+    if value is None:
+        raise RowError(f'{field} is not an ISO 8601 datetime')
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value, tz)
+    return value
+
+
+class ScheduleImporter:
+    """
+    Import airports, airlines and flights. Airport and airline codes are loaded
+    once and extended as reference rows are imported, so a flight's foreign keys
+    are validated without touching the database.
+
+    Flights that carry a flight_id update that flight; the rest are inserted.
+    """
+
+    def __init__(self, chunk_size=5000, stdout=None, verbosity=1):
+        self.chunk_size = chunk_size
+        self.stdout = stdout
+        self.verbosity = verbosity
+        # Naive times are in TIME_ZONE; resolved once rather than per value.
+        self.tz = timezone.get_current_timezone()
+        self.airport_codes = set(Airport.objects.values_list('airport_code', flat=True))
+        self.airline_codes = set(Airline.objects.values_list('airline_code', flat=True))
+        self.written = set()
+
+    # --- Row parsers ---
+
+    def airport(self, row):
+        return Airport(
+            airport_code=_text(row, 'airport_code', 3).upper(),
+            airport_name=_text(row, 'airport_name', 100),
+            location=_text(row, 'location', 100),
+        )
+
+    def airline(self, row):
+        return Airline(airline_code=_text(row, 'airline_code', 5).upper(), airline_name=_text(row, 'airline_name', 50))
+
+    def flight(self, row):
+        airline = _text(row, 'airline', 5).upper()
+        origin = _text(row, 'departure_airport', 3).upper()
+        destination = _text(row, 'destination_airport', 3).upper()
+        if airline not in self.airline_codes:
+            raise RowError(f'unknown airline {airline}')
+        for code in (origin, destination):
+            if code not in self.airport_codes:
+                raise RowError(f'unknown airport {code}')
+        if origin == destination:
+            raise RowError('departure and destination airports are the same')
+        departure_time = _datetime(row, 'departure_time', self.tz)
+        arrival_time = _datetime(row, 'arrival_time', self.tz)
+        if arrival_time <= departure_time:
+            raise RowError('arrival_time is not after departure_time')
+        flight_id = row.get('flight_id')
+        return Flight(
+            flight_id=_count(row, 'flight_id') if flight_id not in (None, '') else None,
+            airline_id=airline, departure_airport_id=origin, destination_airport_id=destination,
+            departure_time=departure_time, arrival_time=arrival_time,
+            economy_price=_decimal(row, 'economy_price'), economy_seats=_count(row, 'economy_seats'),
+            business_price=_decimal(row, 'business_price'), business_seats=_count(row, 'business_seats'),
+        )
+
+    # --- Chunk writers ---
+
+    def write_airports(self, airports):
+        bulk_upsert(Airport, airports, ['airport_code'], ['airport_name', 'location'])
+        self.airport_codes.update(airport.airport_code for airport in airports)
+
+    def write_airlines(self, airlines):
+        bulk_upsert(Airline, airlines, ['airline_code'], ['airline_name'])
+        self.airline_codes.update(airline.airline_code for airline in airlines)
+        refresh_airline_names(airline.airline_code for airline in airlines)
+
+    def write_flights(self, flights):
+        bulk_upsert(Flight, flights, ['flight_id'], FLIGHT_UPDATE_FIELDS)
+        updated = [flight.flight_id for flight in flights if flight.flight_id is not None]
+        if updated:
+            booking_ids = list(Booking.objects.filter(flight_id__in=updated).values_list('pk', flat=True))
+            refresh_booking_summaries(booking_ids)
+            expire_documents(flight_id__in=updated)
+
+    # --- Driver ---
+
+    def run(self, kind, path, file_format=None):
+        """Import one file; returns (imported, rejected, seconds)."""
+        parse, write = {
+            'airports': (self.airport, self.write_airports),
+            'airlines': (self.airline, self.write_airlines),
+            'flights': (self.flight, self.write_flights),
+        }[kind]
+        started = time.perf_counter()
+        imported = rejected = 0
+        chunk = []
+        for line_number, row in open_rows(path, file_format):
+            try:
+                if not isinstance(row, dict):
+                    raise RowError('not a JSON object')
+                chunk.append(parse(row))
+            except RowError as e:
+                rejected += 1
+                self.reject(path, line_number, e)
+                continue
+            if len(chunk) >= self.chunk_size:
+                imported += self.flush(write, chunk)
+                chunk = []
+                self.progress(kind, imported, started)
+        if chunk:
+            imported += self.flush(write, chunk)
+        if imported:
+            self.written.add(kind)
+        return imported, rejected, time.perf_counter() - started
+
+    def announce(self):
+        # bulk_create() sends no model signals: tell the running servers to reload what changed.
+        if self.written & {'airports', 'airlines'}:
+            reference.bump()
+        if self.written:
+            timetable.publish(ALL_FLIGHTS)
+
+    def flush(self, write, chunk):
+        # An upsert may not touch the same row twice; the last occurrence of a key wins,
+        # and the earlier ones, never written, don't count as imported.
+        keyed = {obj.pk: obj for obj in chunk if obj.pk is not None}
+        rows = list(keyed.values()) + [obj for obj in chunk if obj.pk is None]
+        with transaction.atomic():
+            write(rows)
+        return len(rows)
+
+    def reset_sequences(self):
+        # Flights imported with explicit ids leave PostgreSQL's sequence behind (as loaddata does).
+        connection = connections[router.db_for_write(Flight)]
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Flight]):
+                cursor.execute(sql)
+
+    def reject(self, path, line_number, error):
+        if self.stdout is not None:
+            self.stdout.write(f'{path}:{line_number}: skipped, {error}')
+
+    def progress(self, kind, imported, started):
+        if self.stdout is not None and self.verbosity > 1:
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'{kind}: {imported} rows, {imported / elapsed:,.0f} rows/s')
@@ -0,0 +1,63 @@
+# flight_management/inventory.py
+# Seat inventory changes as single conditional UPDATEs on the Flight row.
+# Never read-modify-write seat counts in Python: concurrent requests lose updates.
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from .models import Flight
+from .timetable import timetable
+
+SEAT_FIELDS = {'ECONOMY': 'economy_seats', 'BUSINESS': 'business_seats'}
+
+
+def seat_field(seat_class):
+    return SEAT_FIELDS.get(seat_class, 'economy_seats')
+
+
+def reserve_seats(flight_id, seat_class, count):
+    """
+    Take count seats in one round-trip. Returns False (and changes nothing)
+    if the flight does not have that many seats left.
+    """
+    field = seat_field(seat_class)
+    updated = Flight.objects.filter(pk=flight_id, **{f'{field}__gte': count}).update(**{field: F(field) - count})
+    if updated:
+        _mirror([(flight_id, seat_class, -count)])
+    return bool(updated)
+
+
+def release_seats(flight_id, seat_class, count):
+    field = seat_field(seat_class)
+    updated = Flight.objects.filter(pk=flight_id).update(**{field: F(field) + count})
+    if updated:
+        _mirror([(flight_id, seat_class, count)])
+    return bool(updated)
+
+
+def release_seats_bulk(seat_totals):
+    """
+    Return seats for many flights at once. seat_totals maps (flight_id, seat_class)
+    to a seat count; each class is released with one UPDATE ... CASE over its flights.
+    """
+    by_class = {}
+    for (flight_id, seat_class), count in seat_totals.items():
+        seat_class = seat_class if seat_class in SEAT_FIELDS else 'ECONOMY'
+        by_class.setdefault(seat_class, {})
+        by_class[seat_class][flight_id] = by_class[seat_class].get(flight_id, 0) + count
+    for seat_class, counts in by_class.items():
+        field = seat_field(seat_class)
+        increment = Case(*[When(pk=flight_id, then=Value(count)) for flight_id, count in counts.items()],
+                         default=Value(0), output_field=IntegerField())
+        Flight.objects.filter(pk__in=counts).update(**{field: F(field) + increment})
+        _mirror([(flight_id, seat_class, count) for flight_id, count in counts.items()])
+
+
+def _mirror(changes):
+    # QuerySet.update() sends no post_save, so keep the timetable index in step here:
+    # this process's straight away, the other workers' through publish().
+    def apply():
+        for flight_id, seat_class, delta in changes:
+            timetable.adjust_seats(flight_id, seat_class if seat_class in SEAT_FIELDS else 'ECONOMY', delta)
+        timetable.publish({flight_id for flight_id, _, _ in changes})
+    transaction.on_commit(apply)
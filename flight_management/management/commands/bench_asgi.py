@@ -0,0 +1,127 @@
+# flight_management/management/commands/bench_asgi.py
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import ThreadSensitiveContext
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client
+from django.urls import reverse
+
+from flight_management.bench import (
+    ensure_reference_data, percentile, seed_flights, seed_reviews, seed_users, throwaway_database,
+)
+from flight_management.models import Flight
+from flight_management.timetable import timetable
+
+
+def run_wsgi(urls, concurrency):
+    """One process, `concurrency` threads through the sync handler, as a threaded WSGI worker would."""
+    local = threading.local()
+
+    def get(url):
+        client = getattr(local, 'client', None)
+        if client is None:
+            client = local.client = Client()
+        started = time.perf_counter()
+        client.get(url)
+        return (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(get, urls))
+    return samples, time.perf_counter() - started
+
+
+async def run_asgi(urls, concurrency):
+    """One event loop with up to `concurrency` requests in flight through the async handler."""
+    client = AsyncClient()
+    gate = asyncio.Semaphore(concurrency)
+
+    async def get(url):
+        # ASGIHandler gives each request its own context for thread-sensitive sync code; the test
+        # client does not, which would funnel every request's queries through a single thread.
+        async with gate, ThreadSensitiveContext():
+            started = time.perf_counter()
+            await client.get(url)
+            return (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    samples = await asyncio.gather(*(get(url) for url in urls))
+    return samples, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare requests per second of search, price-map and flight-detail through the WSGI (threads) '
+        'and ASGI (event loop) handlers in a single process, against a throwaway test database. '
+        '--db-latency-ms adds a sleep to every query to stand in for a database across the network.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--flights', type=int, default=10_000)
+        parser.add_argument('--reviews', type=int, default=5_000)
+        parser.add_argument('--requests', type=int, default=1_000, help='Requests per endpoint and handler.')
+        parser.add_argument('--concurrency', type=int, default=64)
+        parser.add_argument('--db-latency-ms', type=float, default=0.0)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        # Saturating the handlers is the point here; don't log every slow request.
+        logging.getLogger('flight_management.metrics').setLevel(logging.ERROR)
+        with throwaway_database():
+            airports, airlines = ensure_reference_data()
+            seed_flights(options['flights'], airports, airlines, seed=options['seed'])
+            flight_ids = list(Flight.objects.values_list('pk', flat=True))
+            user_ids = seed_users(50)
+            seed_reviews(options['reviews'], user_ids, flight_ids, seed=options['seed'])
+            timetable.invalidate()
+            timetable.ensure_loaded()
+
+            latency = options['db_latency_ms'] / 1000
+
+            def slow_query(execute, sql, params, many, context):
+                time.sleep(latency)
+                return execute(sql, params, many, context)
+
+            def add_latency(connection, **kwargs):
+                connection.execute_wrappers.append(slow_query)
+
+            if latency:
+                connection_created.connect(add_latency)
+                for connection in connections.all(initialized_only=True):
+                    add_latency(connection)
+
+            rng = random.Random(options['seed'])
+            n = options['requests']
+            endpoints = {
+                'search_results': [
+                    reverse('search_results') + '?departure_airport={}&destination_airport={}'.format(
+                        *rng.sample(airports, 2)) for _ in range(n)
+                ],
+                'price_map_api': [reverse('price_map_api') + f'?origin={rng.choice(airports)}' for _ in range(n)],
+                'flight_detail': [reverse('flight_detail', args=[rng.choice(flight_ids)]) for _ in range(n)],
+            }
+
+            self.stdout.write(
+                f"{'endpoint':<16} {'handler':<6} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+            )
+            try:
+                for name, urls in endpoints.items():
+                    run_wsgi(urls[:20], 4)
+                    for handler, (samples, seconds) in (
+                        ('wsgi', run_wsgi(urls, options['concurrency'])),
+                        ('asgi', asyncio.run(run_asgi(urls, options['concurrency']))),
+                    ):
+                        self.stdout.write(
+                            f'{name:<16} {handler:<6} {len(samples) / seconds:>9.1f} {percentile(samples, 50):>8.2f} '
+                            f'{percentile(samples, 95):>8.2f} {percentile(samples, 99):>8.2f}'
+                        )
+            finally:
+                connection_created.disconnect(add_latency)
@@ -0,0 +1,70 @@
+# flight_management/management/commands/bench_confirmations.py
+
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+
+from flight_management.bench import (
+    count_queries, ensure_reference_data, seed_flights, seed_users, throwaway_database,
+)
+from flight_management.confirmation import confirm_booking, confirm_bookings
+from flight_management.models import Booking, Flight
+
+
+def pending_bookings(count, user_ids, flight_ids):
+    Booking.objects.bulk_create([
+        Booking(user_id=user_ids[i % len(user_ids)], flight_id=flight_ids[i % len(flight_ids)],
+                seat_class='ECONOMY', total_fare=100, status='PENDING')
+        for i in range(count)
+    ])
+    return list(Booking.objects.filter(status='PENDING').order_by('-pk').values_list('pk', flat=True)[:count])
+
+
+class Command(BaseCommand):
+    help = (
+        'Confirmation throughput against a throwaway test database: one booking per call, '
+        'batches of --batch-size, and replays of already-confirmed idempotency keys.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=2_000)
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        n, batch_size = options['bookings'], options['batch_size']
+        with throwaway_database():
+            airports, airlines = ensure_reference_data()
+            seed_flights(200, airports, airlines)
+            flight_ids = list(Flight.objects.values_list('pk', flat=True))
+            user_ids = seed_users(50)
+
+            self.stdout.write(f"{'mode':<8} {'bookings':>9} {'seconds':>8} {'bookings/s':>11} {'queries/booking':>16}")
+
+            def report(mode, count, seconds, queries):
+                self.stdout.write(f'{mode:<8} {count:>9} {seconds:>8.2f} {count / seconds:>11.0f} {queries / count:>16.2f}')
+
+            bookings = Booking.objects.in_bulk(pending_bookings(n, user_ids, flight_ids))
+            keys = {pk: uuid.uuid4().hex for pk in bookings}
+            with count_queries() as queries:
+                started = time.perf_counter()
+                for pk, booking in bookings.items():
+                    confirm_booking(booking, idempotency_key=keys[pk])
+                seconds = time.perf_counter() - started
+            report('single', n, seconds, queries.count)
+
+            with count_queries() as queries:
+                started = time.perf_counter()
+                for pk, booking in bookings.items():
+                    payment, created = confirm_booking(booking, idempotency_key=keys[pk])
+                    assert payment is not None and not created
+                seconds = time.perf_counter() - started
+            report('replay', n, seconds, queries.count)
+
+            booking_ids = pending_bookings(n, user_ids, flight_ids)
+            with count_queries() as queries:
+                started = time.perf_counter()
+                for start in range(0, n, batch_size):
+                    confirm_bookings(booking_ids[start:start + batch_size], idempotency_key=uuid.uuid4().hex)
+                seconds = time.perf_counter() - started
+            report('batch', n, seconds, queries.count)
@@ -0,0 +1,42 @@
+# flight_management/management/commands/bench_connections.py
+
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from flight_management.bench import ensure_reference_data, percentile, seed_flights, throwaway_database, time_calls
+from flight_management.routing import ConnectionSearch
+from flight_management.timetable import TimetableIndex
+
+
+class Command(BaseCommand):
+    help = 'Time connection searches over one day holding a large synthetic schedule.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--flights', type=int, default=20_000, help='Flights departing on the searched day.')
+        parser.add_argument('--searches', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        with throwaway_database():
+            airports, airlines = ensure_reference_data()
+            seed_flights(options['flights'], airports, airlines, days=1, seed=options['seed'])
+            index = TimetableIndex()
+            index.rebuild()
+            search = ConnectionSearch(index)
+            day = timezone.localdate()
+            started = time.perf_counter()
+            search.graph_for(day)
+            graph_ms = (time.perf_counter() - started) * 1000
+            rng = random.Random(options['seed'])
+            routes = [tuple(rng.sample(airports, 2)) for _ in range(options['searches'])]
+            samples = time_calls(lambda origin, destination: search.search(origin, destination, day), routes)
+
+        self.stdout.write(f"{options['flights']} flights on one day across {len(airports)} airports, "
+                          f'graph built in {graph_ms:.0f} ms')
+        self.stdout.write(
+            f'search p50 {percentile(samples, 50):.1f} ms  p95 {percentile(samples, 95):.1f} ms  '
+            f'p99 {percentile(samples, 99):.1f} ms'
+        )
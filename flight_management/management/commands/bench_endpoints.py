@@ -0,0 +1,63 @@
+# flight_management/management/commands/bench_endpoints.py
+
+import json
+import platform
+import subprocess
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from flight_management.bench import run_endpoint_suite, throwaway_database
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True, cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway test database and drive search, booking, payment, dashboard and price-map '
+        'through the test client. Prints p50/p95/p99 latency, queries per request and throughput as JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--flights', type=int, default=10_000)
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--bookings', type=int, default=2_000)
+        parser.add_argument('--reviews', type=int, default=2_000)
+        parser.add_argument('--requests', type=int, default=200, help='Measured requests per endpoint.')
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        with throwaway_database():
+            results = run_endpoint_suite(
+                flights=options['flights'], users=options['users'], bookings=options['bookings'],
+                reviews=options['reviews'], requests=options['requests'], warmup=options['warmup'],
+                seed=options['seed'], stdout=self.stderr,
+            )
+
+        report = {
+            'commit': git_commit(),
+            'created': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            **results,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as fp:
+                fp.write(output + '\n')
+            self.stderr.write(f"Wrote {options['output']}")
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,89 @@
+# flight_management/management/commands/bench_inventory.py
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from flight_management.bench import ensure_reference_data
+from flight_management.inventory import reserve_seats
+from flight_management.models import Booking, Flight
+
+
+def book_atomic(flight_id, user):
+    with transaction.atomic():
+        if not reserve_seats(flight_id, 'ECONOMY', 1):
+            return False
+        Booking.objects.create(user=user, flight_id=flight_id, seat_class='ECONOMY', total_fare=100, status='PENDING')
+        return True
+
+
+def book_legacy(flight_id, user):
+    # The read-subtract-save sequence book_flight_view used before inventory.py.
+    flight = Flight.objects.get(pk=flight_id)
+    if flight.economy_seats < 1:
+        return False
+    Booking.objects.create(user=user, flight=flight, seat_class='ECONOMY', total_fare=100, status='PENDING')
+    flight.economy_seats -= 1
+    flight.save()
+    return True
+
+
+class Command(BaseCommand):
+    help = ('Hammer one flight with concurrent bookings and check for oversell. '
+            'Writes and then deletes real rows, so run it against a disposable database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seats', type=int, default=100)
+        parser.add_argument('--attempts', type=int, default=500)
+        parser.add_argument('--threads', type=int, default=32)
+        parser.add_argument('--legacy', action='store_true', help='Also run the old read-modify-write path.')
+
+    def handle(self, *args, **options):
+        airports, airlines = ensure_reference_data()
+        user, _ = User.objects.get_or_create(username='bench_inventory')
+        modes = [('atomic', book_atomic)] + ([('legacy', book_legacy)] if options['legacy'] else [])
+        for name, book in modes:
+            departure = timezone.now() + timedelta(days=30)
+            flight = Flight.objects.create(
+                airline_id=airlines[0], departure_airport_id=airports[0], destination_airport_id=airports[1],
+                departure_time=departure, arrival_time=departure + timedelta(hours=2),
+                economy_price=100, economy_seats=options['seats'], business_price=500, business_seats=0,
+            )
+            try:
+                succeeded, elapsed = self.run(book, flight.pk, user, options['attempts'], options['threads'])
+                remaining = Flight.objects.get(pk=flight.pk).economy_seats
+                booked = Booking.objects.filter(flight_id=flight.pk).count()
+                oversold = max(0, booked - options['seats'])
+                self.stdout.write(
+                    f'{name:>7}: {options["attempts"]} attempts on {options["seats"]} seats, '
+                    f'{options["threads"]} threads -> {succeeded} booked, {remaining} seats left, '
+                    f'{oversold} oversold, {options["attempts"] / elapsed:.0f} attempts/s, '
+                    f'{succeeded / elapsed:.0f} bookings/s'
+                )
+                if name == 'atomic' and (oversold or remaining != options['seats'] - booked):
+                    self.stderr.write(self.style.ERROR('Inventory drifted from bookings under contention.'))
+            finally:
+                flight.delete()
+
+    @staticmethod
+    def run(book, flight_id, user, attempts, threads):
+        start = threading.Barrier(threads)
+        per_thread = [attempts // threads + (1 if i < attempts % threads else 0) for i in range(threads)]
+
+        def worker(count):
+            start.wait()
+            try:
+                return sum(1 for _ in range(count) if book(flight_id, user))
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            succeeded = sum(pool.map(worker, per_thread))
+        return succeeded, time.perf_counter() - started
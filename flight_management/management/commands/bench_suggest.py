@@ -0,0 +1,68 @@
+# flight_management/management/commands/bench_suggest.py
+
+import itertools
+import random
+import string
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+from flight_management.bench import (
+    ensure_reference_data, percentile, seed_flights, throwaway_database, time_calls,
+)
+from flight_management.models import Airport
+from flight_management.reference import reference
+from flight_management.suggest import SuggestIndex, route_popularity
+
+SYLLABLES = ['sa', 'são', 'pau', 'lo', 'ber', 'lin', 'mün', 'chen', 'kra', 'ków', 'san', 'ti', 'a', 'go', 'ré', 'union']
+
+
+class Command(BaseCommand):
+    help = 'Time airport suggestions per keystroke over a large synthetic airport table, in the index and through the API.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--airports', type=int, default=5_000)
+        parser.add_argument('--flights', type=int, default=50_000)
+        parser.add_argument('--queries', type=int, default=500, help='Airports whose names are typed one key at a time.')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with throwaway_database():
+            names = [
+                ' '.join(''.join(rng.choices(SYLLABLES, k=rng.randrange(2, 4))).title() for _ in range(2))
+                for _ in range(options['airports'])
+            ]
+            taken = set(Airport.objects.values_list('airport_code', flat=True))
+            codes = (''.join(letters) for letters in itertools.product(string.ascii_uppercase, repeat=3))
+            Airport.objects.bulk_create([
+                Airport(airport_code=code, airport_name=f'{name} International', location=f'{name}, Benchland')
+                for code, name in zip((code for code in codes if code not in taken), names)
+            ])
+            airports, airlines = ensure_reference_data()
+            seed_flights(options['flights'], airports, airlines, seed=options['seed'])
+
+            snapshot = reference.current()
+            started = time.perf_counter()
+            index = SuggestIndex(snapshot.version, snapshot.airports, route_popularity())
+            build_ms = (time.perf_counter() - started) * 1000
+
+            keystrokes = [
+                (name[:length],)
+                for name in rng.sample(names, min(options['queries'], len(names)))
+                for length in range(1, len(name) + 1)
+            ]
+            index_samples = time_calls(index.suggest, keystrokes)
+            client, url = Client(), reverse('airport_suggest_api')
+            client.get(url, {'q': 'warm'})
+            api_samples = time_calls(lambda query: client.get(url, {'q': query}), keystrokes)
+
+        self.stdout.write(f'{len(snapshot.airports)} airports, index built in {build_ms:.1f} ms, '
+                          f'{len(keystrokes)} keystrokes')
+        for label, samples in (('index', index_samples), ('api', api_samples)):
+            self.stdout.write(
+                f'{label:<6} p50 {percentile(samples, 50):.3f} ms  p95 {percentile(samples, 95):.3f} ms  '
+                f'p99 {percentile(samples, 99):.3f} ms'
+            )
@@ -0,0 +1,66 @@
+# flight_management/management/commands/bench_timetable.py
+
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from flight_management.bench import count_queries, ensure_reference_data, percentile, seed_flights, time_calls
+from flight_management.models import Airport, Flight
+from flight_management.timetable import TimetableIndex
+
+
+def queryset_search(origin, destination, passengers):
+    # The search_results path before the timetable index, including the lazy
+    # relation loads search_results.html used to trigger for every card.
+    flights = Flight.objects.filter(
+        departure_airport__airport_code=origin, destination_airport__airport_code=destination,
+        economy_seats__gte=passengers,
+    )
+    Airport.objects.get(airport_code=origin)
+    Airport.objects.get(airport_code=destination)
+    for flight in flights:
+        flight.airline.airline_name, flight.departure_airport.airport_code, flight.destination_airport.airport_code
+
+
+class Command(BaseCommand):
+    help = 'Compare the in-memory timetable index with the queryset search path at several table sizes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[10_000, 100_000, 1_000_000])
+        parser.add_argument('--searches', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'flights':>10} {'build ms':>10} {'qs p50':>8} {'qs p95':>8} {'qs q/req':>9} "
+                          f"{'idx p50':>8} {'idx p95':>8} {'idx q/req':>9}")
+        for size in options['sizes']:
+            # Everything is seeded inside a transaction that is rolled back afterwards.
+            with transaction.atomic():
+                airports, airlines = ensure_reference_data()
+                seed_flights(size, airports, airlines, seed=options['seed'])
+                rng = random.Random(options['seed'])
+                searches = [(*rng.sample(airports, 2), 1) for _ in range(options['searches'])]
+
+                with count_queries() as qs_queries:
+                    qs_samples = time_calls(queryset_search, searches)
+
+                index = TimetableIndex()
+                started = time.perf_counter()
+                index.rebuild()
+                build_ms = (time.perf_counter() - started) * 1000
+                with count_queries() as idx_queries:
+                    idx_samples = time_calls(
+                        lambda origin, destination, passengers: index.search(origin, destination, 'ECONOMY', passengers),
+                        searches,
+                    )
+                transaction.set_rollback(True)
+
+            self.stdout.write(
+                f'{size:>10} {build_ms:>10.0f} '
+                f'{percentile(qs_samples, 50):>8.2f} {percentile(qs_samples, 95):>8.2f} '
+                f'{qs_queries.count / len(searches):>9.1f} '
+                f'{percentile(idx_samples, 50):>8.3f} {percentile(idx_samples, 95):>8.3f} '
+                f'{idx_queries.count / len(searches):>9.1f}'
+            )
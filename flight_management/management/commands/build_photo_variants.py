@@ -0,0 +1,28 @@
+# flight_management/management/commands/build_photo_variants.py
+
+from django.core.management.base import BaseCommand
+
+from flight_management.models import PassengerProfile
+from flight_management.photos import ensure_variants
+
+
+class Command(BaseCommand):
+    help = (
+        'Make the resized variants of every stored profile photo ahead of time. Variants are '
+        'otherwise made the first time a page shows a photo uploaded before they existed.'
+    )
+
+    def handle(self, *args, **options):
+        field = PassengerProfile._meta.get_field('profile_photo')
+        names = PassengerProfile.objects.exclude(profile_photo='').exclude(profile_photo__isnull=True).values_list(
+            'profile_photo', flat=True,
+        ).distinct()
+        digests = set()
+        for name in names.iterator():
+            try:
+                variants = ensure_variants(name, field.storage)
+            except OSError as e:
+                self.stderr.write(f'{name}: skipped, {e}')
+                continue
+            digests.add(variants['full'])
+        self.stdout.write(f'{len(digests)} distinct photos have variants.')
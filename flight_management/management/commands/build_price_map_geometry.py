@@ -0,0 +1,30 @@
+# flight_management/management/commands/build_price_map_geometry.py
+
+import gzip
+import json
+import os
+
+from django.core.management.base import BaseCommand
+
+from flight_management.geo import DETAIL_LEVELS, SOURCE_GEOJSON, TOPOLOGY_DIR, build_all, topology_path
+from flight_management.models import Airport
+
+
+class Command(BaseCommand):
+    help = 'Build the simplified, quantized TopoJSON country layers used by /api/price-map/layer/.'
+
+    def handle(self, *args, **options):
+        locations = Airport.objects.values_list('location', flat=True)
+        topologies = build_all(locations)
+        os.makedirs(TOPOLOGY_DIR, exist_ok=True)
+        source_size = os.path.getsize(SOURCE_GEOJSON)
+        self.stdout.write(f'source {os.path.basename(SOURCE_GEOJSON)}: {source_size / 1024:.0f} KB')
+        for detail in DETAIL_LEVELS:
+            body = json.dumps(topologies[detail], separators=(',', ':')).encode()
+            with open(topology_path(detail), 'wb') as fp:
+                fp.write(body)
+            arcs = topologies[detail]['arcs']
+            self.stdout.write(
+                f'{detail:>6}: {sum(len(a) for a in arcs)} points, {len(body) / 1024:.0f} KB, '
+                f'{len(gzip.compress(body, compresslevel=9)) / 1024:.0f} KB gzipped'
+            )
@@ -0,0 +1,64 @@
+# flight_management/management/commands/dedupe_profile_photos.py
+# One-off backfill for photos uploaded before originals were content addressed:
+# every copy is moved to its <sha256> name, so identical files collapse into one,
+# the profiles are pointed at it, and the old names are deleted.
+
+import os
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from flight_management.models import PassengerProfile
+from flight_management.photos import _digest_name, _sha256
+
+PHOTO_DIR = 'profile_photos'
+
+
+class Command(BaseCommand):
+    help = (
+        'Store every profile photo under the SHA-256 of its bytes, repoint the profiles and '
+        'delete the duplicate originals. The shared default picture is left where it is.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without changing it.')
+
+    def handle(self, *args, **options):
+        field = PassengerProfile._meta.get_field('profile_photo')
+        storage = field.storage
+        default = field.get_default()
+        moved = removed = saved_bytes = 0
+        seen = set()
+        for filename in sorted(storage.listdir(PHOTO_DIR)[1]):
+            name = f'{PHOTO_DIR}/{filename}'
+            stem, extension = os.path.splitext(filename)
+            if name == default or _digest_name.match(stem):
+                continue
+            try:
+                with storage.open(name, 'rb') as fp:
+                    digest = _sha256(fp)
+            except OSError as e:
+                self.stderr.write(f'{name}: skipped, {e}')
+                continue
+            target = f'{PHOTO_DIR}/{digest}{extension.lower()}'
+            duplicate = target in seen or storage.exists(target)
+            seen.add(target)
+            if options['dry_run']:
+                self.stdout.write(f'{name} -> {target}{" (duplicate)" if duplicate else ""}')
+                continue
+            if not duplicate:
+                with storage.open(name, 'rb') as fp:
+                    # ContentAddressedStorage names the copy by its digest.
+                    target = storage.save(name, fp)
+            with transaction.atomic():
+                moved += PassengerProfile.objects.filter(profile_photo=name).update(profile_photo=target)
+            if duplicate:
+                saved_bytes += storage.size(name)
+            storage.delete(name)
+            removed += 1
+        if options['dry_run']:
+            return
+        self.stdout.write(
+            f'{removed} originals renamed or removed ({saved_bytes:,} bytes of duplicates freed), '
+            f'{moved} profiles repointed.'
+        )
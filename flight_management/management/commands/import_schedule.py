@@ -0,0 +1,34 @@
+# flight_management/management/commands/import_schedule.py
+
+from django.core.management.base import BaseCommand
+
+from flight_management.importer import FORMATS, ScheduleImporter
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream airports, airlines and flights from CSV or JSON-lines files (optionally .gz) '
+        'into the database with batched upserts. Columns are the model field names; flights '
+        'name their airline and airports by code and may carry a flight_id to update.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--airports', nargs='*', default=[], metavar='FILE')
+        parser.add_argument('--airlines', nargs='*', default=[], metavar='FILE')
+        parser.add_argument('--flights', nargs='*', default=[], metavar='FILE')
+        parser.add_argument('--format', choices=FORMATS, help='Default: csv for *.csv, otherwise jsonl.')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per upsert and transaction.')
+
+    def handle(self, *args, **options):
+        importer = ScheduleImporter(options['chunk_size'], stdout=self.stdout, verbosity=options['verbosity'])
+        # Reference data first so flights can resolve the codes it adds.
+        for kind in ('airports', 'airlines', 'flights'):
+            for path in options[kind]:
+                imported, rejected, seconds = importer.run(kind, path, options['format'])
+                rate = imported / seconds if seconds else 0
+                self.stdout.write(
+                    f'{path}: {imported} {kind} imported, {rejected} rejected in {seconds:.1f}s ({rate:,.0f} rows/s)'
+                )
+        if options['flights']:
+            importer.reset_sequences()
+        importer.announce()
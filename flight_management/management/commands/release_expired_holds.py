@@ -0,0 +1,25 @@
+# flight_management/management/commands/release_expired_holds.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from flight_management.holds import SEAT_HOLD_MINUTES, release_expired_holds
+
+
+class Command(BaseCommand):
+    help = f'Expire PENDING bookings older than SEAT_HOLD_MINUTES ({SEAT_HOLD_MINUTES}) and release their seats.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--loop', action='store_true', help='Keep running as a background worker.')
+        parser.add_argument('--interval', type=int, default=60, help='Seconds between sweeps with --loop.')
+
+    def handle(self, *args, **options):
+        while True:
+            bookings, seats = release_expired_holds(batch_size=options['batch_size'])
+            if bookings or options['verbosity'] > 1:
+                self.stdout.write(f'Expired {bookings} held booking(s), released {seats} seat(s).')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
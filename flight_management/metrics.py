@@ -0,0 +1,393 @@
+# flight_management/metrics.py
+# Per-view request metrics: latency histogram, SQL count and time, template render
+# time (and the queries issued while rendering, where template N+1s show up).
+# Collected by RequestMetricsMiddleware, exposed by metrics_view (Prometheus text)
+# and metrics_json_view. Workers behind one port can't be scraped one by one, so
+# each process writes its counters to its own file in METRICS_DIR about once a
+# second and a scrape adds up every file there, as prometheus_client's
+# multiprocess mode does. A scrape folds the files of workers that have exited
+# into retired.json, so restarts don't leave one file per pid ever used.
+
+import json
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+FLUSH_SECONDS = 1
+RETIRED = 'retired.json'
+# A fold left unfinished this long ago (its process died) no longer blocks the next one.
+STALE_LOCK_SECONDS = 60
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestSample:
+    __slots__ = ('queries', 'sql_seconds', 'template_seconds', 'template_queries')
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.template_queries = 0
+
+
+def _record_query(execute, sql, params, many, context):
+    sample = _current.get()
+    if sample is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        sample.queries += 1
+        sample.sql_seconds += time.perf_counter() - started
+
+
+def instrument_connection(connection, **kwargs):
+    # Every connection gets the wrapper once; it is a no-op outside a measured request.
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+connection_created.connect(instrument_connection)
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        sample = _current.get()
+        if sample is None:
+            return super().render(context, request)
+        started, queries = time.perf_counter(), sample.queries
+        try:
+            return super().render(context, request)
+        finally:
+            sample.template_seconds += time.perf_counter() - started
+            sample.template_queries += sample.queries - queries
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates backend whose top-level renders are timed for the current request."""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return InstrumentedTemplate(super().get_template(template_name).template, self)
+
+
+class ViewStats:
+    __slots__ = ('buckets', 'count', 'seconds', 'queries', 'sql_seconds', 'template_seconds',
+                 'template_queries', 'over_budget')
+    TOTALS = __slots__[1:]
+
+    def __init__(self):
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.count = 0
+        self.seconds = 0.0
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.template_queries = 0
+        self.over_budget = 0
+
+    def as_dict(self):
+        return {
+            'requests': self.count,
+            'latency_buckets': dict(zip((str(le) for le in LATENCY_BUCKETS), self.buckets)),
+            'mean_ms': round(self.seconds / self.count * 1000, 3) if self.count else 0.0,
+            'queries_per_request': round(self.queries / self.count, 2) if self.count else 0.0,
+            'sql_ms_per_request': round(self.sql_seconds / self.count * 1000, 3) if self.count else 0.0,
+            'template_ms_per_request': round(self.template_seconds / self.count * 1000, 3) if self.count else 0.0,
+            'template_queries_per_request': round(self.template_queries / self.count, 2) if self.count else 0.0,
+            'over_budget': self.over_budget,
+        }
+
+    def dump(self):
+        return {'buckets': self.buckets, **{name: getattr(self, name) for name in self.TOTALS}}
+
+    def add(self, dumped):
+        self.buckets = [mine + theirs for mine, theirs in zip(self.buckets, dumped['buckets'])]
+        for name in self.TOTALS:
+            setattr(self, name, getattr(self, name) + dumped[name])
+
+
+def metrics_dir():
+    return getattr(settings, 'METRICS_DIR', None)
+
+
+def _exited(pid):
+    # Only POSIX can ask after a process without touching it (os.kill on Windows terminates).
+    if os.name != 'posix' or pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        # Alive, but run by another user.
+        return False
+    return False
+
+
+class MetricsRegistry:
+    """
+    This process's counters, written to METRICS_DIR/<pid>.json by a background
+    thread whenever they changed. Reads add up every process's file; without a
+    METRICS_DIR they cover this process only.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+        self._pid = None
+        self._dirty = False
+
+    def _path(self, directory):
+        return os.path.join(directory, f'{self._pid}.json')
+
+    def _start(self):
+        # First record in this process (a forked worker inherits the parent's registry).
+        self._pid = os.getpid()
+        self._views = {}
+        directory = metrics_dir()
+        if directory:
+            # A worker given a dead worker's pid carries on from its counts rather than erasing them.
+            for view, dumped in self._read(self._path(directory)).items():
+                self._views[view] = ViewStats()
+                self._views[view].add(dumped)
+        threading.Thread(target=self._flush_every_second, name='metrics-flush', daemon=True).start()
+
+    def _flush_every_second(self):
+        pid = self._pid
+        while self._pid == pid:
+            time.sleep(FLUSH_SECONDS)
+            if self._dirty:
+                self.flush()
+
+    def flush(self):
+        directory = metrics_dir()
+        if not directory or self._pid is None:
+            return
+        with self._lock:
+            dumped = {view: stats.dump() for view, stats in self._views.items()}
+            self._dirty = False
+        path = self._path(directory)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            self._write(path, dumped)
+        except OSError:
+            self._dirty = True
+            logger.exception('Could not write request metrics to %s', path)
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path) as fp:
+                return json.load(fp)
+        except (OSError, ValueError):
+            return {}
+
+    @staticmethod
+    def _write(path, dumped):
+        with open(f'{path}.tmp', 'w') as fp:
+            json.dump(dumped, fp)
+        os.replace(f'{path}.tmp', path)
+
+    def _retire_exited(self, directory):
+        # Fold exited workers' counts into retired.json, keeping every total, so the
+        # directory stays one file per live worker. One scrape folds at a time.
+        exited = [
+            name for name in os.listdir(directory)
+            if name.endswith('.json') and name[:-5].isdigit() and _exited(int(name[:-5]))
+        ]
+        if not exited:
+            return
+        lock = os.path.join(directory, 'retired.lock')
+        try:
+            if time.time() - os.path.getmtime(lock) > STALE_LOCK_SECONDS:
+                os.remove(lock)
+        except OSError:
+            pass
+        try:
+            os.close(os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            return
+        try:
+            retired = {}
+            for view, dumped in self._read(os.path.join(directory, RETIRED)).items():
+                retired[view] = ViewStats()
+                retired[view].add(dumped)
+            for name in exited:
+                for view, dumped in self._read(os.path.join(directory, name)).items():
+                    retired.setdefault(view, ViewStats()).add(dumped)
+            self._write(os.path.join(directory, RETIRED), {view: stats.dump() for view, stats in retired.items()})
+            for name in exited:
+                try:
+                    os.remove(os.path.join(directory, name))
+                except FileNotFoundError:
+                    pass
+        except OSError:
+            logger.exception('Could not fold exited workers\' metrics in %s', directory)
+        finally:
+            os.remove(lock)
+
+    def collect(self):
+        """{view: ViewStats} summed over every process."""
+        directory = metrics_dir()
+        if not directory:
+            with self._lock:
+                views = {}
+                for view, stats in self._views.items():
+                    views[view] = ViewStats()
+                    views[view].add(stats.dump())
+                return views
+        self.flush()
+        if os.path.isdir(directory):
+            self._retire_exited(directory)
+        views = {}
+        for name in os.listdir(directory) if os.path.isdir(directory) else ():
+            if name.endswith('.json'):
+                for view, dumped in self._read(os.path.join(directory, name)).items():
+                    views.setdefault(view, ViewStats()).add(dumped)
+        return views
+
+    def record(self, view, seconds, sample, over_budget):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._start()
+            self._dirty = True
+            stats = self._views.get(view)
+            if stats is None:
+                stats = self._views[view] = ViewStats()
+            for i, le in enumerate(LATENCY_BUCKETS):
+                if seconds <= le:
+                    stats.buckets[i] += 1
+            stats.count += 1
+            stats.seconds += seconds
+            stats.queries += sample.queries
+            stats.sql_seconds += sample.sql_seconds
+            stats.template_seconds += sample.template_seconds
+            stats.template_queries += sample.template_queries
+            stats.over_budget += over_budget
+
+    def snapshot(self):
+        return {view: stats.as_dict() for view, stats in sorted(self.collect().items())}
+
+    def reset(self):
+        # Forget every process's counts.
+        with self._lock:
+            self._views.clear()
+        directory = metrics_dir()
+        if directory and os.path.isdir(directory):
+            for name in os.listdir(directory):
+                try:
+                    os.remove(os.path.join(directory, name))
+                except FileNotFoundError:
+                    pass
+
+    def prometheus(self):
+        views = sorted(self.collect().items())
+        lines = [
+            '# HELP aeropulse_request_duration_seconds Request latency by URL name.',
+            '# TYPE aeropulse_request_duration_seconds histogram',
+        ]
+        for view, stats in views:
+            for le, count in zip(LATENCY_BUCKETS, stats.buckets):
+                lines.append(f'aeropulse_request_duration_seconds_bucket{{view="{view}",le="{le}"}} {count}')
+            lines.append(f'aeropulse_request_duration_seconds_bucket{{view="{view}",le="+Inf"}} {stats.count}')
+            lines.append(f'aeropulse_request_duration_seconds_sum{{view="{view}"}} {stats.seconds:.6f}')
+            lines.append(f'aeropulse_request_duration_seconds_count{{view="{view}"}} {stats.count}')
+        for name, attribute, help_text in (
+            ('sql_queries_total', 'queries', 'SQL queries executed.'),
+            ('sql_seconds_total', 'sql_seconds', 'Time spent in SQL.'),
+            ('template_seconds_total', 'template_seconds', 'Time spent rendering templates.'),
+            ('template_queries_total', 'template_queries', 'SQL queries executed while rendering templates.'),
+            ('over_budget_total', 'over_budget', 'Requests over their query or latency budget.'),
+        ):
+            lines.append(f'# HELP aeropulse_request_{name} {help_text}')
+            lines.append(f'# TYPE aeropulse_request_{name} counter')
+            for view, stats in views:
+                value = getattr(stats, attribute)
+                value = f'{value:.6f}' if isinstance(value, float) else value
+                lines.append(f'aeropulse_request_{name}{{view="{view}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def budget_for(view):
+    """
+    (max queries, max milliseconds) for a URL name: REQUEST_QUERY_BUDGET and
+    REQUEST_LATENCY_BUDGET_MS, overridden per view by REQUEST_BUDGETS, e.g.
+    {'dashboard': {'queries': 5, 'latency_ms': 200}}.
+    """
+    budget = getattr(settings, 'REQUEST_BUDGETS', {}).get(view, {})
+    return (
+        budget.get('queries', getattr(settings, 'REQUEST_QUERY_BUDGET', 30)),
+        budget.get('latency_ms', getattr(settings, 'REQUEST_LATENCY_BUDGET_MS', 500)),
+    )
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        # Connections opened before this middleware loaded missed connection_created.
+        for connection in connections.all(initialized_only=True):
+            instrument_connection(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        sample = RequestSample()
+        token = _current.set(sample)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, sample, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        # Sync code the request runs in threads sees the same sample through the copied context.
+        sample = RequestSample()
+        token = _current.set(sample)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, sample, time.perf_counter() - started)
+        return response
+
+    def finish(self, request, sample, seconds):
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name if match else None) or 'unresolved'
+        query_budget, latency_budget_ms = budget_for(view)
+        over_budget = sample.queries > query_budget or seconds * 1000 > latency_budget_ms
+        if over_budget:
+            logger.warning(
+                'Over budget: %s %s (%s) took %.1f ms with %d queries (%.1f ms SQL), template %.1f ms '
+                'with %d queries; budget %d queries, %d ms',
+                request.method, request.path, view, seconds * 1000, sample.queries, sample.sql_seconds * 1000,
+                sample.template_seconds * 1000, sample.template_queries, query_budget, latency_budget_ms,
+            )
+        registry.record(view, seconds, sample, over_budget)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flight_management', '0005_remove_booking_number_of_tickets_remove_flight_price_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='booking',
+            name='status',
+            field=models.CharField(choices=[('CONFIRMED', 'Confirmed'), ('CANCELLED', 'Cancelled'), ('PENDING', 'Pending'), ('EXPIRED', 'Expired')], default='PENDING', max_length=10),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_summaries(apps, schema_editor):
+    Booking = apps.get_model('flight_management', 'Booking')
+    BookingSummary = apps.get_model('flight_management', 'BookingSummary')
+
+    batch = []
+    bookings = Booking.objects.select_related('flight__airline', 'ticket', 'payment__invoice')
+    for booking in bookings.iterator(chunk_size=2000):
+        flight = booking.flight
+        ticket = getattr(booking, 'ticket', None)
+        payment = getattr(booking, 'payment', None)
+        invoice = getattr(payment, 'invoice', None) if payment else None
+        batch.append(BookingSummary(
+            booking_id=booking.pk, user_id=booking.user_id, flight_id=flight.pk,
+            airline_code=flight.airline.airline_code, airline_name=flight.airline.airline_name,
+            departure_code=flight.departure_airport_id, destination_code=flight.destination_airport_id,
+            departure_time=flight.departure_time, booking_date=booking.booking_date, status=booking.status,
+            seat_class=booking.seat_class, num_adults=booking.num_adults, num_children=booking.num_children,
+            num_infants=booking.num_infants, total_fare=booking.total_fare,
+            ticket_id=ticket.pk if ticket else None, invoice_id=invoice.pk if invoice else None,
+        ))
+        if len(batch) >= 2000:
+            BookingSummary.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        BookingSummary.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flight_management', '0006_booking_status_expired'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingSummary',
+            fields=[
+                ('booking', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='flight_management.booking')),
+                ('flight_id', models.IntegerField()),
+                ('airline_code', models.CharField(max_length=5)),
+                ('airline_name', models.CharField(max_length=50)),
+                ('departure_code', models.CharField(max_length=3)),
+                ('destination_code', models.CharField(max_length=3)),
+                ('departure_time', models.DateTimeField()),
+                ('booking_date', models.DateTimeField()),
+                ('status', models.CharField(choices=[('CONFIRMED', 'Confirmed'), ('CANCELLED', 'Cancelled'), ('PENDING', 'Pending'), ('EXPIRED', 'Expired')], max_length=10)),
+                ('seat_class', models.CharField(choices=[('ECONOMY', 'Economy'), ('BUSINESS', 'Business')], max_length=10)),
+                ('num_adults', models.PositiveIntegerField()),
+                ('num_children', models.PositiveIntegerField()),
+                ('num_infants', models.PositiveIntegerField()),
+                ('total_fare', models.DecimalField(decimal_places=2, max_digits=10, null=True)),
+                ('ticket_id', models.IntegerField(null=True)),
+                ('invoice_id', models.IntegerField(null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-booking_date'], name='flight_mana_user_id_386d4d_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:13
+
+import flight_management.photos
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flight_management', '0008_payment_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='passengerprofile',
+            name='profile_photo',
+            field=models.ImageField(blank=True, default='profile_photos/default.png', null=True, storage=flight_management.photos.ContentAddressedStorage(), upload_to='profile_photos/'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flight_management', '0009_passengerprofile_photo_storage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', '-booking_date'], name='flight_mana_user_id_284a69_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['status', 'booking_date'], name='flight_mana_status_9dabb3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(fields=['departure_airport', 'destination_airport', 'departure_time'], name='flight_mana_departu_f64235_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(fields=['departure_airport', 'economy_price'], name='flight_mana_departu_8186ea_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(fields=['departure_airport', 'business_price'], name='flight_mana_departu_8acc0c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-sent_date', 'is_read'], name='flight_mana_user_id_e1ba1c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['flight', '-review_date'], name='flight_mana_flight__7140fe_idx'),
+        ),
+    ]
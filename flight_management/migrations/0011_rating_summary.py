@@ -0,0 +1,64 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:29
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_ratings(apps, schema_editor):
+    Review = apps.get_model('flight_management', 'Review')
+    RatingSummary = apps.get_model('flight_management', 'RatingSummary')
+
+    counters = {
+        'count': Count('pk'), 'total': Sum('rating'),
+        **{f'stars_{stars}': Count('pk', filter=Q(rating=stars)) for stars in range(1, 6)},
+    }
+    groups = {
+        'FLIGHT': ('flight_id',),
+        'AIRLINE': ('flight__airline_id',),
+        'ROUTE': ('flight__departure_airport_id', 'flight__destination_airport_id'),
+    }
+    for scope, fields in groups.items():
+        RatingSummary.objects.bulk_create([
+            RatingSummary(scope=scope, key='-'.join(str(row.pop(field)) for field in fields), **row)
+            for row in Review.objects.values(*fields).annotate(**counters).order_by()
+        ], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('flight_management', '0010_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RatingSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('FLIGHT', 'Flight'), ('AIRLINE', 'Airline'), ('ROUTE', 'Route')], max_length=10)),
+                ('key', models.CharField(max_length=20)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('stars_1', models.PositiveIntegerField(default=0)),
+                ('stars_2', models.PositiveIntegerField(default=0)),
+                ('stars_3', models.PositiveIntegerField(default=0)),
+                ('stars_4', models.PositiveIntegerField(default=0)),
+                ('stars_5', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RemoveIndex(
+            model_name='review',
+            name='flight_mana_flight__7140fe_idx',
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['flight', '-review_date', '-review_id'], name='flight_mana_flight__8ee9b4_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='ratingsummary',
+            constraint=models.UniqueConstraint(fields=('scope', 'key'), name='unique_rating_summary'),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
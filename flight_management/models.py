@@ -3,6 +3,8 @@
 from django.db import models
 from django.contrib.auth.models import User
 
+from .photos import ContentAddressedStorage
+
 
 # --- Airport and Airline models are unchanged ---
 class Airport(models.Model):
@@ -40,6 +42,15 @@ class Flight(models.Model):
     business_price = models.DecimalField(max_digits=10, decimal_places=2)
     business_seats = models.PositiveIntegerField()
 
+    class Meta:
+        indexes = [
+            # Route searches, the fare calendar and the search API's keyset pages.
+            models.Index(fields=['departure_airport', 'destination_airport', 'departure_time']),
+            # Cheapest fares from an origin (explorer), per class.
+            models.Index(fields=['departure_airport', 'economy_price']),
+            models.Index(fields=['departure_airport', 'business_price']),
+        ]
+
     def __str__(
             self): return f"{self.airline.airline_name} - {self.departure_airport.airport_code} to {self.destination_airport.airport_code}"
 
@@ -50,8 +61,9 @@ class PassengerProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     phone_number = models.CharField(max_length=15)
     address = models.TextField()
+    # Identical uploads share one file; pages use the resized variants in photos.py.
     profile_photo = models.ImageField(upload_to='profile_photos/', null=True, blank=True,
-                                      default='profile_photos/default.png')
+                                      default='profile_photos/default.png', storage=ContentAddressedStorage())
     # ADDED: New gender field
     gender = models.CharField(max_length=10, choices=GENDER_CHOICES, null=True, blank=True)
 
@@ -60,7 +72,8 @@ class PassengerProfile(models.Model):
 
 # === BOOKING MODEL: MAJOR UPGRADE ===
 class Booking(models.Model):
-    BOOKING_STATUS_CHOICES = [('CONFIRMED', 'Confirmed'), ('CANCELLED', 'Cancelled'), ('PENDING', 'Pending')]
+    BOOKING_STATUS_CHOICES = [('CONFIRMED', 'Confirmed'), ('CANCELLED', 'Cancelled'), ('PENDING', 'Pending'),
+                              ('EXPIRED', 'Expired')]
     SEAT_CLASS_CHOICES = [('ECONOMY', 'Economy'), ('BUSINESS', 'Business')]
 
     booking_id = models.AutoField(primary_key=True)
@@ -79,6 +92,13 @@ class Booking(models.Model):
     num_infants = models.PositiveIntegerField(default=0)
     total_fare = models.DecimalField(max_digits=10, decimal_places=2, null=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-booking_date']),
+            # Expired holds: status='PENDING' and booking_date before the cutoff.
+            models.Index(fields=['status', 'booking_date']),
+        ]
+
     @property
     def total_passengers(self):
         # Infants don't occupy a seat
@@ -96,6 +116,8 @@ class Payment(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     payment_date = models.DateTimeField(auto_now_add=True)
     method = models.CharField(max_length=50)
+    # Client-supplied token; replaying it is a no-op (see confirmation.py).
+    idempotency_key = models.CharField(max_length=64, unique=True, null=True, blank=True)
 
     def __str__(self): return f"Payment {self.payment_id} for Booking {self.booking.booking_id}"
 
@@ -125,6 +147,10 @@ class Review(models.Model):
     comment = models.TextField(blank=True, null=True)
     review_date = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # review_id breaks ties, so a page of the newest reviews seeks and stops (see pagination.py).
+        indexes = [models.Index(fields=['flight', '-review_date', '-review_id'])]
+
     def __str__(self): return f"Review by {self.user.username}"
 
 
@@ -135,6 +161,12 @@ class Notification(models.Model):
     sent_date = models.DateTimeField(auto_now_add=True)
     is_read = models.BooleanField(default=False)
 
+    class Meta:
+        # The navbar's unread count and latest unread messages. is_read=False compiles to
+        # NOT is_read, which can't seek, so it trails: the user's rows are walked newest
+        # first and is_read is checked from the index, without a sort or a table read.
+        indexes = [models.Index(fields=['user', '-sent_date', 'is_read'])]
+
     def __str__(self): return f"Notification for {self.user.username}"
 
 
@@ -144,4 +176,64 @@ class Cancellation(models.Model):
     cancellation_date = models.DateTimeField(auto_now_add=True)
     refund_amount = models.DecimalField(max_digits=10, decimal_places=2)
 
-    def __str__(self): return f"Cancellation for Booking {self.booking.id}"
\ No newline at end of file
+    def __str__(self): return f"Cancellation for Booking {self.booking.id}"
+
+
+# === READ MODELS ===
+# Denormalized copies of data spread over several tables, maintained by summaries.py
+# and ratings.py.
+
+class BookingSummary(models.Model):
+    booking = models.OneToOneField(Booking, primary_key=True, related_name='summary', on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    flight_id = models.IntegerField()
+    airline_code = models.CharField(max_length=5)
+    airline_name = models.CharField(max_length=50)
+    departure_code = models.CharField(max_length=3)
+    destination_code = models.CharField(max_length=3)
+    departure_time = models.DateTimeField()
+    booking_date = models.DateTimeField()
+    status = models.CharField(max_length=10, choices=Booking.BOOKING_STATUS_CHOICES)
+    seat_class = models.CharField(max_length=10, choices=Booking.SEAT_CLASS_CHOICES)
+    num_adults = models.PositiveIntegerField()
+    num_children = models.PositiveIntegerField()
+    num_infants = models.PositiveIntegerField()
+    total_fare = models.DecimalField(max_digits=10, decimal_places=2, null=True)
+    ticket_id = models.IntegerField(null=True)
+    invoice_id = models.IntegerField(null=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['user', '-booking_date'])]
+
+    def __str__(self): return f"Summary of Booking {self.booking_id}"
+
+
+class RatingSummary(models.Model):
+    # Review ratings per flight (key: flight id), airline (airline code) and route ('LHR-JFK').
+    SCOPE_CHOICES = [('FLIGHT', 'Flight'), ('AIRLINE', 'Airline'), ('ROUTE', 'Route')]
+    scope = models.CharField(max_length=10, choices=SCOPE_CHOICES)
+    key = models.CharField(max_length=20)
+    count = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    stars_1 = models.PositiveIntegerField(default=0)
+    stars_2 = models.PositiveIntegerField(default=0)
+    stars_3 = models.PositiveIntegerField(default=0)
+    stars_4 = models.PositiveIntegerField(default=0)
+    stars_5 = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['scope', 'key'], name='unique_rating_summary')]
+
+    @property
+    def average(self):
+        return self.total / self.count if self.count else None
+
+    @property
+    def histogram(self):
+        """[(stars, count, percent of reviews)], five stars first."""
+        return [
+            (stars, getattr(self, f'stars_{stars}'), 100 * getattr(self, f'stars_{stars}') / self.count if self.count else 0)
+            for stars in range(5, 0, -1)
+        ]
+
+    def __str__(self): return f"{self.get_scope_display()} {self.key} rating"
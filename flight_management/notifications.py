@@ -0,0 +1,56 @@
+# flight_management/notifications.py
+# Per-user unread notification count plus the latest few unread messages, cached so
+# the navbar dropdown on every page does not hit the database. The cache must be
+# shared by all workers (see CACHES in settings.py and checks.py): an invalidation
+# only reaches the cache it is sent to.
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Notification
+from .replicas import primary
+
+NOTIFICATION_DROPDOWN_LIMIT = getattr(settings, 'NOTIFICATION_DROPDOWN_LIMIT', 5)
+NOTIFICATION_CACHE_SECONDS = getattr(settings, 'NOTIFICATION_CACHE_SECONDS', 60 * 60)
+
+
+def _cache_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def unread_summary(user_id):
+    """Return {'count': int, 'latest': [Notification, ...]} for user_id, from cache when possible."""
+    key = _cache_key(user_id)
+    summary = cache.get(key)
+    if summary is None:
+        unread = Notification.objects.filter(user_id=user_id, is_read=False)
+        # Cached until the next change, so never from a replica that may not have that change yet.
+        with primary():
+            summary = {
+                'count': unread.count(),
+                'latest': list(unread.order_by('-sent_date')[:NOTIFICATION_DROPDOWN_LIMIT]),
+            }
+        cache.set(key, summary, NOTIFICATION_CACHE_SECONDS)
+    return summary
+
+
+def invalidate_unread(user_id):
+    cache.delete(_cache_key(user_id))
+
+
+def mark_read(user_id, notification_ids=None):
+    # QuerySet.update() sends no signals, so invalidate here.
+    unread = Notification.objects.filter(user_id=user_id, is_read=False)
+    if notification_ids is not None:
+        unread = unread.filter(pk__in=notification_ids)
+    updated = unread.update(is_read=True)
+    if updated:
+        invalidate_unread(user_id)
+    return updated
+
+
+def notify(user_ids, message):
+    """Send the same message to many users with one INSERT."""
+    user_ids = list(user_ids)
+    Notification.objects.bulk_create([Notification(user_id=uid, message=message) for uid in user_ids])
+    cache.delete_many([_cache_key(uid) for uid in user_ids])
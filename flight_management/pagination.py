@@ -0,0 +1,76 @@
+# flight_management/pagination.py
+# Keyset (cursor) pagination: each page is "WHERE (a, b) > (last_a, last_b) ORDER BY a, b LIMIT n",
+# so page 1000 costs the same as page 1, unlike OFFSET.
+
+import base64
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder rounds times to milliseconds; a cursor short of its row repeats the page.
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), cls=CursorEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    """Return the cursor's key values, raising ValueError for anything malformed."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as exc:
+        raise ValueError('Invalid cursor.') from exc
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError('Invalid cursor.')
+    # Cursors only ever hold strings and integers; anything else would reach the ORM as a lookup value.
+    if not all(isinstance(value, (str, int)) and not isinstance(value, bool) for value in values):
+        raise ValueError('Invalid cursor.')
+    return values
+
+
+def cursor_values(model, fields, cursor):
+    """Decode cursor and convert each value to its field's type, raising ValueError for anything malformed."""
+    values = decode_cursor(cursor, len(fields))
+    try:
+        values = [model._meta.get_field(field).to_python(value) for field, value in zip(fields, values)]
+    except (ValidationError, OverflowError) as exc:
+        raise ValueError('Invalid cursor.') from exc
+    if None in values:
+        raise ValueError('Invalid cursor.')
+    return values
+
+
+def keyset_filter(fields, values, descending=False):
+    # (f1, f2) > (v1, v2)  ==  f1 > v1 OR (f1 = v1 AND f2 > v2)
+    lookup = 'lt' if descending else 'gt'
+    condition = Q()
+    for i, field in enumerate(fields):
+        equal = {fields[j]: values[j] for j in range(i)}
+        condition |= Q(**equal, **{f'{field}__{lookup}': values[i]})
+    return condition
+
+
+def keyset_page(queryset, fields, cursor=None, limit=20, descending=False):
+    """
+    Return (items, next_cursor) for the page after cursor, ordered by fields.
+    The last field must be unique (normally the primary key) to break ties.
+    """
+    if cursor:
+        queryset = queryset.filter(keyset_filter(fields, cursor_values(queryset.model, fields, cursor), descending))
+    queryset = queryset.order_by(*[f'-{field}' if descending else field for field in fields])
+    items = list(queryset[:limit + 1])
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(getattr(items[-1], field) for field in fields)
+    return items, next_cursor
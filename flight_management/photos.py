@@ -0,0 +1,113 @@
+# flight_management/photos.py
+# Profile photos: originals are stored under the SHA-256 of their bytes, so the same
+# picture uploaded twice is one file, and pages are served resized, recompressed
+# variants instead of the original. Variants are named by the original's digest and
+# made on upload, or on first use for photos stored before this existed.
+
+import hashlib
+import os
+import re
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.utils.deconstruct import deconstructible
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# name: (width, height, crop). Cropped variants fill the box, as the round avatars do;
+# the rest keep their aspect ratio within it. Sizes are twice the CSS size, for HiDPI.
+VARIANTS = {
+    'avatar': (64, 64, True),
+    'card': (300, 300, True),
+    'full': (1024, 1024, False),
+}
+VARIANT_DIR = 'profile_photos/variants'
+VARIANT_QUALITY = getattr(settings, 'PHOTO_VARIANT_QUALITY', 80)
+
+_digest_name = re.compile(r'^[0-9a-f]{64}$')
+
+
+def _sha256(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Saves each file as <directory>/<sha256><extension>; saving existing content is a no-op."""
+
+    def _save(self, name, content):
+        directory, filename = os.path.split(name)
+        name = os.path.join(directory, _sha256(content) + os.path.splitext(filename)[1].lower())
+        if self.exists(name):
+            return name
+        try:
+            return super()._save(name, content)
+        except FileExistsError:
+            # The same picture, uploaded concurrently.
+            return name
+
+
+def variant_name(digest, variant):
+    width, height, crop = VARIANTS[variant]
+    return f'{VARIANT_DIR}/{digest[:2]}/{digest}-{width}x{height}{"-crop" if crop else ""}.webp'
+
+
+def _render(image, variant):
+    width, height, crop = VARIANTS[variant]
+    if crop:
+        image = ImageOps.fit(image, (width, height), Image.LANCZOS)
+    else:
+        image = image.copy()
+        image.thumbnail((width, height), Image.LANCZOS)
+    out = BytesIO()
+    # WebP keeps transparency, so PNG avatars need no flattening; no metadata is carried over.
+    image.save(out, 'WEBP', quality=VARIANT_QUALITY, method=4)
+    return out.getvalue()
+
+
+def ensure_variants(name, storage=default_storage):
+    """
+    Make any missing variants of the photo `name` in `storage`; returns {variant: stored
+    name}. Variants always go to default_storage under their deterministic names.
+    """
+    stem = os.path.splitext(os.path.basename(name))[0]
+    digest = stem if _digest_name.match(stem) else None
+    if digest is None:
+        # Stored before uploads were content addressed: the digest costs one read.
+        with storage.open(name, 'rb') as fp:
+            digest = _sha256(fp)
+    names = {variant: variant_name(digest, variant) for variant in VARIANTS}
+    missing = [variant for variant, variant_file in names.items() if not default_storage.exists(variant_file)]
+    if missing:
+        with storage.open(name, 'rb') as fp, Image.open(fp) as original:
+            image = ImageOps.exif_transpose(original)
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+            for variant in missing:
+                default_storage.save(names[variant], ContentFile(_render(image, variant)))
+    return names
+
+
+def variant_url(photo, variant='full'):
+    """
+    URL of `variant` of an ImageField file. The answer is cached per stored name, so
+    after the first request for a photo this is a single cache read. Falls back to
+    the original if it cannot be read as an image.
+    """
+    if not photo:
+        return ''
+    # Hashed, as stored names may hold characters some cache backends refuse in keys.
+    key = 'photos:' + hashlib.sha1(f'{variant}:{VARIANTS[variant]}:{photo.name}'.encode()).hexdigest()
+    url = cache.get(key)
+    if url is None:
+        try:
+            url = default_storage.url(ensure_variants(photo.name, photo.storage)[variant])
+        except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+            return photo.url
+        cache.set(key, url, None)
+    return url
@@ -0,0 +1,75 @@
+# flight_management/ratings.py
+# Keeps RatingSummary in step with Review. Each review adds to (or, deleted, takes
+# from) the counters of its flight, airline and route with one UPDATE ... SET
+# count = count + 1 per row, so recording a review costs the same however many
+# reviews came before it, and concurrent reviews never lose an increment.
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+
+from .models import RatingSummary, Review
+
+STARS = range(1, 6)
+
+
+def rating_keys(flight):
+    return [
+        ('FLIGHT', str(flight.flight_id)),
+        ('AIRLINE', flight.airline_id),
+        ('ROUTE', f'{flight.departure_airport_id}-{flight.destination_airport_id}'),
+    ]
+
+
+def _adjust(scope, key, rating, sign):
+    changes = {'count': F('count') + sign, 'total': F('total') + sign * rating}
+    if rating in STARS:
+        changes[f'stars_{rating}'] = F(f'stars_{rating}') + sign
+    if RatingSummary.objects.filter(scope=scope, key=key).update(**changes) or sign < 0:
+        return
+    # The first review here. Another request may be creating the row too; then add to theirs.
+    initial = {'count': 1, 'total': rating}
+    if rating in STARS:
+        initial[f'stars_{rating}'] = 1
+    try:
+        with transaction.atomic():
+            RatingSummary.objects.create(scope=scope, key=key, **initial)
+    except IntegrityError:
+        RatingSummary.objects.filter(scope=scope, key=key).update(**changes)
+
+
+def record_rating(flight, rating, sign=1):
+    """Add (sign=1) or remove (sign=-1) one rating from the flight's, airline's and route's summaries."""
+    with transaction.atomic():
+        for scope, key in rating_keys(flight):
+            _adjust(scope, key, rating, sign)
+
+
+def summaries_for(flight):
+    """{'FLIGHT': RatingSummary or None, 'AIRLINE': ..., 'ROUTE': ...} in one query."""
+    keys = rating_keys(flight)
+    condition = Q()
+    for scope, key in keys:
+        condition |= Q(scope=scope, key=key)
+    found = {(summary.scope, summary.key): summary for summary in RatingSummary.objects.filter(condition)}
+    return {scope: found.get((scope, key)) for scope, key in keys}
+
+
+def rebuild_ratings():
+    """Recompute every summary from the Review table: for reviews loaded in bulk, or flights moved to another route."""
+    counters = {
+        'count': Count('pk'), 'total': Sum('rating'),
+        **{f'stars_{stars}': Count('pk', filter=Q(rating=stars)) for stars in STARS},
+    }
+    groups = {
+        'FLIGHT': ('flight_id',),
+        'AIRLINE': ('flight__airline_id',),
+        'ROUTE': ('flight__departure_airport_id', 'flight__destination_airport_id'),
+    }
+    summaries = []
+    for scope, fields in groups.items():
+        for row in Review.objects.values(*fields).annotate(**counters).order_by():
+            key = '-'.join(str(row.pop(field)) for field in fields)
+            summaries.append(RatingSummary(scope=scope, key=key, **row))
+    with transaction.atomic():
+        RatingSummary.objects.all().delete()
+        RatingSummary.objects.bulk_create(summaries, batch_size=1000)
@@ -0,0 +1,77 @@
+# flight_management/reference.py
+# Airports and airlines, which almost never change, held in every process as
+# read-only maps keyed by code. A version stamp in the shared cache says which
+# copy is current: a change to either table bumps it (see signals.py), and every
+# worker holding an older snapshot reloads on its next access.
+
+import threading
+import uuid
+from collections import namedtuple
+from types import MappingProxyType
+
+from asgiref.sync import sync_to_async
+
+from .coordination import cache
+from .models import Airline, Airport
+from .replicas import primary
+from .timetable import AirportRecord
+
+VERSION_KEY = 'reference:version'
+
+AirlineRecord = namedtuple('AirlineRecord', ['airline_code', 'airline_name'])
+
+
+class ReferenceSnapshot:
+    """One immutable copy of both tables, as of `version`."""
+
+    def __init__(self, version, airports, airlines):
+        self.version = version
+        self.airports = MappingProxyType({row[0]: AirportRecord(*row) for row in airports})
+        self.airlines = MappingProxyType({row[0]: AirlineRecord(*row) for row in airlines})
+
+
+def _current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # First use, or evicted: whichever worker gets here first decides the stamp.
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+class ReferenceData:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+
+    def current(self):
+        """The snapshot for the current version: one cache read, and two queries after a bump."""
+        version = _current_version()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == version:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is None or snapshot.version != version:
+                # The version is read before the rows, so a bump during the load is seen next time.
+                with primary():
+                    snapshot = ReferenceSnapshot(
+                        version,
+                        Airport.objects.order_by('airport_code').values_list('airport_code', 'airport_name', 'location'),
+                        Airline.objects.order_by('airline_code').values_list('airline_code', 'airline_name'),
+                    )
+                self._snapshot = snapshot
+        return snapshot
+
+    async def acurrent(self):
+        # For async views: no thread hop unless the snapshot needs reloading.
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == await cache.aget(VERSION_KEY):
+            return snapshot
+        return await sync_to_async(self.current)()
+
+    def bump(self):
+        cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+reference = ReferenceData()
@@ -0,0 +1,125 @@
+# flight_management/replicas.py
+# Read replicas. GET requests to the views in REPLICA_READ_VIEWS read from one of the
+# DATABASE_REPLICAS aliases; everything else, and every write, uses the primary
+# ('default'). A response to a request that wrote carries a cookie with the time of
+# the write, and for as long as a view's lag tolerance says the replicas may not have
+# caught up since, that client's reads of the view stay on the primary, so someone
+# who just booked or reviewed sees it.
+
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = 'aeropulse_wrote'
+
+_state = ContextVar('replica_routing', default=None)
+
+
+class RoutingState:
+    __slots__ = ('replica', 'wrote')
+
+    def __init__(self):
+        self.replica = False
+        self.wrote = False
+
+
+def replica_aliases():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def lag_tolerances():
+    """{url name: seconds}: how far behind the primary the replicas may be for that view."""
+    return getattr(settings, 'REPLICA_READ_VIEWS', {})
+
+
+@contextmanager
+def primary():
+    """
+    Read from the primary inside the block, whatever the view. For filling process-wide
+    caches: a lagging replica read there would outlive the invalidation meant to refresh it.
+    """
+    state = _state.get()
+    if state is None:
+        yield
+        return
+    previous, state.replica = state.replica, False
+    try:
+        yield
+    finally:
+        state.replica = previous
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        aliases = replica_aliases()
+        if state is not None and state.replica and not state.wrote and aliases:
+            return random.choice(aliases)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            # The rest of this request reads its own writes from the primary too.
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas are copies of the primary, so objects from any of them may be related.
+        return True
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = RoutingState()
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(state, response)
+
+    async def __acall__(self, request):
+        state = RoutingState()
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.finish(state, response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _state.get()
+        if state is None or request.method not in ('GET', 'HEAD') or not replica_aliases():
+            return None
+        tolerance = lag_tolerances().get(request.resolver_match.view_name)
+        if tolerance is None:
+            return None
+        try:
+            wrote_at = float(request.COOKIES.get(PIN_COOKIE, ''))
+        except ValueError:
+            wrote_at = None
+        state.replica = wrote_at is None or time.time() - wrote_at >= tolerance
+        return None
+
+    def finish(self, state, response):
+        pin_seconds = max(lag_tolerances().values(), default=0)
+        if state.wrote and pin_seconds and replica_aliases():
+            response.set_cookie(PIN_COOKIE, f'{time.time():.3f}', max_age=pin_seconds, httponly=True, samesite='Lax')
+        return response
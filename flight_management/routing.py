@@ -0,0 +1,215 @@
+# flight_management/routing.py
+
+import threading
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict, namedtuple
+from datetime import timedelta
+from heapq import nsmallest
+
+from django.conf import settings
+
+from .timetable import departure_date, timetable
+
+MIN_CONNECTION_MINUTES = getattr(settings, 'CONNECTION_MIN_MINUTES', 45)
+MAX_LAYOVER_MINUTES = getattr(settings, 'CONNECTION_MAX_LAYOVER_MINUTES', 360)
+MAX_CONNECTIONS = 2
+
+# A leg carries both classes so an itinerary can report combined fares for each.
+Leg = namedtuple('Leg', [
+    'flight_id', 'airline_name', 'departure_code', 'destination_code', 'departure_time', 'arrival_time',
+    'economy_price', 'economy_seats', 'business_price', 'business_seats',
+])
+
+
+def _leg(economy, business):
+    return Leg(
+        economy.flight_id, economy.airline_name, economy.departure_code, economy.destination_code,
+        economy.departure_time, economy.arrival_time,
+        economy.price, economy.seats, business.price, business.seats,
+    )
+
+
+class ConnectionGraph:
+    """
+    Time-expanded departure graph: for every airport, and for every route, the
+    outgoing legs sorted by departure time, so the connections leaving inside a
+    layover window are a bisect away.
+    """
+
+    def __init__(self, legs):
+        groups = {}
+        for leg in legs:
+            groups.setdefault(leg.departure_code, []).append(leg)
+            groups.setdefault((leg.departure_code, leg.destination_code), []).append(leg)
+        self.departures = {}
+        self.departure_times = {}
+        for key, group in groups.items():
+            group.sort(key=lambda l: (l.departure_time, l.flight_id))
+            self.departures[key] = group
+            self.departure_times[key] = [l.departure_time for l in group]
+
+    def legs_between(self, airport_code, earliest, latest, destination=None):
+        # With a destination, only the legs flying there.
+        key = airport_code if destination is None else (airport_code, destination)
+        times = self.departure_times.get(key)
+        if not times:
+            return []
+        return self.departures[key][bisect_left(times, earliest):bisect_right(times, latest)]
+
+
+class ConnectionSearch:
+    """
+    Round-based (RAPTOR-style) itinerary search over the in-memory timetable.
+
+    Round k extends every partial itinerary by one leg that leaves the connecting
+    airport inside [arrival + min connection, arrival + max layover]. Each round
+    first lands every partial at the destination, then extends the rest elsewhere,
+    pruned three ways:
+
+    - Bound: once `limit` itineraries are found, a leg that lands too late to
+      connect before the last of them can only lead to a later arrival.
+    - Lookahead: before the last round, a leg is only taken if its airport still
+      has a bookable flight to the destination leaving after the connection time.
+    - Dominance: partials ending on the same flight have the same onward options,
+      so once `limit` of them have no more legs and no higher fare, the rest are
+      dropped: they could only rank below those.
+
+    Graphs are cached per departure day, for the max_graphs days most recently
+    asked for, and rebuilt only when the timetable changes that day.
+    """
+
+    max_graphs = 8
+
+    def __init__(self, index=timetable):
+        self.index = index
+        self._lock = threading.Lock()
+        self._graphs = OrderedDict()
+
+    def graph_for(self, day):
+        # Connections can spill into the following day, so the graph spans two.
+        days = (day, day + timedelta(days=1))
+        version = tuple(self.index.day_version(d) for d in days)
+        with self._lock:
+            cached = self._graphs.get(day)
+            if cached and cached[0] == version:
+                self._graphs.move_to_end(day)
+                return cached[1]
+        legs = [_leg(economy, business) for d in days for economy, business in self.index.flights_on(d)]
+        graph = ConnectionGraph(legs)
+        with self._lock:
+            self._graphs[day] = (version, graph)
+            self._graphs.move_to_end(day)
+            while len(self._graphs) > self.max_graphs:
+                self._graphs.popitem(last=False)
+        return graph
+
+    def search(self, origin, destination, day, seat_class='ECONOMY', passengers=1,
+               max_connections=MAX_CONNECTIONS, min_connection=MIN_CONNECTION_MINUTES,
+               max_layover=MAX_LAYOVER_MINUTES, limit=10):
+        self.index.ensure_loaded()
+        graph = self.graph_for(day)
+        seats_field = 'business_seats' if seat_class == 'BUSINESS' else 'economy_seats'
+        price_field = 'business_price' if seat_class == 'BUSINESS' else 'economy_price'
+        min_gap = timedelta(minutes=min_connection)
+        max_gap = timedelta(minutes=max_layover)
+
+        def bookable(leg):
+            return getattr(leg, seats_field) >= passengers
+
+        def fare_of(path):
+            return sum(getattr(leg, price_field) for leg in path)
+
+        # flight_id -> sorted fares of the partials kept so far that end on that flight.
+        fares_ending_on = {}
+
+        def dominated(leg, fare):
+            fares = fares_ending_on.setdefault(leg.flight_id, [])
+            # Earlier rounds have fewer legs, so every kept fare no higher than this one dominates it.
+            if bisect_right(fares, fare) >= limit:
+                return True
+            insort(fares, fare)
+            return False
+
+        # airport -> the latest departure to the destination that still lands before the cutoff.
+        last_useful_departure = {}
+
+        def last_departure_to_destination(airport_code, cutoff):
+            if airport_code not in last_useful_departure:
+                last_useful_departure[airport_code] = max((
+                    leg.departure_time for leg in graph.departures.get((airport_code, destination), ())
+                    if bookable(leg) and (cutoff is None or leg.arrival_time < cutoff)
+                ), default=None)
+            return last_useful_departure[airport_code]
+
+        itineraries, partials = [], []
+        for leg in graph.departures.get(origin, ()):
+            if bookable(leg) and departure_date(leg.departure_time) == day:
+                (itineraries if leg.destination_code == destination else partials).append((leg,))
+        for round_number in range(1, max_connections + 1):
+            # Land every partial at the destination first: those itineraries set the cutoff for the rest.
+            for path in partials:
+                last = path[-1]
+                for leg in graph.legs_between(last.destination_code, last.arrival_time + min_gap,
+                                              last.arrival_time + max_gap, destination):
+                    if bookable(leg):
+                        itineraries.append(path + (leg,))
+            if round_number == max_connections:
+                break
+            # Only itineraries landing before the limit-th earliest arrival so far can still rank.
+            arrivals = nsmallest(limit, (path[-1].arrival_time for path in itineraries))
+            cutoff = arrivals[-1] if len(arrivals) == limit else None
+            last_useful_departure.clear()
+            final_leg_next = round_number + 1 == max_connections
+            extended = []
+            for path in partials:
+                last = path[-1]
+                latest = last.arrival_time + max_gap
+                if cutoff is not None:
+                    latest = min(latest, cutoff - min_gap)
+                visited = {leg.departure_code for leg in path}
+                fare = fare_of(path)
+                for leg in graph.legs_between(last.destination_code, last.arrival_time + min_gap, latest):
+                    if leg.destination_code == destination or leg.destination_code in visited or not bookable(leg):
+                        continue
+                    earliest_onward = leg.arrival_time + min_gap
+                    if cutoff is not None and earliest_onward >= cutoff:
+                        continue
+                    if final_leg_next:
+                        # The next leg has to reach the destination, so there must be one worth waiting for.
+                        onward = last_departure_to_destination(leg.destination_code, cutoff)
+                        if onward is None or onward < earliest_onward:
+                            continue
+                    if not dominated(leg, fare + getattr(leg, price_field)):
+                        extended.append(path + (leg,))
+            partials = extended
+
+        itineraries.sort(key=lambda path: (
+            path[-1].arrival_time, len(path), fare_of(path), [leg.flight_id for leg in path],
+        ))
+        return [self.describe(path) for path in itineraries[:limit]]
+
+    @staticmethod
+    def describe(path):
+        first, last = path[0], path[-1]
+        return {
+            'departure_time': first.departure_time.isoformat(),
+            'arrival_time': last.arrival_time.isoformat(),
+            'duration_minutes': int((last.arrival_time - first.departure_time).total_seconds() // 60),
+            'connections': len(path) - 1,
+            'via': [leg.destination_code for leg in path[:-1]],
+            'economy_price': str(sum(leg.economy_price for leg in path)),
+            'business_price': str(sum(leg.business_price for leg in path)),
+            'economy_seats': min(leg.economy_seats for leg in path),
+            'business_seats': min(leg.business_seats for leg in path),
+            'legs': [{
+                'flight_id': leg.flight_id,
+                'airline': leg.airline_name,
+                'from': leg.departure_code,
+                'to': leg.destination_code,
+                'departure_time': leg.departure_time.isoformat(),
+                'arrival_time': leg.arrival_time.isoformat(),
+            } for leg in path],
+        }
+
+
+connection_search = ConnectionSearch()
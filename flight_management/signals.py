@@ -0,0 +1,144 @@
+# flight_management/signals.py
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .availability import accounts
+from .documents import expire_documents
+from .models import (
+    Airline, Airport, Booking, Cancellation, Flight, Invoice, Notification, PassengerProfile, Payment, Review, Ticket,
+)
+from .notifications import invalidate_unread
+from .photos import ensure_variants
+from .ratings import record_rating
+from .reference import reference
+from .summaries import refresh_airline_summaries, refresh_flight_summaries, schedule_summary_refresh
+from .timetable import AIRPORTS, ALL_FLIGHTS, timetable
+
+
+# === TIMETABLE INDEX MAINTENANCE ===
+# Updates are deferred to on_commit so a rolled-back save never leaks into the index,
+# then published so the other workers' indexes pick them up too.
+
+@receiver(post_save, sender=Flight)
+def flight_saved(sender, instance, **kwargs):
+    flight_id = instance.pk
+    transaction.on_commit(lambda: timetable.update_flight(flight_id))
+    transaction.on_commit(lambda: timetable.publish([flight_id]))
+    if not kwargs['created']:
+        transaction.on_commit(lambda: refresh_flight_summaries(flight_id))
+        transaction.on_commit(lambda: expire_documents(flight_id=flight_id))
+
+
+@receiver(post_delete, sender=Flight)
+def flight_deleted(sender, instance, **kwargs):
+    # Django clears instance.pk once the delete finishes, so capture it now.
+    flight_id = instance.pk
+    transaction.on_commit(lambda: timetable.remove_flight(flight_id))
+    transaction.on_commit(lambda: timetable.publish([flight_id]))
+
+
+@receiver(post_save, sender=Airport)
+@receiver(post_delete, sender=Airport)
+def airport_changed(sender, instance, **kwargs):
+    airport_code = instance.pk
+    transaction.on_commit(reference.bump)
+    transaction.on_commit(lambda: timetable.update_airport(airport_code))
+    transaction.on_commit(lambda: timetable.publish(AIRPORTS))
+    if kwargs.get('created') is False:
+        transaction.on_commit(lambda: expire_documents(
+            Q(flight__departure_airport=airport_code) | Q(flight__destination_airport=airport_code),
+        ))
+
+
+@receiver(post_save, sender=Airline)
+@receiver(post_delete, sender=Airline)
+def airline_changed(sender, instance, **kwargs):
+    # Airline names are copied into every record; a rename is rare enough to rebuild.
+    transaction.on_commit(timetable.invalidate)
+    transaction.on_commit(lambda: timetable.publish(ALL_FLIGHTS))
+    transaction.on_commit(reference.bump)
+    if kwargs.get('created') is False:
+        airline_code, airline_name = instance.pk, instance.airline_name
+        transaction.on_commit(lambda: refresh_airline_summaries(airline_code, airline_name))
+        transaction.on_commit(lambda: expire_documents(flight__airline=airline_code))
+
+
+# === BOOKING SUMMARY MAINTENANCE ===
+# Status changes made with QuerySet.update() (payment, cancellation, hold expiry)
+# call schedule_summary_refresh() themselves; these cover every model save.
+
+@receiver(post_save, sender=Booking)
+def booking_saved(sender, instance, **kwargs):
+    schedule_summary_refresh(instance.pk)
+
+
+@receiver(post_save, sender=Ticket)
+@receiver(post_save, sender=Payment)
+@receiver(post_save, sender=Cancellation)
+def booking_document_saved(sender, instance, **kwargs):
+    schedule_summary_refresh(instance.booking_id)
+
+
+@receiver(post_save, sender=Invoice)
+def invoice_saved(sender, instance, **kwargs):
+    schedule_summary_refresh(instance.payment.booking_id)
+
+
+# === NOTIFICATION COUNTER CACHE ===
+
+@receiver(post_save, sender=Notification)
+@receiver(post_delete, sender=Notification)
+def notification_changed(sender, instance, **kwargs):
+    user_id = instance.user_id
+    transaction.on_commit(lambda: invalidate_unread(user_id))
+
+
+# === REVIEW RATING COUNTERS ===
+# Applied inside the saving transaction, not on commit: a review and its counts stand or fall together.
+
+@receiver(pre_save, sender=Review)
+def review_saving(sender, instance, **kwargs):
+    # Only edits (from the admin) need the old rating, to move it between histogram buckets.
+    instance._previous_rating = (
+        Review.objects.filter(pk=instance.pk).values_list('rating', flat=True).first() if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Review)
+def review_saved(sender, instance, created, **kwargs):
+    if created:
+        record_rating(instance.flight, instance.rating)
+    elif instance._previous_rating not in (None, instance.rating):
+        record_rating(instance.flight, instance._previous_rating, sign=-1)
+        record_rating(instance.flight, instance.rating)
+
+
+@receiver(post_delete, sender=Review)
+def review_deleted(sender, instance, **kwargs):
+    record_rating(instance.flight, instance.rating, sign=-1)
+
+
+# === PROFILE PHOTO VARIANTS ===
+
+@receiver(post_save, sender=PassengerProfile)
+def profile_saved(sender, instance, **kwargs):
+    # Made after commit, so the upload request is not held up by a rolled-back profile.
+    photo = instance.profile_photo
+    if photo:
+        name, storage = photo.name, photo.storage
+        transaction.on_commit(lambda: ensure_variants(name, storage))
+
+
+# === REGISTRATION AVAILABILITY FILTERS ===
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    # Also on updates: a changed email must test as taken. The old one simply stays in the filter.
+    if update_fields is not None and not {'username', 'email'} & set(update_fields):
+        return
+    username, email = instance.username, instance.email
+    transaction.on_commit(lambda: accounts.publish(username, email))
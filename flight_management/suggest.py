@@ -0,0 +1,142 @@
+# flight_management/suggest.py
+# Airport autocomplete. Codes, names and locations are folded (case and accents, so
+# "sao" finds São Paulo) and every word-suffix of them is kept in one sorted array:
+# a typed prefix is a bisect and a short scan. Matches are ranked by how many
+# flights serve each airport. Prefixes matching more than SCAN_LIMIT tokens ("s",
+# or a country every airport shares) have their answers worked out when the index
+# is built, so no keystroke scans more than that.
+
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Count
+
+from .models import Flight
+from .reference import reference
+
+AIRPORT_SUGGEST_LIMIT = getattr(settings, 'AIRPORT_SUGGEST_LIMIT', 10)
+# Popularity moves slowly; the index is also rebuilt whenever the reference data changes.
+AIRPORT_SUGGEST_POPULARITY_SECONDS = getattr(settings, 'AIRPORT_SUGGEST_POPULARITY_SECONDS', 60 * 60)
+SCAN_LIMIT = 64
+
+_word = re.compile(r'\w+')
+
+
+def fold(text):
+    """'São Paulo, Brazil' -> 'sao paulo brazil'."""
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ' '.join(_word.findall(''.join(c for c in decomposed if not unicodedata.combining(c)).casefold()))
+
+
+def _tokens(airport):
+    yield airport.airport_code.casefold()
+    for text in (airport.airport_name, airport.location):
+        words = fold(text).split(' ')
+        for i in range(len(words)):
+            yield ' '.join(words[i:])
+
+
+class SuggestIndex:
+    def __init__(self, version, airports, popularity, limit=AIRPORT_SUGGEST_LIMIT):
+        self.version = version
+        self.built_at = time.monotonic()
+        self.limit = limit
+        self._airports = airports
+        ordered = sorted(airports, key=lambda code: (-popularity.get(code, 0), code))
+        self._rank = {code: rank for rank, code in enumerate(ordered)}
+        by_token = {}
+        for code in ordered:
+            for token in _tokens(airports[code]):
+                by_token.setdefault(token, []).append(code)
+        self._tokens = sorted(by_token)
+        self._codes = [by_token[token] for token in self._tokens]
+        self._precomputed = {}
+        # Walk the prefixes whose range of tokens is too long to scan, one character deeper at a time.
+        pending = [('', 0, len(self._tokens))]
+        while pending:
+            prefix, lo, hi = pending.pop()
+            i = lo
+            while i < hi:
+                if len(self._tokens[i]) == len(prefix):
+                    i += 1
+                    continue
+                child = self._tokens[i][:len(prefix) + 1]
+                end = bisect_left(self._tokens, child + '\U0010ffff', i, hi)
+                if end - i > SCAN_LIMIT:
+                    self._precomputed[child] = self._top(set().union(*self._codes[i:end]))
+                    pending.append((child, i, end))
+                i = end
+
+    def _top(self, codes):
+        return sorted(codes, key=self._rank.__getitem__)[:self.limit]
+
+    def suggest(self, query):
+        """Up to `limit` AirportRecords matching the folded query, most popular first."""
+        prefix = fold(query)
+        if not prefix:
+            return []
+        codes = self._precomputed.get(prefix)
+        if codes is None:
+            matches = set()
+            i = bisect_left(self._tokens, prefix)
+            while i < len(self._tokens) and self._tokens[i].startswith(prefix):
+                matches.update(self._codes[i])
+                i += 1
+            codes = self._top(matches)
+        exact = prefix.upper()
+        if exact in self._airports and codes[:1] != [exact]:
+            # Someone typing a whole code wants that airport, however quiet it is.
+            codes = [exact] + [code for code in codes if code != exact][:self.limit - 1]
+        return [self._airports[code] for code in codes]
+
+
+def route_popularity():
+    """{airport code: flights departing from or arriving at it}."""
+    popularity = {}
+    for field in ('departure_airport', 'destination_airport'):
+        for code, flights in Flight.objects.values_list(field).annotate(flights=Count('pk')).order_by():
+            popularity[code] = popularity.get(code, 0) + flights
+    return popularity
+
+
+class AirportSuggester:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+
+    def _fresh(self, index, snapshot):
+        return (
+            index is not None and index.version == snapshot.version
+            and time.monotonic() - index.built_at < AIRPORT_SUGGEST_POPULARITY_SECONDS
+        )
+
+    def current(self):
+        snapshot = reference.current()
+        index = self._index
+        if self._fresh(index, snapshot):
+            return index
+        with self._lock:
+            index = self._index
+            if not self._fresh(index, snapshot):
+                index = self._index = SuggestIndex(snapshot.version, snapshot.airports, route_popularity())
+        return index
+
+    async def acurrent(self):
+        # For async views: in memory unless the index is due a rebuild.
+        snapshot = await reference.acurrent()
+        index = self._index
+        if self._fresh(index, snapshot):
+            return index
+        return await sync_to_async(self.current)()
+
+    def invalidate(self):
+        with self._lock:
+            self._index = None
+
+
+airport_suggestions = AirportSuggester()
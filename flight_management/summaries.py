@@ -0,0 +1,97 @@
+# flight_management/summaries.py
+# Keeps BookingSummary in step with Booking, Flight, Ticket, Payment/Invoice and
+# Cancellation so the dashboard can be rendered from a single table.
+
+import threading
+
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+
+from .bulk import bulk_upsert
+from .documents import render_documents
+from .models import Airline, Booking, BookingSummary, Flight
+
+SUMMARY_FIELDS = [
+    'user', 'flight_id', 'airline_code', 'airline_name', 'departure_code', 'destination_code',
+    'departure_time', 'booking_date', 'status', 'seat_class', 'num_adults', 'num_children',
+    'num_infants', 'total_fare', 'ticket_id', 'invoice_id',
+]
+
+_pending = threading.local()
+
+
+def summary_from_booking(booking):
+    flight = booking.flight
+    ticket = getattr(booking, 'ticket', None)
+    payment = getattr(booking, 'payment', None)
+    invoice = getattr(payment, 'invoice', None) if payment else None
+    return BookingSummary(
+        booking=booking, user_id=booking.user_id, flight_id=flight.flight_id,
+        airline_code=flight.airline.airline_code, airline_name=flight.airline.airline_name,
+        departure_code=flight.departure_airport_id, destination_code=flight.destination_airport_id,
+        departure_time=flight.departure_time, booking_date=booking.booking_date, status=booking.status,
+        seat_class=booking.seat_class, num_adults=booking.num_adults, num_children=booking.num_children,
+        num_infants=booking.num_infants, total_fare=booking.total_fare,
+        ticket_id=ticket.ticket_id if ticket else None, invoice_id=invoice.invoice_id if invoice else None,
+    )
+
+
+def refresh_booking_summaries(booking_ids):
+    """Recompute the summaries of booking_ids from the source tables: one read, one upsert."""
+    booking_ids = set(booking_ids)
+    if not booking_ids:
+        return
+    bookings = Booking.objects.filter(pk__in=booking_ids).select_related(
+        'flight__airline', 'ticket', 'payment__invoice',
+    )
+    summaries = [summary_from_booking(booking) for booking in bookings]
+    bulk_upsert(BookingSummary, summaries, ['booking'], SUMMARY_FIELDS)
+    missing = booking_ids - {summary.booking_id for summary in summaries}
+    if missing:
+        BookingSummary.objects.filter(booking_id__in=missing).delete()
+
+
+def refresh_flight_summaries(flight_id):
+    # Flight edits touch every booking on it; one UPDATE rather than a per-booking refresh.
+    flight = Flight.objects.filter(pk=flight_id).values(
+        'airline_id', 'airline__airline_name', 'departure_airport_id', 'destination_airport_id', 'departure_time',
+    ).first()
+    if flight is None:
+        return
+    BookingSummary.objects.filter(flight_id=flight_id).update(
+        airline_code=flight['airline_id'], airline_name=flight['airline__airline_name'],
+        departure_code=flight['departure_airport_id'], destination_code=flight['destination_airport_id'],
+        departure_time=flight['departure_time'],
+    )
+
+
+def refresh_airline_summaries(airline_code, airline_name):
+    BookingSummary.objects.filter(airline_code=airline_code).update(airline_name=airline_name)
+
+
+def refresh_airline_names(airline_codes):
+    # Bulk imports bypass the Airline signals; copy every name across in one UPDATE.
+    BookingSummary.objects.filter(airline_code__in=list(airline_codes)).update(airline_name=Subquery(
+        Airline.objects.filter(pk=OuterRef('airline_code')).values('airline_name')[:1],
+    ))
+
+
+def schedule_summary_refresh(*booking_ids):
+    """
+    Refresh the given summaries, and re-render their tickets and invoices, once the
+    current transaction commits. Several writes to one booking inside a transaction
+    (status, ticket, invoice) coalesce into a single refresh: the first callback
+    flushes everything pending, later ones find nothing.
+    """
+    pending = getattr(_pending, 'ids', None)
+    if pending is None:
+        pending = _pending.ids = set()
+    pending.update(booking_ids)
+    transaction.on_commit(_flush_pending)
+
+
+def _flush_pending():
+    booking_ids, _pending.ids = getattr(_pending, 'ids', set()), set()
+    refresh_booking_summaries(booking_ids)
+    if booking_ids:
+        render_documents(booking_ids)
@@ -0,0 +1,13 @@
+# flight_management/templatetags/photos.py
+
+from django import template
+
+from ..photos import variant_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def photo_url(photo, variant='full'):
+    """{% photo_url profile.profile_photo 'avatar' %}: URL of a resized variant (avatar, card or full)."""
+    return variant_url(photo, variant)
@@ -1,3 +1,1559 @@
-from django.test import TestCase
+import base64
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template import engines
+from django.db import connection
+from django.db.models import Count
+from django.http import Http404
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import views
+from .admin import EstimatedCountPaginator
+from .availability import AccountIndex, BloomFilter, accounts
+
+from .bench import ensure_reference_data, run_endpoint_suite, seed_flights
+from .checks import check_shared_cache
+from .confirmation import confirm_booking, confirm_bookings
+from .coordination import PersistentFileBasedCache, cache
+from .context_processors import notifications_processor
+from .fares import PRICE_FIELDS, airport_country, cheapest_per_destination
+from .forms import RegistrationStep1Form, RegistrationStep3Form
+from .geo import build_topology, simplify_ring
+from .holds import SEAT_HOLD_MINUTES, hold_cutoff, release_expired_holds
+from .inventory import reserve_seats, seat_field
+from .management.commands.bench_inventory import Command as BenchInventory, book_atomic
+from .metrics import MetricsRegistry, RequestSample, registry
+from .models import (
+    Airline, Airport, Booking, BookingSummary, Flight, Invoice, Notification, PassengerProfile, Payment, RatingSummary, Review, Ticket,
+)
+from .notifications import NOTIFICATION_DROPDOWN_LIMIT, mark_read
+from .pagination import decode_cursor, encode_cursor
+from .photos import VARIANTS
+from .ratings import rebuild_ratings
+from .reference import ReferenceData, reference
+from .replicas import PIN_COOKIE
+from .routing import ConnectionSearch, connection_search
+from .suggest import SCAN_LIMIT, SuggestIndex, airport_suggestions, fold
+from .timetable import ALL_FLIGHTS, AirportRecord, TimetableIndex, departure_date, timetable
+
+
+def setUpModule():
+    # The project's cache directories belong to the development server; tests get their own.
+    directory = tempfile.mkdtemp()
+    isolated = override_settings(CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(directory, 'cache'),
+        },
+        'coordination': {
+            'BACKEND': 'flight_management.coordination.PersistentFileBasedCache',
+            'LOCATION': os.path.join(directory, 'coordination'),
+        },
+    })
+    isolated.enable()
+    unittest.addModuleCleanup(shutil.rmtree, directory, ignore_errors=True)
+    unittest.addModuleCleanup(isolated.disable)
+
+
+def clear_caches():
+    for alias in settings.CACHES:
+        caches[alias].clear()
+
+
+class NotificationsProcessorTests(TestCase):
+    template = '{{ unread_count }}|{% for n in unread_notifications %}{{ n.message }};{% endfor %}'
+
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user('flyer', password='secret')
+        for i in range(NOTIFICATION_DROPDOWN_LIMIT + 2):
+            Notification.objects.create(user=self.user, message=f'msg{i}')
+        Notification.objects.create(user=self.user, message='old', is_read=True)
+
+    def render(self):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        return engines['django'].from_string(self.template).render(request=request)
+
+    def test_cached_render_makes_no_queries(self):
+        first = self.render()
+        with self.assertNumQueries(0):
+            second = self.render()
+        self.assertEqual(first, second)
+        count, messages = second.split('|')
+        self.assertEqual(count, str(NOTIFICATION_DROPDOWN_LIMIT + 2))
+        self.assertEqual(len(messages.rstrip(';').split(';')), NOTIFICATION_DROPDOWN_LIMIT)
+
+    def test_unused_context_is_not_evaluated(self):
+        request = RequestFactory().get('/')
+        request.user = self.user
+        with self.assertNumQueries(0):
+            notifications_processor(request)
+
+    def test_new_notification_invalidates_cache(self):
+        self.render()
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.create(user=self.user, message='fresh')
+        self.assertTrue(self.render().startswith(f'{NOTIFICATION_DROPDOWN_LIMIT + 3}|fresh;'))
+
+    def test_mark_read_invalidates_cache(self):
+        self.render()
+        mark_read(self.user.pk)
+        self.assertEqual(self.render(), '0|')
+
+    def test_process_local_cache_is_flagged(self):
+        self.assertEqual(check_shared_cache(None), [])
+        coordination = settings.CACHES['coordination']
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}, 'coordination': coordination}):
+            self.assertEqual([warning.id for warning in check_shared_cache(None)], ['flight_management.W001'])
+
+    def test_coordination_cache_must_not_cull(self):
+        default = settings.CACHES['default']
+        with override_settings(CACHES={'default': default, 'coordination': default}):
+            self.assertEqual([warning.id for warning in check_shared_cache(None)], ['flight_management.W002'])
+        with override_settings(CACHES={'default': default}):
+            self.assertEqual([error.id for error in check_shared_cache(None)], ['flight_management.E001'])
+
+
+class CoordinationCacheTests(TestCase):
+    def test_a_full_cache_drops_only_expired_entries(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        store = PersistentFileBasedCache(directory, {'OPTIONS': {'MAX_ENTRIES': 3}})
+        store.set('timetable:changes', 7, None)
+        store.set('reference:version', 'v1', None)
+        store.set('timetable:change:7', [1], 1)
+        with mock.patch('django.core.cache.backends.filebased.time.time', return_value=time.time() + 10):
+            for number in range(8, 12):
+                store.set(f'timetable:change:{number}', [number], 60)
+            self.assertEqual(store.get('timetable:changes'), 7)
+            self.assertEqual(store.get('reference:version'), 'v1')
+            self.assertIsNone(store.get('timetable:change:7'))
+            self.assertEqual(len(store.get_many([f'timetable:change:{number}' for number in range(8, 12)])), 4)
+
+
+class EndpointSuiteTests(TestCase):
+    def test_small_run_reports_every_endpoint(self):
+        results = run_endpoint_suite(flights=300, users=5, bookings=20, reviews=10, requests=5, warmup=1)
+        self.assertEqual(
+            set(results['endpoints']), {'search_results', 'book_flight', 'payment', 'dashboard', 'price_map_api'},
+        )
+        for name, stats in results['endpoints'].items():
+            self.assertEqual(stats['requests'], 5, name)
+            self.assertLessEqual(stats['p50_ms'], stats['p95_ms'])
+            self.assertLessEqual(stats['p95_ms'], stats['p99_ms'])
+            self.assertTrue(all(int(code) < 500 for code in stats['statuses']), name)
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.enterContext(override_settings(METRICS_DIR=directory, METRICS_TOKEN='scrape'))
+        registry.reset()
+        self.user = User.objects.create_user('ops', password='secret', is_staff=True)
+        self.client.force_login(self.user)
+
+    def scrape(self, token='scrape'):
+        return self.client.get('/metrics', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_requests_are_recorded_per_url_name(self):
+        self.client.get('/dashboard/')
+        self.client.get('/dashboard/')
+        stats = registry.snapshot()['dashboard']
+        self.assertEqual(stats['requests'], 2)
+        self.assertGreater(stats['queries_per_request'], 0)
+        self.assertGreater(stats['template_ms_per_request'], 0)
+        body = self.scrape().content.decode()
+        self.assertIn('aeropulse_request_duration_seconds_count{view="dashboard"} 2', body)
+        self.assertEqual(self.client.get('/metrics/json/').json()['views']['dashboard']['requests'], 2)
+
+    def test_every_worker_is_counted(self):
+        self.client.get('/dashboard/')
+        other = MetricsRegistry()
+        with mock.patch('flight_management.metrics.os.getpid', return_value=-1):
+            other.record('dashboard', 0.2, RequestSample(), False)
+            other.flush()
+        body = self.scrape().content.decode()
+        self.assertIn('aeropulse_request_duration_seconds_count{view="dashboard"} 2', body)
+        self.assertIn('aeropulse_request_duration_seconds_bucket{view="dashboard",le="0.1"} 1', body)
+
+    @skipUnless(os.name == 'posix', 'exited workers are only detected on POSIX')
+    def test_exited_workers_are_folded_into_one_file(self):
+        self.client.get('/dashboard/')
+        directory = settings.METRICS_DIR
+        # Past the largest pid Linux hands out, so never a live process.
+        for pid in (2 ** 22 + 1, 2 ** 22 + 2):
+            other = MetricsRegistry()
+            with mock.patch('flight_management.metrics.os.getpid', return_value=pid):
+                other.record('dashboard', 0.2, RequestSample(), False)
+                other.flush()
+        body = self.scrape().content.decode()
+        self.assertIn('aeropulse_request_duration_seconds_count{view="dashboard"} 3', body)
+        self.assertEqual(sorted(os.listdir(directory)), [f'{os.getpid()}.json', 'retired.json'])
+        self.assertIn('aeropulse_request_duration_seconds_count{view="dashboard"} 3', self.scrape().content.decode())
+
+    def test_metrics_need_the_token(self):
+        self.assertEqual(self.scrape('wrong').status_code, 403)
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        with override_settings(METRICS_TOKEN=None):
+            self.assertEqual(self.scrape('None').status_code, 403)
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+    def test_over_budget_requests_are_logged(self):
+        with override_settings(REQUEST_BUDGETS={'dashboard': {'queries': 0}}):
+            with self.assertLogs('flight_management.metrics', 'WARNING') as logs:
+                self.client.get('/dashboard/')
+        self.assertIn('(dashboard)', logs.output[0])
+        self.assertEqual(registry.snapshot()['dashboard']['over_budget'], 1)
+
+
+class InventoryTests(TestCase):
+    def setUp(self):
+        airports, airlines = ensure_reference_data()
+        seed_flights(5, airports, airlines)
+        Flight.objects.update(economy_seats=3)
+        self.flight = Flight.objects.first()
+        self.user = User.objects.create_user('flyer', password='secret')
+        self.client.force_login(self.user)
+
+    def seats_left(self):
+        return Flight.objects.values_list('economy_seats', flat=True).get(pk=self.flight.pk)
+
+    def test_reserving_stops_at_zero(self):
+        self.assertEqual([reserve_seats(self.flight.pk, 'ECONOMY', 2) for _ in range(3)], [True, False, False])
+        self.assertTrue(reserve_seats(self.flight.pk, 'ECONOMY', 1))
+        self.assertFalse(reserve_seats(self.flight.pk, 'ECONOMY', 1))
+        self.assertEqual(self.seats_left(), 0)
+
+    def test_a_booking_beaten_to_the_last_seats_is_turned_away(self):
+        # Another request takes the seats after this one has loaded the flight, but before it books.
+        def beaten(flight_id, seat_class, count):
+            reserve_seats(flight_id, seat_class, 3)
+            return reserve_seats(flight_id, seat_class, count)
+
+        with mock.patch.object(views, 'reserve_seats', side_effect=beaten):
+            response = self.client.post(reverse('book_flight', args=[self.flight.pk]) + '?adults=2')
+        self.assertRedirects(response, reverse('home_page'), fetch_redirect_response=False)
+        self.assertFalse(Booking.objects.exists())
+        self.assertEqual(self.seats_left(), 0)
+
+    def test_cancelling_twice_releases_the_seats_once(self):
+        self.client.post(reverse('book_flight', args=[self.flight.pk]) + '?adults=2')
+        booking = Booking.objects.get()
+        confirm_booking(booking)
+        self.assertEqual(self.seats_left(), 1)
+        for _ in range(2):
+            self.client.get(reverse('cancel_booking', args=[booking.pk]))
+        self.assertEqual(self.seats_left(), 3)
+
+
+# SQLite's shared in-memory test database fails a locked table at once instead of waiting.
+@skipUnless(connection.vendor != 'sqlite', 'needs a database server, e.g. MySQL')
+class ConcurrentBookingTests(TransactionTestCase):
+    def test_concurrent_bookings_never_oversell(self):
+        airports, airlines = ensure_reference_data()
+        seed_flights(1, airports, airlines)
+        Flight.objects.update(economy_seats=10)
+        flight = Flight.objects.get()
+        user = User.objects.create_user('crowd')
+        booked, _ = BenchInventory.run(book_atomic, flight.pk, user, attempts=40, threads=4)
+        self.assertEqual(booked, 10)
+        self.assertEqual(Booking.objects.count(), 10)
+        self.assertEqual(Flight.objects.get(pk=flight.pk).economy_seats, 0)
+
+
+class SeatHoldTests(TestCase):
+    def setUp(self):
+        airports, airlines = ensure_reference_data()
+        seed_flights(5, airports, airlines)
+        Flight.objects.update(economy_seats=10)
+        self.flight = Flight.objects.first()
+        self.user = User.objects.create_user('holder', password='secret')
+        self.client.force_login(self.user)
+
+    def hold(self, seats=2, minutes_ago=0, status='PENDING'):
+        reserve_seats(self.flight.pk, 'ECONOMY', seats)
+        booking = Booking.objects.create(
+            user=self.user, flight=self.flight, seat_class='ECONOMY', num_adults=seats, total_fare=100, status=status,
+        )
+        Booking.objects.filter(pk=booking.pk).update(booking_date=timezone.now() - timedelta(minutes=minutes_ago))
+        return booking
+
+    def seats_left(self):
+        return Flight.objects.values_list('economy_seats', flat=True).get(pk=self.flight.pk)
+
+    def test_expired_holds_give_their_seats_back_in_batches(self):
+        stale = [self.hold(minutes_ago=SEAT_HOLD_MINUTES + 1), self.hold(seats=3, minutes_ago=SEAT_HOLD_MINUTES * 4)]
+        fresh = self.hold()
+        paid = self.hold(minutes_ago=SEAT_HOLD_MINUTES * 4, status='CONFIRMED')
+        self.assertEqual(self.seats_left(), 1)
+        self.assertEqual(release_expired_holds(batch_size=1), (2, 5))
+        self.assertEqual(self.seats_left(), 6)
+        statuses = dict(Booking.objects.values_list('pk', 'status'))
+        self.assertEqual([statuses[booking.pk] for booking in stale], ['EXPIRED', 'EXPIRED'])
+        self.assertEqual((statuses[fresh.pk], statuses[paid.pk]), ('PENDING', 'CONFIRMED'))
+        self.assertEqual(release_expired_holds(), (0, 0))
+        # The same hold expires once its time is up.
+        self.assertEqual(release_expired_holds(now=timezone.now() + timedelta(minutes=SEAT_HOLD_MINUTES)), (1, 2))
+
+    def test_paying_for_an_expired_hold_releases_it_instead(self):
+        booking = self.hold(minutes_ago=SEAT_HOLD_MINUTES + 1)
+        response = self.client.post(reverse('payment', args=[booking.pk]))
+        self.assertRedirects(response, reverse('dashboard'), fetch_redirect_response=False)
+        booking.refresh_from_db()
+        self.assertEqual(booking.status, 'EXPIRED')
+        self.assertFalse(Payment.objects.exists())
+        self.assertEqual(self.seats_left(), 10)
+
+    def test_command_reports_what_it_released(self):
+        self.hold(minutes_ago=SEAT_HOLD_MINUTES + 1)
+        out = StringIO()
+        call_command('release_expired_holds', stdout=out)
+        self.assertEqual(out.getvalue().strip(), 'Expired 1 held booking(s), released 2 seat(s).')
+
+
+class ConfirmationTests(TestCase):
+    def setUp(self):
+        airports, airlines = ensure_reference_data()
+        seed_flights(5, airports, airlines)
+        self.user = User.objects.create_user('payer', password='secret')
+        self.flight = Flight.objects.first()
+
+    def book(self):
+        return Booking.objects.create(
+            user=self.user, flight=self.flight, seat_class='ECONOMY', total_fare=100, status='PENDING',
+        )
+
+    def test_confirmation_is_one_transaction_and_replays_are_no_ops(self):
+        booking = self.book()
+        with CaptureQueriesContext(connection) as queries:
+            payment, created = confirm_booking(booking, idempotency_key='retry-me')
+        self.assertTrue(created)
+        # One UPDATE and three INSERTs inside the (savepoint) transaction.
+        self.assertEqual(len([q for q in queries if not q['sql'].startswith(('SAVEPOINT', 'RELEASE'))]), 4)
+        self.assertEqual(confirm_booking(booking, idempotency_key='retry-me'), (payment, False))
+        self.assertEqual(confirm_booking(booking, idempotency_key='someone-else'), (None, False))
+        self.assertEqual((Payment.objects.count(), Ticket.objects.count(), Invoice.objects.count()), (1, 1, 1))
+
+    def test_batch_confirms_pending_bookings_once(self):
+        booking_ids = [self.book().pk for _ in range(3)]
+        first = confirm_bookings(booking_ids, idempotency_key='batch-1')
+        self.assertEqual(set(first), set(booking_ids))
+        self.assertEqual(confirm_bookings(booking_ids, idempotency_key='batch-1'), first)
+        self.assertEqual(confirm_bookings(booking_ids), {})
+        self.assertEqual(Invoice.objects.filter(payment__booking_id__in=booking_ids).count(), 3)
+        self.assertFalse(Booking.objects.filter(pk__in=booking_ids).exclude(status='CONFIRMED').exists())
+
+
+class BookingSummaryTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        media_root = override_settings(MEDIA_ROOT=media)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        airports, airlines = ensure_reference_data()
+        seed_flights(5, airports, airlines)
+        self.flight = Flight.objects.select_related('airline').first()
+        self.user = User.objects.create_user('traveller', password='secret')
+        self.client.force_login(self.user)
+
+    def book(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Booking.objects.create(
+                user=self.user, flight=self.flight, seat_class='ECONOMY', total_fare=100, status='PENDING',
+            )
+
+    def dashboard_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(reverse('dashboard')).status_code, 200)
+        return len(queries)
+
+    def test_summaries_follow_the_booking_through_payment_and_cancellation(self):
+        booking = self.book()
+        summary = BookingSummary.objects.get(pk=booking.pk)
+        self.assertEqual(
+            (summary.status, summary.airline_name, summary.ticket_id), ('PENDING', self.flight.airline.airline_name, None),
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            confirm_booking(booking)
+        summary.refresh_from_db()
+        self.assertEqual(summary.status, 'CONFIRMED')
+        self.assertEqual(summary.ticket_id, Ticket.objects.get(booking=booking).pk)
+        self.assertEqual(summary.invoice_id, Invoice.objects.get(payment__booking=booking).pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('cancel_booking', args=[booking.pk]))
+        summary.refresh_from_db()
+        self.assertEqual(summary.status, 'CANCELLED')
+
+    def test_flight_and_airline_edits_reach_the_summaries(self):
+        booking = self.book()
+        self.flight.departure_time += timedelta(hours=3)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.flight.save()
+        airline = Airline.objects.get(pk=self.flight.airline_id)
+        airline.airline_name = 'Renamed Air'
+        with self.captureOnCommitCallbacks(execute=True):
+            airline.save()
+        summary = BookingSummary.objects.get(pk=booking.pk)
+        self.assertEqual((summary.departure_time, summary.airline_name), (self.flight.departure_time, 'Renamed Air'))
+        self.assertContains(self.client.get(reverse('dashboard')), 'Renamed Air')
+
+    def test_dashboard_costs_the_same_for_any_number_of_bookings(self):
+        self.book()
+        self.dashboard_queries()
+        one = self.dashboard_queries()
+        for _ in range(9):
+            self.book()
+        self.assertEqual(self.dashboard_queries(), one)
+
+
+class DocumentTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        media_root = override_settings(MEDIA_ROOT=media)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        airports, airlines = ensure_reference_data()
+        seed_flights(5, airports, airlines)
+        self.user = User.objects.create_user('passenger', password='secret', first_name='Ada', last_name='Lovelace')
+        self.booking = Booking.objects.create(
+            user=self.user, flight=Flight.objects.first(), seat_class='ECONOMY', total_fare=100, status='PENDING',
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            payment, _ = confirm_booking(self.booking)
+        self.ticket_id = Ticket.objects.get(booking=self.booking).pk
+        self.invoice_id = Invoice.objects.get(payment=payment).pk
+
+    def request(self, user=None):
+        request = RequestFactory().get('/')
+        request.user = user or self.user
+        return request
+
+    def fetch(self, view, pk):
+        """Follow the redirect to the stored document; returns (digest, response, content)."""
+        redirect = view(self.request(), pk)
+        self.assertEqual(redirect.status_code, 302)
+        match = resolve(redirect.url)
+        response = match.func(self.request(), **match.kwargs)
+        content = b''.join(response.streaming_content)
+        response.close()
+        return match.kwargs['digest'], response, content
+
+    def test_viewing_a_ticket_makes_no_queries(self):
+        with self.assertNumQueries(0):
+            digest, response, content = self.fetch(views.view_ticket_view, self.ticket_id)
+        self.assertEqual(hashlib.sha256(content).hexdigest(), digest)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn(b'ADA LOVELACE', content)
+        with self.assertNumQueries(0):
+            _, _, invoice = self.fetch(views.view_invoice_view, self.invoice_id)
+        self.assertIn(b'$100.00', invoice)
+
+    def test_documents_are_private(self):
+        stranger = User.objects.create_user('stranger', password='secret')
+        with self.assertRaises(Http404):
+            views.view_ticket_view(self.request(stranger), self.ticket_id)
+        digest, _, _ = self.fetch(views.view_ticket_view, self.ticket_id)
+        with self.assertRaises(Http404):
+            views.document_view(self.request(stranger), digest, 'html')
+
+    def test_booking_change_publishes_a_new_document(self):
+        before, _, _ = self.fetch(views.view_ticket_view, self.ticket_id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.booking.status = 'CANCELLED'
+            self.booking.save()
+        after, _, content = self.fetch(views.view_ticket_view, self.ticket_id)
+        self.assertNotEqual(before, after)
+        self.assertIn(b'CANCELLED', content)
+
+    def test_airport_edit_expires_documents_until_next_viewed(self):
+        before, _, _ = self.fetch(views.view_ticket_view, self.ticket_id)
+        folder = os.path.join(settings.MEDIA_ROOT, 'documents', str(self.user.pk))
+        files = set(os.listdir(folder))
+        airport = self.booking.flight.departure_airport
+        airport.airport_name = 'Renamed Field'
+        with self.captureOnCommitCallbacks(execute=True):
+            airport.save()
+        self.assertEqual(set(os.listdir(folder)), files)
+        after, _, content = self.fetch(views.view_ticket_view, self.ticket_id)
+        self.assertNotEqual(before, after)
+        self.assertIn(b'Renamed Field', content)
+        self.assertNotIn(f'{before}.html', os.listdir(folder))
+        self.assertIn(f'{after}.html', os.listdir(folder))
+
+    def test_documents_stay_cached_until_expired(self):
+        self.fetch(views.view_ticket_view, self.ticket_id)
+        with mock.patch('django.core.cache.backends.filebased.time.time', return_value=time.time() + 30 * 24 * 60 * 60):
+            with self.assertNumQueries(0):
+                self.fetch(views.view_ticket_view, self.ticket_id)
+
+    def test_cache_miss_renders_the_same_document(self):
+        before, _, _ = self.fetch(views.view_ticket_view, self.ticket_id)
+        clear_caches()
+        after, _, _ = self.fetch(views.view_ticket_view, self.ticket_id)
+        self.assertEqual(before, after)
+
+
+class ProfilePhotoTests(TestCase):
+    template = "{% load photos %}{% photo_url profile.profile_photo 'avatar' %}|{% photo_url profile.profile_photo 'full' %}"
+
+    def setUp(self):
+        clear_caches()
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        media_root = override_settings(MEDIA_ROOT=media)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+    def upload(self, username, size=(1600, 1200)):
+        out = BytesIO()
+        Image.new('RGBA', size, (200, 30, 30, 255)).save(out, 'PNG')
+        user = User.objects.create_user(username)
+        with self.captureOnCommitCallbacks(execute=True):
+            return PassengerProfile.objects.create(
+                user=user, phone_number='1', address='-',
+                profile_photo=SimpleUploadedFile('me.PNG', out.getvalue(), content_type='image/png'),
+            )
+
+    def test_identical_uploads_share_one_file_and_its_variants(self):
+        first, second = self.upload('twin1'), self.upload('twin2')
+        self.assertEqual(first.profile_photo.name, second.profile_photo.name)
+        self.assertRegex(first.profile_photo.name, r'^profile_photos/[0-9a-f]{64}\.png$')
+        self.assertEqual(len(default_storage.listdir('profile_photos')[1]), 1)
+
+    def test_tag_serves_resized_variants_from_cache(self):
+        profile = self.upload('flyer')
+        context = {'profile': profile}
+        avatar_url, full_url = engines['django'].from_string(self.template).render(context).split('|')
+        with self.assertNumQueries(0):
+            self.assertEqual(engines['django'].from_string(self.template).render(context), f'{avatar_url}|{full_url}')
+        for url, variant in ((avatar_url, 'avatar'), (full_url, 'full')):
+            with default_storage.open(url.removeprefix(default_storage.base_url)) as fp, Image.open(fp) as image:
+                self.assertEqual(image.format, 'WEBP')
+                self.assertLessEqual(max(image.size), VARIANTS[variant][0])
+        self.assertEqual(image.size, (1024, 768))
+
+    def test_photos_stored_before_hashing_get_variants_lazily(self):
+        out = BytesIO()
+        Image.new('RGB', (500, 500), (0, 90, 200)).save(out, 'JPEG')
+        name = default_storage.save('profile_photos/legacy.jpg', SimpleUploadedFile('legacy.jpg', out.getvalue()))
+        profile = self.upload('legacy')
+        PassengerProfile.objects.filter(pk=profile.pk).update(profile_photo=name)
+        profile.refresh_from_db()
+        rendered = engines['django'].from_string(self.template).render({'profile': profile})
+        self.assertIn(hashlib.sha256(out.getvalue()).hexdigest(), rendered)
+
+    def test_dedupe_merges_copies_stored_before_hashing(self):
+        out = BytesIO()
+        Image.new('RGB', (40, 40), (0, 90, 200)).save(out, 'PNG')
+        digest = hashlib.sha256(out.getvalue()).hexdigest()
+        profiles = []
+        for i in range(3):
+            name = default_storage.save('profile_photos/sadman.png', SimpleUploadedFile('sadman.png', out.getvalue()))
+            profile = self.upload(f'copy{i}')
+            PassengerProfile.objects.filter(pk=profile.pk).update(profile_photo=name)
+            profiles.append(profile)
+        call_command('dedupe_profile_photos', stdout=StringIO())
+        names = {profile.profile_photo.name for profile in PassengerProfile.objects.filter(pk__in=[p.pk for p in profiles])}
+        self.assertEqual(names, {f'profile_photos/{digest}.png'})
+        # The three legacy copies became one file, beside the photo the profiles were created with.
+        self.assertEqual(sorted(default_storage.listdir('profile_photos')[1]), sorted([
+            f'{digest}.png', os.path.basename(profiles[0].profile_photo.name),
+        ]))
+
+
+class RegistrationAvailabilityTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        accounts.invalidate()
+        self.addCleanup(accounts.invalidate)
+        User.objects.create_user('taken', email='Taken@Example.com')
+        accounts.ensure_loaded()
+
+    def check(self, **params):
+        return self.client.get(reverse('register_check_api'), params).json()
+
+    def test_free_values_are_answered_without_queries(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.check(username='newcomer', email='new@example.com'), {'username': True, 'email': True})
+
+    def test_possible_hits_are_confirmed_in_the_database(self):
+        with self.assertNumQueries(2):
+            self.assertEqual(self.check(username='taken', email='taken@example.COM'), {'username': False, 'email': False})
+
+    def test_new_accounts_are_added_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.create_user('latecomer', email='late@example.com')
+        self.assertEqual(self.check(username='latecomer', email='late@example.com'), {'username': False, 'email': False})
+
+    def test_forms_reject_taken_values(self):
+        form = RegistrationStep3Form({'username': 'taken', 'password': 'pw', 'password2': 'pw'})
+        self.assertIn('username', form.errors)
+        form = RegistrationStep1Form({'first_name': 'A', 'last_name': 'B', 'email': 'TAKEN@example.com'})
+        self.assertIn('email', form.errors)
+        with self.assertNumQueries(0):
+            self.assertTrue(RegistrationStep3Form({'username': 'fresh', 'password': 'pw', 'password2': 'pw'}).is_valid())
+
+    def test_username_taken_by_another_worker_sends_the_user_back_to_step_3(self):
+        session = self.client.session
+        session['step1_data'] = {'first_name': 'A', 'last_name': 'B', 'email': 'a@example.com'}
+        session['step2_data'] = {'phone_number': '123', 'address': 'Somewhere', 'gender': None}
+        session.save()
+        response = self.client.post(reverse('register_step3'), {'username': 'racer', 'password': 'pw', 'password2': 'pw'})
+        self.assertRedirects(response, reverse('register_step4_photo'))
+        # Registered elsewhere: this process's filter never hears of it.
+        User.objects.bulk_create([User(username='racer')])
+        response = self.client.post(reverse('register_step4_photo'))
+        self.assertRedirects(response, reverse('register_step3'))
+        self.assertEqual(User.objects.filter(username='racer').count(), 1)
+        self.assertFalse(PassengerProfile.objects.filter(user__username='racer').exists())
+        self.assertNotIn('step3_data', self.client.session)
+
+    def test_sign_ups_on_other_workers_reach_this_filter(self):
+        User.objects.bulk_create([User(username='elsewhere', email='else@example.com')])
+        AccountIndex().publish('elsewhere', 'else@example.com')
+        with self.assertNumQueries(2):
+            self.assertEqual(self.check(username='elsewhere', email='ELSE@example.com'), {'username': False, 'email': False})
+        with self.assertNumQueries(0):
+            self.assertEqual(self.check(username='newcomer'), {'username': True})
+
+    def test_checks_go_to_the_database_until_a_lost_entry_is_given_up_on(self):
+        number = AccountIndex().publish('lost', 'lost@example.com')
+        cache.delete(f'accounts:change:{number}')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.check(username='newcomer'), {'username': True})
+        with mock.patch('flight_management.availability.time.monotonic', return_value=time.monotonic() + 60):
+            self.check(username='newcomer')
+        accounts.ensure_loaded()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.check(username='newcomer'), {'username': True})
+
+    def test_email_taken_by_another_worker_sends_the_user_back_to_step_1(self):
+        session = self.client.session
+        session['step1_data'] = {'first_name': 'A', 'last_name': 'B', 'email': 'twin@example.com'}
+        session['step2_data'] = {'phone_number': '123', 'address': 'Somewhere', 'gender': None}
+        session['step3_data'] = {'username': 'twin', 'password': 'pw'}
+        session.save()
+        User.objects.bulk_create([User(username='first-twin', email='Twin@Example.com')])
+        response = self.client.post(reverse('register_step4_photo'))
+        self.assertRedirects(response, reverse('register_step1'))
+        self.assertFalse(User.objects.filter(username='twin').exists())
+
+    def test_bloom_filter_false_positive_rate(self):
+        bloom = BloomFilter(10_000, error_rate=0.01)
+        for i in range(10_000):
+            bloom.add(f'user{i}')
+        self.assertTrue(all(f'user{i}' in bloom for i in range(10_000)))
+        self.assertLess(sum(f'other{i}' in bloom for i in range(10_000)), 200)
+
+
+def full_scans(queryset):
+    """(plan, tables the database would read in full) for queryset, on SQLite, PostgreSQL or MySQL."""
+    if connection.vendor == 'mysql':
+        plan = queryset.explain(format='json')
+        return plan, re.findall(r'"table_name": "(\w+)",\s*"access_type": "ALL"', json.dumps(json.loads(plan), indent=1))
+    if connection.vendor == 'postgresql':
+        plan = queryset.explain()
+        return plan, re.findall(r'Seq Scan on (\w+)', plan)
+    # SQLite. Run by hand: QuerySet.explain() breaks on the subquery Django wraps window filters in.
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        plan = '\n'.join(row[-1] for row in cursor.fetchall())
+    # SEARCH uses an index for the lookup; SCAN reads a table (or a whole index) end to end.
+    return plan, re.findall(r'\bSCAN (\w+)', plan)
+
+
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        airports, airlines = ensure_reference_data()
+        seed_flights(300, airports, airlines)
+        cls.user = User.objects.create_user('planner')
+        cls.flight = Flight.objects.first()
+
+    def assertIndexed(self, queryset, model, fields):
+        index = next(index for index in model._meta.indexes if index.fields == fields)
+        plan, scans = full_scans(queryset)
+        self.assertEqual(scans, [], plan)
+        self.assertIn(index.name, plan)
+
+    def test_hot_queries_use_their_indexes(self):
+        flight = self.flight
+        route = Flight.objects.filter(
+            departure_airport_id=flight.departure_airport_id, destination_airport_id=flight.destination_airport_id,
+        )
+        cases = [
+            # search_api_view: one route, keyset-paginated by departure time.
+            (route.filter(economy_seats__gte=1).order_by('departure_time', 'flight_id')[:21],
+             Flight, ['departure_airport', 'destination_airport', 'departure_time']),
+            # FareCalendar.query: one route, a window of days.
+            (route.filter(departure_time__gte=flight.departure_time, departure_time__lt=flight.arrival_time),
+             Flight, ['departure_airport', 'destination_airport', 'departure_time']),
+            # DestinationFares / explorer: cheapest flights from one origin.
+            (Flight.objects.filter(departure_airport_id=flight.departure_airport_id).order_by('economy_price')[:50],
+             Flight, ['departure_airport', 'economy_price']),
+            (Flight.objects.filter(departure_airport_id=flight.departure_airport_id).order_by('business_price')[:50],
+             Flight, ['departure_airport', 'business_price']),
+            # A passenger's bookings, newest first.
+            (Booking.objects.filter(user=self.user).order_by('-booking_date'), Booking, ['user', '-booking_date']),
+            # release_expired_holds()
+            (Booking.objects.filter(status='PENDING', booking_date__lte=hold_cutoff()), Booking, ['status', 'booking_date']),
+            # unread_summary(): the count and the latest few.
+            (Notification.objects.filter(user=self.user, is_read=False).order_by('-sent_date')[:5],
+             Notification, ['user', '-sent_date', 'is_read']),
+            # flight_detail_view: a page of a flight's reviews, newest first.
+            (Review.objects.filter(flight=flight).order_by('-review_date', '-review_id')[:21],
+             Review, ['flight', '-review_date', '-review_id']),
+        ]
+        for queryset, model, fields in cases:
+            with self.subTest(model=model.__name__, fields=fields):
+                self.assertIndexed(queryset, model, fields)
+
+    def test_cheapest_per_destination_does_not_scan_flights(self):
+        plan, scans = full_scans(cheapest_per_destination(self.flight.departure_airport_id))
+        self.assertNotIn(Flight._meta.db_table, scans, plan)
+
+
+@skipUnless('replica' in settings.DATABASES, "needs a 'replica' alias, e.g. --settings=aeropulse.settings_local_replicas")
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_READ_VIEWS={'flight_detail': 30, 'search_results': 5})
+class ReplicaRoutingTests(TestCase):
+    # Nothing replicates between the test databases: rows created here exist only on the
+    # primary, so a read that reaches the replica doesn't find them.
+    databases = {'default', 'replica'} & set(settings.DATABASES)
+
+    @classmethod
+    def setUpTestData(cls):
+        airports, airlines = ensure_reference_data()
+        seed_flights(3, airports, airlines)
+        cls.flight = Flight.objects.first()
+        User.objects.create_user('reader', password='secret')
+
+    def setUp(self):
+        timetable.invalidate()
+        self.addCleanup(timetable.invalidate)
+
+    def detail(self):
+        return self.client.get(reverse('flight_detail', args=[self.flight.pk])).status_code
+
+    def test_listed_views_read_from_a_replica(self):
+        self.assertEqual(self.detail(), 404)
+
+    def test_recent_writers_read_from_the_primary_until_the_lag_tolerance_passes(self):
+        self.client.cookies[PIN_COOKIE] = str(time.time())
+        self.assertEqual(self.detail(), 200)
+        self.client.cookies[PIN_COOKIE] = str(time.time() - 31)
+        self.assertEqual(self.detail(), 404)
+
+    def test_writes_set_the_pin_cookie(self):
+        response = self.client.get(reverse('search_api'))
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+        response = self.client.post(reverse('login'), {'username': 'reader', 'password': 'secret'})
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(self.detail(), 200)
+
+    def test_unlisted_views_read_from_the_primary(self):
+        response = self.client.get(reverse('search_api'), {'departure_airport': self.flight.departure_airport_id})
+        self.assertTrue(response.json()['results'])
+
+    def test_shared_caches_are_filled_from_the_primary(self):
+        self.client.get(reverse('search_results'), {
+            'departure_airport': self.flight.departure_airport_id,
+            'destination_airport': self.flight.destination_airport_id,
+        })
+        self.assertTrue(timetable.route_records(
+            self.flight.departure_airport_id, self.flight.destination_airport_id, 'ECONOMY',
+        ))
+
+
+class ReferenceDataTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        Airport.objects.get_or_create(airport_code='AAA', defaults={'airport_name': 'Alpha', 'location': 'Alphaville'})
+        ensure_reference_data()
+
+    def test_airport_pages_make_no_queries_once_warm(self):
+        urls = [reverse('home_page'), reverse('price_map_view'), reverse('airport_suggest_api') + '?q=alph']
+        for url in urls:
+            self.client.get(url)
+        for url in urls:
+            with self.assertNumQueries(0):
+                self.client.get(url)
+        # The pickers load airports as the user types; the pages themselves list none.
+        self.assertNotContains(self.client.get(reverse('home_page')), 'Alphaville')
+
+    def test_an_edit_reaches_every_worker(self):
+        # Two snapshots stand in for two processes sharing one cache.
+        worker, other_worker = ReferenceData(), ReferenceData()
+        self.assertEqual(worker.current().airports['AAA'].location, 'Alphaville')
+        self.assertEqual(other_worker.current().airports['AAA'].location, 'Alphaville')
+        with self.captureOnCommitCallbacks(execute=True):
+            airport = Airport.objects.get(pk='AAA')
+            airport.location = 'Alpha City'
+            airport.save()
+        self.assertEqual(other_worker.current().airports['AAA'].location, 'Alpha City')
+        self.assertEqual(worker.current().airports['AAA'].location, 'Alpha City')
+        with self.assertNumQueries(0):
+            worker.current()
+        with self.assertRaises(TypeError):
+            worker.current().airports['AAA'] = None
+
+
+class AirportSuggestTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        airports = [
+            ('GRU', 'São Paulo–Guarulhos International', 'São Paulo, Brazil'),
+            ('SPA', 'Springfield Regional', 'Springfield, Illinois'),
+            ('SPB', 'Springfield-Branson National', 'Springfield, Missouri'),
+            ('HUB', 'Hubbard Field', 'Reno, Nevada'),
+        ]
+        for code, name, location in airports:
+            Airport.objects.update_or_create(airport_code=code, defaults={'airport_name': name, 'location': location})
+        _, airlines = ensure_reference_data()
+        seed_flights(5, ['SPB', 'HUB'], airlines)
+        airport_suggestions.invalidate()
+
+    def suggest(self, query):
+        response = self.client.get(reverse('airport_suggest_api'), {'q': query})
+        return [airport['code'] for airport in response.json()['results']]
+
+    def test_accents_and_case_are_folded(self):
+        self.assertEqual(fold('São Paulo, Brazil'), 'sao paulo brazil')
+        self.assertIn('GRU', self.suggest('sao pa'))
+        self.assertIn('GRU', self.suggest('SÃO'))
+        self.assertIn('GRU', self.suggest('guarul'))
+        self.assertIn('GRU', self.suggest('brazil'))
+        self.assertEqual(self.suggest(''), [])
+
+    def test_busier_airports_rank_first(self):
+        self.assertEqual(self.suggest('springf')[:2], ['SPB', 'SPA'])
+        self.assertEqual(self.suggest('s')[:1], ['SPB'])
+        # A whole code names its airport, however quiet.
+        self.assertEqual(self.suggest('spa')[0], 'SPA')
+
+    def test_common_prefixes_are_answered_from_the_precomputed_table(self):
+        airports = {
+            f'B{i:02d}': AirportRecord(f'B{i:02d}', f'Bench Field {i}', 'Benchland') for i in range(2 * SCAN_LIMIT)
+        }
+        popularity = {code: i for i, code in enumerate(airports)}
+        index = SuggestIndex('v1', airports, popularity, limit=5)
+        busiest = sorted(airports, key=popularity.get, reverse=True)[:5]
+        for query in ('b', 'bench', 'benchland', 'field'):
+            self.assertEqual([airport.airport_code for airport in index.suggest(query)], busiest)
+        self.assertEqual([airport.airport_code for airport in index.suggest('bench field 7')], ['B79', 'B78', 'B77', 'B76', 'B75'])
+
+    def test_reference_edits_rebuild_the_index(self):
+        self.assertNotIn('HUB', self.suggest('tahoe'))
+        with self.captureOnCommitCallbacks(execute=True):
+            airport = Airport.objects.get(pk='HUB')
+            airport.location = 'Lake Tahoe, Nevada'
+            airport.save()
+        self.assertEqual(self.suggest('tahoe'), ['HUB'])
+
+
+class ReviewRatingTests(TestCase):
+    def setUp(self):
+        airports, airlines = ensure_reference_data()
+        seed_flights(2, airports, airlines)
+        self.flight = Flight.objects.first()
+        self.user = User.objects.create_user('reviewer', password='secret')
+        Booking.objects.create(user=self.user, flight=self.flight, seat_class='ECONOMY', total_fare=100, status='CONFIRMED')
+        self.client.force_login(self.user)
+
+    def review(self, rating):
+        return self.client.post(reverse('add_review', args=[self.flight.pk]), {'rating': rating, 'comment': 'Fine.'})
+
+    def counters(self):
+        return {
+            summary.scope: (summary.count, summary.total, [summary.stars_1, summary.stars_2, summary.stars_3,
+                                                         summary.stars_4, summary.stars_5])
+            for summary in RatingSummary.objects.all()
+        }
+
+    def test_reviews_update_the_flight_airline_and_route_counters(self):
+        self.review(4)
+        self.review(2)
+        self.assertEqual(self.review(9).status_code, 200)
+        expected = (2, 6, [0, 1, 0, 1, 0])
+        self.assertEqual(self.counters(), {'FLIGHT': expected, 'AIRLINE': expected, 'ROUTE': expected})
+        summary = RatingSummary.objects.get(scope='ROUTE')
+        self.assertEqual(summary.key, f'{self.flight.departure_airport_id}-{self.flight.destination_airport_id}')
+        self.assertEqual(summary.average, 3)
+
+        Review.objects.filter(rating=2).get().delete()
+        review = Review.objects.get()
+        review.rating = 5
+        review.save()
+        incremental = self.counters()
+        self.assertEqual(incremental['FLIGHT'], (1, 5, [0, 0, 0, 0, 1]))
+        rebuild_ratings()
+        self.assertEqual(self.counters(), incremental)
+
+    def test_flight_detail_costs_the_same_with_many_reviews(self):
+        def detail_queries(**params):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('flight_detail', args=[self.flight.pk]), params)
+            return len(queries), response
+
+        for _ in range(2):
+            self.review(5)
+        detail_queries()  # load the per-process caches first
+        few, _ = detail_queries()
+        for i in range(2 * views.REVIEWS_PER_PAGE):
+            user = User.objects.create_user(f'reviewer{i}')
+            Review.objects.create(user=user, flight=self.flight, rating=3)
+        many, response = detail_queries()
+        self.assertEqual(many, few)
+        self.assertContains(response, f'from {2 * views.REVIEWS_PER_PAGE + 2} reviews')
+        self.assertEqual(len(response.context['reviews']), views.REVIEWS_PER_PAGE)
+
+        seen = {review.pk for review in response.context['reviews']}
+        cursor = response.context['next_cursor']
+        while cursor:
+            _, response = detail_queries(cursor=cursor)
+            seen.update(review.pk for review in response.context['reviews'])
+            cursor = response.context['next_cursor']
+        self.assertEqual(seen, set(Review.objects.values_list('pk', flat=True)))
+        self.assertEqual(self.client.get(reverse('flight_detail', args=[self.flight.pk]), {'cursor': 'x'}).status_code, 400)
+
+    def test_reviews_sharing_a_timestamp_are_all_paged(self):
+        reviewed = timezone.now().replace(microsecond=654321)
+        for i in range(6):
+            Review.objects.create(user=User.objects.create_user(f'same{i}'), flight=self.flight, rating=4)
+        Review.objects.update(review_date=reviewed)
+        seen, cursor = [], None
+        with mock.patch.object(views, 'REVIEWS_PER_PAGE', 2):
+            for _ in range(6):
+                response = self.client.get(reverse('flight_detail', args=[self.flight.pk]),
+                                           {'cursor': cursor} if cursor else {})
+                seen += [review.pk for review in response.context['reviews']]
+                cursor = response.context['next_cursor']
+                if not cursor:
+                    break
+        self.assertEqual(seen, list(Review.objects.order_by('-review_id').values_list('pk', flat=True)))
+
+    def test_bad_review_cursors_are_rejected(self):
+        url = reverse('flight_detail', args=[self.flight.pk])
+        for values in ([{}, 1], [[1], 2], ['x', {}], ['2026-01-01T00:00:00', 'x']):
+            with self.subTest(values=values):
+                cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+                self.assertEqual(self.client.get(url, {'cursor': cursor}).status_code, 400)
+
+
+class TimetableTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        airports, airlines = ensure_reference_data()
+        seed_flights(40, airports, airlines)
+        timetable.invalidate()
+        self.addCleanup(timetable.invalidate)
+        self.flight = Flight.objects.filter(economy_seats__gt=2).first()
+        # The same index as loaded by another worker.
+        self.other = TimetableIndex()
+        self.other.ensure_loaded()
+
+    def seats(self, index, flight_id=None):
+        flight = self.flight if flight_id is None else Flight.objects.get(pk=flight_id)
+        day = departure_date(flight.departure_time)
+        return {
+            record.flight_id: record.seats
+            for record in index.search(flight.departure_airport_id, flight.destination_airport_id, passengers=0, on_date=day)
+        }.get(flight.pk)
+
+    def test_search_matches_the_database(self):
+        flight = self.flight
+        expected = list(Flight.objects.filter(
+            departure_airport=flight.departure_airport_id, destination_airport=flight.destination_airport_id,
+            economy_seats__gte=2,
+        ).order_by('departure_time', 'flight_id').values_list('flight_id', flat=True))
+        records = timetable.search(flight.departure_airport_id, flight.destination_airport_id, passengers=2)
+        self.assertEqual([record.flight_id for record in records], expected)
+        with self.assertNumQueries(0):
+            timetable.search(flight.departure_airport_id, flight.destination_airport_id, passengers=2)
+
+    def test_bad_search_parameters_answer_400(self):
+        for params in ({'departure_date': '2026-02-30'}, {'num_adults': 'two'}, {'num_children': ''}):
+            with self.subTest(params=params):
+                response = self.client.get(reverse('search_results'), {
+                    'departure_airport': self.flight.departure_airport_id,
+                    'destination_airport': self.flight.destination_airport_id, **params,
+                })
+                self.assertEqual(response.status_code, 400)
+
+    def test_saves_reach_this_process_at_once_and_other_workers_on_sync(self):
+        timetable.ensure_loaded()
+        self.flight.economy_seats = 1
+        with self.captureOnCommitCallbacks(execute=True):
+            self.flight.save()
+        self.assertEqual(self.seats(timetable), 1)
+        self.assertNotEqual(self.seats(self.other), 1)
+        with self.assertNumQueries(1):
+            self.other.sync()
+        self.assertEqual(self.seats(self.other), 1)
+        with self.assertNumQueries(0):
+            self.other.sync()
+
+    def test_seat_changes_and_deletes_are_published(self):
+        timetable.ensure_loaded()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(reserve_seats(self.flight.pk, 'ECONOMY', 2))
+        self.other.sync()
+        self.assertEqual(self.seats(self.other), self.flight.economy_seats - 2)
+        flight_id = self.flight.pk
+        with self.captureOnCommitCallbacks(execute=True):
+            Flight.objects.filter(pk=flight_id).delete()
+        self.other.sync()
+        self.assertNotIn(flight_id, [record.flight_id for record in self.other.search(
+            self.flight.departure_airport_id, self.flight.destination_airport_id)])
+
+    def test_a_lost_change_reloads_everything_after_a_wait(self):
+        Flight.objects.filter(pk=self.flight.pk).update(economy_seats=0)
+        number = timetable.publish([self.flight.pk])
+        cache.delete(f'timetable:change:{number}')
+        self.other.sync()
+        self.assertNotEqual(self.seats(self.other), 0)
+        with mock.patch('flight_management.timetable.time.monotonic', return_value=time.monotonic() + 60):
+            self.other.sync()
+        self.assertEqual(self.seats(self.other), 0)
+
+    def test_bulk_changes_published_as_a_whole_reload(self):
+        Flight.objects.update(economy_seats=7)
+        timetable.publish(ALL_FLIGHTS)
+        self.other.sync()
+        self.assertEqual(self.seats(self.other), 7)
+
+
+class ConnectionSearchTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        airports, self.airlines = ensure_reference_data()
+        self.a, self.b, self.c, self.d = airports[:4]
+        self.day = timezone.localdate() + timedelta(days=1)
+        self.midnight = timezone.make_aware(datetime.combine(self.day, datetime.min.time()))
+        timetable.invalidate()
+        self.addCleanup(timetable.invalidate)
+
+    def fly(self, origin, destination, departs, arrives, price, seats=10):
+        return Flight.objects.create(
+            airline_id=self.airlines[0], departure_airport_id=origin, destination_airport_id=destination,
+            departure_time=self.midnight + departs, arrival_time=self.midnight + arrives,
+            economy_price=price, economy_seats=seats, business_price=price * 4, business_seats=seats,
+        )
+
+    def search(self, **params):
+        response = self.client.get(reverse('connections_api'), {
+            'origin': self.a, 'destination': self.d, 'date': self.day.isoformat(), **params,
+        })
+        self.assertEqual(response.status_code, 200)
+        return response.json()['itineraries']
+
+    def test_connections_respect_the_minimum_connection_and_maximum_layover(self):
+        hour = timedelta(hours=1)
+        self.fly(self.a, self.d, 8 * hour, 16 * hour, 500)
+        self.fly(self.a, self.b, 8 * hour, 9 * hour, 100)
+        self.fly(self.b, self.d, 10 * hour, 11 * hour, 150)
+        self.fly(self.a, self.c, 8 * hour, 9 * hour, 50)
+        self.fly(self.c, self.d, 9 * hour + timedelta(minutes=20), 10 * hour, 50)  # too tight
+        self.fly(self.c, self.d, 16 * hour, 17 * hour, 50)  # too long a wait
+        itineraries = self.search()
+        self.assertEqual([(i['via'], i['economy_price']) for i in itineraries], [([self.b], '250.00'), ([], '500.00')])
+        self.assertEqual(itineraries[0]['duration_minutes'], 180)
+        self.assertEqual([i['via'] for i in self.search(max_connections=0)], [[]])
+        self.assertEqual([i['via'] for i in self.search(max_connections=-3)], [[]])
+        self.assertEqual([i['via'] for i in self.search(passengers=11)], [])
+
+    def test_results_follow_seat_changes(self):
+        hour = timedelta(hours=1)
+        self.fly(self.a, self.b, 8 * hour, 9 * hour, 100)
+        second = self.fly(self.b, self.d, 10 * hour, 11 * hour, 150, seats=1)
+        self.assertEqual(len(self.search()), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_seats(second.pk, 'ECONOMY', 1)
+        self.assertEqual(self.search(), [])
+
+    def test_pruning_keeps_the_best_itineraries(self):
+        seed_flights(1500, ensure_reference_data()[0][:12], self.airlines, days=1)
+        timetable.invalidate()
+        today = timezone.localdate()
+        for origin, destination in ((self.a, self.d), (self.b, self.c)):
+            with self.subTest(route=(origin, destination)):
+                everything = connection_search.search(origin, destination, today, limit=100_000)
+                self.assertGreater(len(everything), 10)
+                self.assertEqual(connection_search.search(origin, destination, today), everything[:10])
+
+    def test_bad_dates_and_counts_answer_400(self):
+        for params in ({'date': '9999-12-31'}, {'date': '2026-02-30'}, {'passengers': 'x'}):
+            with self.subTest(params=params):
+                response = self.client.get(reverse('connections_api'), {'origin': self.a, 'destination': self.d, **params})
+                self.assertEqual(response.status_code, 400)
+
+    def test_graph_cache_is_bounded(self):
+        for offset in range(ConnectionSearch.max_graphs + 3):
+            connection_search.search(self.a, self.d, self.day + timedelta(days=offset))
+        self.assertLessEqual(len(connection_search._graphs), ConnectionSearch.max_graphs)
+
+
+class ImportScheduleTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        timetable.invalidate()
+        self.addCleanup(timetable.invalidate)
+
+    def write(self, name, text):
+        path = f'{self.directory}/{name}'
+        with open(path, 'w') as fp:
+            fp.write(text)
+        return path
+
+    def import_schedule(self, **files):
+        out = StringIO()
+        args = [arg for kind, paths in files.items() for arg in (f'--{kind}', *paths)]
+        call_command('import_schedule', *args, '--chunk-size', '2', stdout=out)
+        return out.getvalue()
+
+    def test_import_upserts_rejects_bad_rows_and_reaches_running_servers(self):
+        worker = TimetableIndex()
+        worker.ensure_loaded()
+        version = ReferenceData().current().version
+        airports = self.write('airports.csv', 'airport_code,airport_name,location\n'
+                              'QQA,Alpha Field,"Alpha, Testland"\nQQB,Beta Field,"Beta, Testland"\n')
+        airlines = self.write('airlines.csv', 'airline_code,airline_name\nQQ,Quick Air\n')
+        flight = {
+            'airline': 'QQ', 'departure_airport': 'QQA', 'destination_airport': 'QQB',
+            'departure_time': '2030-01-01T10:00:00', 'arrival_time': '2030-01-01T12:00:00',
+            'economy_price': '99.50', 'economy_seats': 10, 'business_price': '400', 'business_seats': 2,
+        }
+        flights = self.write('flights.jsonl', '\n'.join([
+            json.dumps(flight),
+            json.dumps({**flight, 'departure_airport': 'ZZZ'}),
+            json.dumps({**flight, 'arrival_time': '2030-01-01T09:00:00'}),
+            'not json',
+        ]))
+        output = self.import_schedule(airports=[airports], airlines=[airlines], flights=[flights])
+        self.assertIn('1 flights imported, 3 rejected', output)
+        self.assertIn('unknown airport ZZZ', output)
+        imported = Flight.objects.get(departure_airport='QQA')
+        self.assertEqual((imported.airline_id, imported.economy_price), ('QQ', Decimal('99.50')))
+
+        self.assertNotEqual(ReferenceData().current().version, version)
+        worker.sync()
+        self.assertEqual([record.flight_id for record in worker.search('QQA', 'QQB')], [imported.pk])
+
+        update = self.write('update.csv', 'flight_id,airline,departure_airport,destination_airport,departure_time,'
+                            'arrival_time,economy_price,economy_seats,business_price,business_seats\n'
+                            f'{imported.pk},QQ,QQA,QQB,2030-01-01T10:00:00,2030-01-01T12:00:00,80,3,400,2\n')
+        self.import_schedule(flights=[update])
+        self.assertEqual(Flight.objects.filter(departure_airport='QQA').count(), 1)
+        worker.sync()
+        self.assertEqual([record.price for record in worker.search('QQA', 'QQB')], [Decimal('80')])
+
+    def test_rows_superseded_within_a_chunk_are_not_counted(self):
+        airports = self.write('airports.csv', 'airport_code,airport_name,location\n'
+                              'QQA,Alpha Field,"Alpha, Testland"\nqqa,Alpha Intl,"Alpha, Testland"\n'
+                              'QQB,Beta Field,"Beta, Testland"\n')
+        output = self.import_schedule(airports=[airports])
+        self.assertIn('2 airports imported, 0 rejected', output)
+        self.assertEqual(Airport.objects.get(airport_code='QQA').airport_name, 'Alpha Intl')
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.enterContext(override_settings(METRICS_DIR=directory))
+        registry.reset()
+        airports, airlines = ensure_reference_data()
+        seed_flights(40, airports, airlines)
+        self.flight = Flight.objects.filter(economy_seats__gt=0).first()
+        timetable.invalidate()
+        self.addCleanup(timetable.invalidate)
+
+    async def test_search_is_served_from_the_timetable(self):
+        params = {
+            'departure_airport': self.flight.departure_airport_id,
+            'destination_airport': self.flight.destination_airport_id, 'num_adults': 1,
+        }
+        response = await self.async_client.get(reverse('search_results'), params)
+        self.assertEqual(response.status_code, 200)
+        expected = [flight_id async for flight_id in Flight.objects.filter(
+            departure_airport_id=self.flight.departure_airport_id,
+            destination_airport_id=self.flight.destination_airport_id, economy_seats__gte=1,
+        ).order_by('departure_time', 'flight_id').values_list('flight_id', flat=True)]
+        self.assertEqual([record.flight_id for record in response.context['flights']], expected)
+        # The metrics middleware counts the queries each request makes, here in async mode.
+        await sync_to_async(registry.reset)()
+        await self.async_client.get(reverse('search_results'), params)
+        stats = (await sync_to_async(registry.snapshot)())['search_results']
+        self.assertEqual((stats['requests'], stats['queries_per_request']), (1, 0))
+
+    async def test_reloads_and_catch_ups_run_off_the_event_loop(self):
+        params = {
+            'departure_airport': self.flight.departure_airport_id,
+            'destination_airport': self.flight.destination_airport_id, 'num_adults': 1,
+        }
+        await self.async_client.get(reverse('search_results'), params)
+        # Another worker sells the flight out; this one is due to catch up, and then an airline edit invalidates it.
+        await Flight.objects.filter(pk=self.flight.pk).aupdate(economy_seats=0)
+        await sync_to_async(timetable.publish)([self.flight.pk])
+        with mock.patch('flight_management.timetable.time.monotonic', return_value=time.monotonic() + 60):
+            response = await self.async_client.get(reverse('search_results'), params)
+        self.assertNotIn(self.flight.pk, [record.flight_id for record in response.context['flights']])
+        timetable.invalidate()
+        for url, query in ((reverse('search_results'), params), (reverse('price_map_api'), {'origin': self.flight.departure_airport_id})):
+            with self.subTest(url=url):
+                self.assertEqual((await self.async_client.get(url, query)).status_code, 200)
+
+    async def test_price_map_api_answers_from_the_fare_matrix(self):
+        url = reverse('price_map_api')
+        self.assertEqual((await self.async_client.get(url)).status_code, 400)
+        response = await self.async_client.get(url, {'origin': self.flight.departure_airport_id})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json())
+        again = await self.async_client.get(
+            url, {'origin': self.flight.departure_airport_id}, headers={'If-None-Match': response['ETag']},
+        )
+        self.assertEqual(again.status_code, 304)
+
+    async def test_flight_detail_shows_the_flight_or_404(self):
+        response = await self.async_client.get(reverse('flight_detail', args=[self.flight.pk]))
+        self.assertEqual(response.status_code, 200)
+        flight = response.context['flight']
+        self.assertEqual(flight.pk, self.flight.pk)
+        self.assertContains(response, flight.airline.airline_name)
+        missing = await self.async_client.get(reverse('flight_detail', args=[10 ** 9]))
+        self.assertEqual(missing.status_code, 404)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        airports, airlines = ensure_reference_data()
+        seed_flights(7, airports, airlines)
+        Flight.objects.update(economy_seats=10)
+
+    def pages(self, **params):
+        flight_ids, cursor = [], None
+        for _ in range(10):
+            response = self.client.get(reverse('search_api'), {'limit': 2, 'fields': 'flight_id', **params,
+                                                              **({'cursor': cursor} if cursor else {})})
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            flight_ids += [row['flight_id'] for row in body['results']]
+            cursor = body['next_cursor']
+            if not cursor:
+                return flight_ids
+        self.fail(f'Still paging after {len(flight_ids)} rows.')
+
+    def test_pages_reach_the_end_in_order(self):
+        expected = list(Flight.objects.order_by('departure_time', 'flight_id').values_list('flight_id', flat=True))
+        self.assertEqual(self.pages(), expected)
+
+    def test_cursors_keep_microseconds(self):
+        departure = timezone.now().replace(microsecond=123456)
+        Flight.objects.update(departure_time=departure)
+        flights = list(Flight.objects.order_by('flight_id')[:3])
+        for i, flight in enumerate(flights):
+            flight.departure_time = departure + timedelta(microseconds=i + 1)
+            flight.save()
+        expected = list(Flight.objects.order_by('departure_time', 'flight_id').values_list('flight_id', flat=True))
+        self.assertEqual(self.pages(), expected)
+        self.assertEqual(decode_cursor(encode_cursor([departure]), 1), [departure.isoformat()])
+
+    def test_malformed_cursor_is_rejected(self):
+        self.assertEqual(self.client.get(reverse('search_api'), {'cursor': 'not-a-cursor'}).status_code, 400)
+
+    def test_well_formed_cursors_with_the_wrong_types_are_rejected(self):
+        for values in ([{}, 1], [[1], 2], ['x', {}], [True, 1], ['not a time', 1], ['2026-01-01T00:00:00', 'x']):
+            with self.subTest(values=values):
+                cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+                self.assertEqual(self.client.get(reverse('search_api'), {'cursor': cursor}).status_code, 400)
+
+
+class PriceMapTests(TestCase):
+    def setUp(self):
+        airports, airlines = ensure_reference_data()
+        seed_flights(60, airports, airlines)
+        self.origin = Flight.objects.values_list('departure_airport_id', flat=True).first()
+        timetable.invalidate()
+        self.addCleanup(timetable.invalidate)
+
+    def expected(self, seat_class='ECONOMY'):
+        seats, price = seat_field(seat_class), PRICE_FIELDS[seat_class]
+        flights = Flight.objects.filter(departure_airport_id=self.origin, **{f'{seats}__gt': 0})
+        cheapest = {}
+        for location, fare in flights.values_list('destination_airport__location', price):
+            country = airport_country(location)
+            cheapest[country] = min(fare, cheapest.get(country, fare))
+        return cheapest
+
+    def fetch(self, **params):
+        response = self.client.get(reverse('price_map_api'), {'origin': self.origin, **params})
+        self.assertEqual(response.status_code, 200)
+        return response, {country: Decimal(price) for country, price in response.json().items()}
+
+    def test_prices_are_the_cheapest_bookable_fare_per_country(self):
+        self.assertTrue(self.expected())
+        for seat_class in ('ECONOMY', 'BUSINESS'):
+            with self.subTest(seat_class=seat_class):
+                self.assertEqual(self.fetch(seat_class=seat_class)[1], self.expected(seat_class))
+
+    def test_unchanged_prices_answer_304_without_queries(self):
+        response, _ = self.fetch()
+        with self.assertNumQueries(0):
+            again = self.client.get(
+                reverse('price_map_api'), {'origin': self.origin}, HTTP_IF_NONE_MATCH=response['ETag'],
+            )
+        self.assertEqual(again.status_code, 304)
+
+    def test_saves_and_sell_outs_reach_the_matrix(self):
+        response, _ = self.fetch()
+        flight = Flight.objects.filter(departure_airport_id=self.origin, economy_seats__gt=0).first()
+        flight.economy_price = 1
+        with self.captureOnCommitCallbacks(execute=True):
+            flight.save()
+        changed, prices = self.fetch()
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+        self.assertEqual(prices, self.expected())
+        self.assertEqual(prices[airport_country(flight.destination_airport.location)], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_seats(flight.pk, 'ECONOMY', flight.economy_seats)
+        self.assertEqual(self.fetch()[1], self.expected())
+
+
+class PriceMapLayerTests(TestCase):
+    def setUp(self):
+        airports, airlines = ensure_reference_data()
+        seed_flights(60, airports, airlines)
+        flight = Flight.objects.filter(economy_seats__gt=0).first()
+        self.origin = flight.departure_airport_id
+        Airport.objects.filter(pk=flight.destination_airport_id).update(location='Paris, France')
+        reference.bump()
+        timetable.invalidate()
+        self.addCleanup(timetable.invalidate)
+
+    def layer(self, detail='medium', **headers):
+        response = self.client.get(reverse('price_map_layer'), {'origin': self.origin, 'detail': detail}, **headers)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_prices_are_joined_into_the_country_outlines(self):
+        prices = self.client.get(reverse('price_map_api'), {'origin': self.origin}).json()
+        geometries = json.loads(self.layer().content)['objects']['countries']['geometries']
+        on_the_map = {geometry['properties']['name'] for geometry in geometries}
+        priced = {
+            geometry['properties']['name']: geometry['properties']['price']
+            for geometry in geometries if geometry['properties']['price'] is not None
+        }
+        self.assertIn('France', priced)
+        self.assertEqual(priced, {country: float(price) for country, price in prices.items() if country in on_the_map})
+
+    def test_layers_are_gzipped_on_request_and_answer_304_when_unchanged(self):
+        raw = self.layer(detail='low')
+        compressed = self.layer(detail='low', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(compressed.content), raw.content)
+        self.assertLess(len(raw.content), len(self.layer(detail='high').content))
+        again = self.client.get(
+            reverse('price_map_layer'), {'origin': self.origin, 'detail': 'low'}, HTTP_IF_NONE_MATCH=raw['ETag'],
+        )
+        self.assertEqual(again.status_code, 304)
+        self.assertNotEqual(self.layer(detail='high')['ETag'], raw['ETag'])
+
+    def test_simplified_rings_stay_closed_and_quantize_losslessly(self):
+        square = [[x / 10, 0] for x in range(11)] + [[1, y / 10] for y in range(1, 11)] + [[0, 1], [0, 0]]
+        simplified = simplify_ring(square, 0.01)
+        self.assertEqual(simplified, [[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]])
+        topology = build_topology([{
+            'properties': {'name': 'Squareland'}, 'geometry': {'type': 'Polygon', 'coordinates': [square]},
+        }], 0.01, quantization=11)
+        x = y = 0
+        decoded = []
+        for dx, dy in topology['arcs'][0]:
+            x, y = x + dx, y + dy
+            decoded.append([x * topology['transform']['scale'][0], y * topology['transform']['scale'][1]])
+        self.assertEqual(decoded, simplified)
+
+
+class FareCalendarTests(TestCase):
+    def setUp(self):
+        airports, airlines = ensure_reference_data(num_airports=4)
+        seed_flights(120, airports, airlines, days=10)
+        route = Flight.objects.values('departure_airport_id', 'destination_airport_id').annotate(
+            flights=Count('pk')).order_by('-flights').first()
+        self.origin, self.destination = route['departure_airport_id'], route['destination_airport_id']
+        timetable.invalidate()
+        self.addCleanup(timetable.invalidate)
+
+    def calendar(self, **params):
+        response = self.client.get(reverse('fare_calendar_api'), {
+            'origin': self.origin, 'destination': self.destination, **params,
+        })
+        self.assertEqual(response.status_code, 200)
+        return [
+            {key: Decimal(value) if key.endswith('price') and value is not None else value for key, value in day.items()}
+            for day in response.json()['calendar']
+        ]
+
+    def expected(self, days=30):
+        cheapest = {}
+        route = Flight.objects.filter(departure_airport_id=self.origin, destination_airport_id=self.destination)
+        for flight in route:
+            day = cheapest.setdefault(timezone.localdate(flight.departure_time).isoformat(), {})
+            for seat_class, price in PRICE_FIELDS.items():
+                fare = getattr(flight, price)
+                if getattr(flight, seat_field(seat_class)) > 0 and fare < day.get(price, fare + 1):
+                    day[price] = fare
+        start = timezone.localdate()
+        calendar = []
+        for offset in range(days):
+            day = (start + timedelta(days=offset)).isoformat()
+            fares = cheapest.get(day, {})
+            calendar.append({'date': day, **{price: fares.get(price) for price in PRICE_FIELDS.values()}})
+        return calendar
+
+    def test_one_entry_per_day_with_the_lowest_fare_left(self):
+        calendar = self.calendar()
+        self.assertEqual(calendar, self.expected())
+        self.assertTrue(any(day['economy_price'] for day in calendar))
+        self.assertEqual(len(self.calendar(days=90)), 90)
+
+    def test_cached_until_the_route_changes(self):
+        self.calendar()
+        with self.assertNumQueries(0):
+            self.calendar()
+        flight = Flight.objects.filter(
+            departure_airport_id=self.origin, destination_airport_id=self.destination, economy_seats__gt=0,
+        ).first()
+        flight.economy_price = 1
+        with self.captureOnCommitCallbacks(execute=True):
+            flight.save()
+        self.assertEqual(self.calendar(), self.expected())
+        with self.captureOnCommitCallbacks(execute=True):
+            reserve_seats(flight.pk, 'ECONOMY', flight.economy_seats)
+        self.assertEqual(self.calendar(), self.expected())
+
+    def test_missing_route_or_bad_window_is_rejected(self):
+        self.assertEqual(self.client.get(reverse('fare_calendar_api'), {'origin': self.origin}).status_code, 400)
+        for params in ({'start': '2026-02-30'}, {'start': '9999-12-31'}, {'days': 0}, {'days': 29}, {'days': 91}):
+            with self.subTest(params=params):
+                response = self.client.get(reverse('fare_calendar_api'), {
+                    'origin': self.origin, 'destination': self.destination, **params,
+                })
+                self.assertEqual(response.status_code, 400)
+
+
+class ExplorerTests(TestCase):
+    def setUp(self):
+        airports, airlines = ensure_reference_data()
+        seed_flights(60, airports, airlines)
+        self.origin = Flight.objects.values_list('departure_airport_id', flat=True).first()
+        timetable.invalidate()
+        self.addCleanup(timetable.invalidate)
+
+    def results(self, max_budget, seat_class='ECONOMY'):
+        response = self.client.get(reverse('explorer_results'), {
+            'departure_airport': self.origin, 'max_budget': max_budget, 'seat_class': seat_class,
+        })
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_explorer_page_renders(self):
+        response = self.client.get(reverse('explorer_view'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, reverse('explorer_results'))
+
+    def test_results_list_the_cheapest_flight_per_destination_within_budget(self):
+        cheapest = list(cheapest_per_destination(self.origin))
+        self.assertTrue(cheapest)
+        budget = cheapest[len(cheapest) // 2].economy_price
+        response = self.results(budget)
+        expected = [flight.pk for flight in cheapest if flight.economy_price <= budget]
+        self.assertEqual([flight.pk for flight in response.context['flights']], expected)
+        self.assertEqual(len({flight.destination_airport_id for flight in response.context['flights']}), len(expected))
+        self.assertContains(response, cheapest[0].destination_airport.location)
+
+    def test_results_follow_a_price_change(self):
+        self.assertEqual(list(self.results(1).context['flights']), [])
+        flight = Flight.objects.filter(departure_airport_id=self.origin, economy_seats__gt=0).first()
+        flight.economy_price = 1
+        with self.captureOnCommitCallbacks(execute=True):
+            flight.save()
+        self.assertEqual([f.pk for f in self.results(1).context['flights']], [flight.pk])
+
+    def test_missing_or_bad_budget_goes_back_to_the_form(self):
+        for budget in ('', 'lots', 'NaN'):
+            with self.subTest(budget=budget):
+                response = self.client.get(reverse('explorer_results'), {
+                    'departure_airport': self.origin, 'max_budget': budget,
+                })
+                self.assertRedirects(response, reverse('explorer_view'))
+
+
+class AdminChangelistTests(TestCase):
+    def setUp(self):
+        self.airports, self.airlines = ensure_reference_data()
+        self.client.force_login(User.objects.create_superuser('admin', password='secret'))
+
+    def seed(self, count):
+        seed_flights(count, self.airports, self.airlines, seed=count)
+        user = User.objects.create_user(f'passenger{count}')
+        Booking.objects.bulk_create([
+            Booking(user=user, flight=flight, seat_class='ECONOMY', total_fare=100, status='CONFIRMED')
+            for flight in Flight.objects.order_by('-pk')[:count]
+        ])
+
+    def changelist_queries(self, model):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(f'admin:flight_management_{model}_changelist'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelists_cost_the_same_at_any_page_size(self):
+        self.seed(3)
+        few = {model: self.changelist_queries(model) for model in ('flight', 'booking')}
+        self.seed(97)
+        for model, queries in few.items():
+            with self.subTest(model=model):
+                self.assertEqual(self.changelist_queries(model), queries)
+
+    def test_change_forms_use_autocomplete_widgets(self):
+        self.seed(3)
+        response = self.client.get(reverse('admin:flight_management_booking_add'))
+        self.assertContains(response, 'class="admin-autocomplete"', count=2)
+        self.assertNotContains(response, str(Flight.objects.first()))
+
+    def test_small_tables_are_counted_exactly(self):
+        self.seed(3)
+        self.assertEqual(EstimatedCountPaginator(Flight.objects.order_by('pk'), 10).count, Flight.objects.count())
@@ -0,0 +1,366 @@
+# flight_management/timetable.py
+# Every worker keeps its own copy of the index. A change is applied at once in the
+# process that made it and published to the shared cache as a numbered entry
+# naming the flights it touched; the other workers read the counter at most once
+# every TIMETABLE_SYNC_SECONDS and re-read just those flights. A worker that has
+# fallen too far behind, or finds an entry gone, reloads the whole timetable.
+
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.utils import timezone
+
+from .coordination import cache
+from .models import Airport, Flight
+from .replicas import primary
+
+SEAT_CLASSES = ('ECONOMY', 'BUSINESS')
+
+TIMETABLE_SYNC_SECONDS = getattr(settings, 'TIMETABLE_SYNC_SECONDS', 1)
+# How long a published change stays readable, and how many a worker replays before reloading instead.
+TIMETABLE_CHANGE_SECONDS = getattr(settings, 'TIMETABLE_CHANGE_SECONDS', 10 * 60)
+TIMETABLE_MAX_REPLAY = 1000
+# A change number handed out but not yet written is waited for this long before it counts as lost.
+MISSING_CHANGE_SECONDS = 5
+
+CHANGES_KEY = 'timetable:changes'
+ALL_FLIGHTS = 'all'
+AIRPORTS = 'airports'
+
+
+def _change_key(number):
+    return f'timetable:change:{number}'
+
+# One row per flight and seat class. Kept as plain tuples so a full timetable of
+# a million flights stays compact and the search page never touches the ORM.
+FlightRecord = namedtuple('FlightRecord', [
+    'flight_id', 'airline_name', 'departure_code', 'destination_code',
+    'departure_time', 'arrival_time', 'seat_class', 'price', 'seats',
+])
+
+AirportRecord = namedtuple('AirportRecord', ['airport_code', 'airport_name', 'location'])
+
+FLIGHT_FIELDS = (
+    'flight_id', 'airline__airline_name', 'departure_airport_id', 'destination_airport_id',
+    'departure_time', 'arrival_time', 'economy_price', 'economy_seats', 'business_price', 'business_seats',
+)
+
+
+def departure_date(departure_time):
+    if timezone.is_aware(departure_time):
+        departure_time = timezone.localtime(departure_time)
+    return departure_time.date()
+
+
+def _records_from_row(row):
+    (flight_id, airline_name, departure_code, destination_code,
+     departure_time, arrival_time, economy_price, economy_seats, business_price, business_seats) = row
+    return (
+        FlightRecord(flight_id, airline_name, departure_code, destination_code,
+                     departure_time, arrival_time, 'ECONOMY', economy_price, economy_seats),
+        FlightRecord(flight_id, airline_name, departure_code, destination_code,
+                     departure_time, arrival_time, 'BUSINESS', business_price, business_seats),
+    )
+
+
+class TimetableIndex:
+    """
+    Process-local index of the timetable:
+    (origin, destination, seat_class) -> departure date -> {flight_id: FlightRecord},
+    plus a per-day view of every flight used by the connection search in routing.py.
+
+    Built once from a single values_list() query and then kept current from the
+    Flight signals in signals.py, one flight at a time, and from the changes other
+    processes publish().
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        self._loaded = False
+        self._seen = 0
+        self._synced_at = 0.0
+        self._missing = None
+        self._generation = 0
+        self._routes = {}
+        self._keys_by_flight = {}
+        self._days = {}
+        self._day_versions = {}
+        self._destinations = {}
+        self._airports = {}
+        self._listeners = []
+
+    # --- Building and incremental maintenance ---
+
+    def rebuild(self, flights=None):
+        if flights is None:
+            flights = Flight.objects.all()
+        rows = flights.values_list(*FLIGHT_FIELDS).iterator(chunk_size=10000)
+        airports = Airport.objects.values_list('airport_code', 'airport_name', 'location')
+        with self._lock, primary():
+            # Read before the rows, so a change published during the load is replayed afterwards.
+            self._seen = cache.get(CHANGES_KEY, 0)
+            self._synced_at = time.monotonic()
+            self._missing = None
+            self._routes = {}
+            self._keys_by_flight = {}
+            self._days = {}
+            self._day_versions = {}
+            self._destinations = {}
+            self._airports = {row[0]: AirportRecord(*row) for row in airports}
+            for row in rows:
+                self._add(_records_from_row(row), notify=False)
+            self._generation += 1
+            self._loaded = True
+            self._notify(None, None)
+
+    def ensure_loaded(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self.rebuild()
+        elif self._sync_due():
+            self.sync()
+
+    def _sync_due(self):
+        return time.monotonic() - self._synced_at >= TIMETABLE_SYNC_SECONDS
+
+    # --- Changes made by other processes ---
+
+    def publish(self, flight_ids):
+        """
+        Tell every process that these flights changed (or ALL_FLIGHTS, or AIRPORTS).
+        Call once the change has committed. This process re-reads them on its next
+        sync too, which repairs a sync that read a row just before the change.
+        """
+        change = flight_ids if flight_ids in (ALL_FLIGHTS, AIRPORTS) else sorted(set(flight_ids))
+        while True:
+            try:
+                number = cache.incr(CHANGES_KEY)
+            except ValueError:
+                cache.add(CHANGES_KEY, 0, None)
+                continue
+            # A cache without atomic increments (the file cache) can hand two writers one number.
+            if cache.add(_change_key(number), change, TIMETABLE_CHANGE_SECONDS):
+                return number
+
+    def sync(self):
+        """Apply the changes published since the last sync."""
+        if not self._loaded or not self._sync_lock.acquire(blocking=False):
+            # Not loaded yet, or another thread is already catching up.
+            return
+        try:
+            self._synced_at = time.monotonic()
+            latest = cache.get(CHANGES_KEY, 0)
+            if latest == self._seen:
+                return
+            if latest < self._seen or latest - self._seen > TIMETABLE_MAX_REPLAY:
+                # The counter was lost from the cache, or there is too much to replay.
+                self.rebuild()
+                return
+            numbers = range(self._seen + 1, latest + 1)
+            found = cache.get_many([_change_key(number) for number in numbers])
+            flight_ids, airports, applied = set(), False, self._seen
+            for number in numbers:
+                change = found.get(_change_key(number))
+                if change is None:
+                    # Not written yet, or lost: wait a little, then stop trusting the log.
+                    since = self._missing[1] if self._missing and self._missing[0] == number else time.monotonic()
+                    if time.monotonic() - since > MISSING_CHANGE_SECONDS:
+                        self.rebuild()
+                        return
+                    self._missing = (number, since)
+                    break
+                if change == ALL_FLIGHTS:
+                    self.rebuild()
+                    return
+                if change == AIRPORTS:
+                    airports = True
+                else:
+                    flight_ids.update(change)
+                applied = number
+            else:
+                self._missing = None
+            self._reload(flight_ids, airports)
+            self._seen = applied
+        finally:
+            self._sync_lock.release()
+
+    def _reload(self, flight_ids, airports):
+        rows = {}
+        flight_ids = sorted(flight_ids)
+        with primary():
+            for start in range(0, len(flight_ids), 500):
+                rows.update(
+                    (row[0], row) for row in
+                    Flight.objects.filter(pk__in=flight_ids[start:start + 500]).values_list(*FLIGHT_FIELDS)
+                )
+            if airports:
+                airports = Airport.objects.values_list('airport_code', 'airport_name', 'location')
+                airports = {row[0]: AirportRecord(*row) for row in airports}
+        with self._lock:
+            for flight_id in flight_ids:
+                self._remove(flight_id)
+                if flight_id in rows:
+                    self._add(_records_from_row(rows[flight_id]))
+            if airports:
+                self._airports = airports
+                self._notify(None, None)
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded = False
+
+    def update_flight(self, flight_id):
+        if not self._loaded:
+            return
+        row = Flight.objects.filter(pk=flight_id).values_list(*FLIGHT_FIELDS).first()
+        with self._lock:
+            self._remove(flight_id)
+            if row is not None:
+                self._add(_records_from_row(row))
+
+    def remove_flight(self, flight_id):
+        with self._lock:
+            self._remove(flight_id)
+
+    def adjust_seats(self, flight_id, seat_class, delta):
+        # Mirrors an inventory.py UPDATE without re-reading the row.
+        with self._lock:
+            keys = self._keys_by_flight.get(flight_id)
+            if not keys:
+                return
+            records = tuple(
+                record._replace(seats=record.seats + delta) if record.seat_class == seat_class else record
+                for record in self._days[keys[0][1]][flight_id]
+            )
+            self._remove(flight_id)
+            self._add(records)
+
+    def update_airport(self, airport_code):
+        if not self._loaded:
+            return
+        row = Airport.objects.filter(pk=airport_code).values_list(
+            'airport_code', 'airport_name', 'location').first()
+        with self._lock:
+            if row is None:
+                self._airports.pop(airport_code, None)
+            else:
+                self._airports[airport_code] = AirportRecord(*row)
+            self._notify(None, None)
+
+    def add_listener(self, listener):
+        """
+        Call listener(origin, destination) after every change to that route, or
+        listener(None, None) when everything may have changed. Listeners run under
+        the index lock and must not call back into the index.
+        """
+        self._listeners.append(listener)
+
+    def _notify(self, origin, destination):
+        for listener in self._listeners:
+            listener(origin, destination)
+
+    def _add(self, records, notify=True):
+        keys = []
+        for record in records:
+            route_key = (record.departure_code, record.destination_code, record.seat_class)
+            day = departure_date(record.departure_time)
+            self._routes.setdefault(route_key, {}).setdefault(day, {})[record.flight_id] = record
+            keys.append((route_key, day))
+        self._keys_by_flight[records[0].flight_id] = keys
+        self._days.setdefault(day, {})[records[0].flight_id] = records
+        self._bump_day(day)
+        origin, destination = records[0].departure_code, records[0].destination_code
+        self._destinations.setdefault(origin, set()).add(destination)
+        if notify:
+            self._notify(origin, destination)
+
+    def _remove(self, flight_id):
+        keys = self._keys_by_flight.pop(flight_id, ())
+        for route_key, day in keys:
+            days = self._routes.get(route_key)
+            if days is None or day not in days:
+                continue
+            days[day].pop(flight_id, None)
+            if not days[day]:
+                del days[day]
+            if not days:
+                del self._routes[route_key]
+        if keys:
+            day = keys[0][1]
+            flights = self._days.get(day, {})
+            flights.pop(flight_id, None)
+            if not flights:
+                self._days.pop(day, None)
+            self._bump_day(day)
+            origin, destination, _ = keys[0][0]
+            if not any((origin, destination, seat_class) in self._routes for seat_class in SEAT_CLASSES):
+                self._destinations.get(origin, set()).discard(destination)
+            self._notify(origin, destination)
+
+    def _bump_day(self, day):
+        self._day_versions[day] = self._day_versions.get(day, 0) + 1
+
+    # --- Lookups ---
+
+    def airport(self, airport_code):
+        self.ensure_loaded()
+        return self._airports.get(airport_code)
+
+    def airports(self):
+        self.ensure_loaded()
+        with self._lock:
+            return list(self._airports.values())
+
+    def destinations_from(self, origin):
+        self.ensure_loaded()
+        with self._lock:
+            return set(self._destinations.get(origin, ()))
+
+    def route_records(self, origin, destination, seat_class):
+        """Every record on a route in one class, across all departure dates."""
+        self.ensure_loaded()
+        with self._lock:
+            days = self._routes.get((origin, destination, seat_class), {})
+            return [record for bucket in days.values() for record in bucket.values()]
+
+    def flights_on(self, day):
+        """Return (economy_record, business_record) pairs for every flight departing on day."""
+        self.ensure_loaded()
+        with self._lock:
+            return list(self._days.get(day, {}).values())
+
+    def day_version(self, day):
+        # Changes whenever a flight departing on day is added, removed or updated.
+        return (self._generation, self._day_versions.get(day, 0))
+
+    def search(self, origin=None, destination=None, seat_class='ECONOMY', passengers=1, on_date=None):
+        self.ensure_loaded()
+        if seat_class not in SEAT_CLASSES:
+            seat_class = 'ECONOMY'
+        results = []
+        with self._lock:
+            if origin and destination:
+                route_keys = [(origin, destination, seat_class)]
+            else:
+                route_keys = [
+                    key for key in self._routes
+                    if key[2] == seat_class
+                    and (not origin or key[0] == origin)
+                    and (not destination or key[1] == destination)
+                ]
+            for route_key in route_keys:
+                days = self._routes.get(route_key)
+                if not days:
+                    continue
+                buckets = [days.get(on_date, {})] if on_date else days.values()
+                for bucket in buckets:
+                    results.extend(r for r in bucket.values() if r.seats >= passengers)
+        results.sort(key=lambda r: (r.departure_time, r.flight_id))
+        return results
+
+
+timetable = TimetableIndex()
@@ -7,6 +7,8 @@ urlpatterns = [
     # Core pages
     path('', views.home_page, name='home_page'),
     path('search/', views.search_results, name='search_results'),
+    path('api/search/', views.search_api_view, name='search_api'),
+    path('api/airports/suggest/', views.airport_suggest_api_view, name='airport_suggest_api'),
 
     # OLD Authentication URLs
     path('login/', views.login_view, name='login'),
@@ -17,6 +19,7 @@ urlpatterns = [
     path('register/step-2/', views.register_step2, name='register_step2'),
     path('register/step-3/', views.register_step3, name='register_step3'),
     path('register/photo-upload/', views.register_step4_photo, name='register_step4_photo'),
+    path('api/register/check/', views.register_check_api_view, name='register_check_api'),
 
     # Passenger authenticated pages
     path('dashboard/', views.dashboard_view, name='dashboard'),
@@ -29,14 +32,22 @@ urlpatterns = [
     path('payment/success/<int:booking_id>/', views.payment_success_view, name='payment_success'),
     path('booking/ticket/<int:ticket_id>/', views.view_ticket_view, name='view_ticket'),
     path('booking/invoice/<int:invoice_id>/', views.view_invoice_view, name='view_invoice'),
+    path('documents/<slug:digest>.<str:extension>', views.document_view, name='document'),
     path('booking/cancel/<int:booking_id>/', views.cancel_booking_view, name='cancel_booking'),
 
     # Review pages
     path('flight/<int:flight_id>/', views.flight_detail_view, name='flight_detail'),
     path('flight/<int:flight_id>/review/', views.add_review_view, name='add_review'),
-    path('explorer/results/', views.explorer_results_view, name='explorer_results'),
+    path('explorer/', views.explorer_view, name='explorer_view'),
     path('explorer/results/', views.explorer_results_view, name='explorer_results'),
     path('api/price-map/', views.price_map_api_view, name='price_map_api'),
+    path('api/price-map/layer/', views.price_map_layer_view, name='price_map_layer'),
+    path('api/fare-calendar/', views.fare_calendar_api_view, name='fare_calendar_api'),
+    path('api/connections/', views.connections_api_view, name='connections_api'),
     path('price-map/', views.price_map_view, name='price_map_view'),
 
+    # Operations
+    path('metrics', views.metrics_view, name='metrics'),
+    path('metrics/json/', views.metrics_json_view, name='metrics_json'),
+
 ]
\ No newline at end of file
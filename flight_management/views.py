@@ -1,69 +1,164 @@
 # flight_management/views.py
 
+import uuid
+from datetime import timedelta
 from decimal import Decimal
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect
-from django.db.models import Q
 from django.contrib.auth import authenticate, login, logout
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.hashers import make_password
-from django.db import transaction
-from django.http import JsonResponse # Add this import
-from django.db.models import Min # Add this import
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse # Add this import
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import condition
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.http import quote_etag
 
 # Import all models and forms
 from .models import (
-    Flight, Airport, Booking, Payment, Ticket, Invoice, Cancellation,
-    Review, User, PassengerProfile
+    Flight, Booking, Payment, Ticket, Invoice, Cancellation,
+    Review, User, PassengerProfile, BookingSummary
 )
 from .forms import (
     ReviewForm, CustomLoginForm, UserUpdateForm, ProfileUpdateForm,
     RegistrationStep1Form, RegistrationStep2Form, RegistrationStep3Form, PhotoUploadForm
 )
+from . import documents
+from .availability import accounts
+from .confirmation import confirm_booking
+from .fares import destination_fares, fare_calendar, fare_matrix
+from .geo import DETAIL_LEVELS, price_map_layers
+from .holds import SEAT_HOLD_MINUTES, hold_expired, hold_expires_at, release_expired_holds
+from .inventory import release_seats, reserve_seats
+from .metrics import registry
+from .pagination import keyset_page
+from .ratings import summaries_for
+from .reference import reference
+from .routing import connection_search
+from .suggest import airport_suggestions
+from .timetable import timetable
 
 
 # === GUEST AND CORE VIEWS ===
 
 def home_page(request):
-    airports = Airport.objects.all()
-    context = {'airports': airports}
-    return render(request, 'home.html', context)
+    # The airport pickers fill themselves from airport_suggest_api_view as the user types.
+    return render(request, 'home.html')
+
+
+async def airport_suggest_api_view(request):
+    """?q=...: [{code, name, location}, ...] for an airport picker, most served airports first."""
+    index = await airport_suggestions.acurrent()
+    results = [
+        {'code': airport.airport_code, 'name': airport.airport_name, 'location': airport.location}
+        for airport in index.suggest(request.GET.get('q', '')[:100])
+    ]
+    response = JsonResponse({'results': results})
+    response['Cache-Control'] = 'public, max-age=300'
+    return response
 
 
-def search_results(request):
+async def search_results(request):
     departure_code = request.GET.get('departure_airport')
     destination_code = request.GET.get('destination_airport')
     num_adults = request.GET.get('num_adults', 1)
     num_children = request.GET.get('num_children', 0)
     num_infants = request.GET.get('num_infants', 0)
     seat_class = request.GET.get('seat_class', 'ECONOMY').upper()
-    total_passengers = int(num_adults) + int(num_children)
-
-    query = Q()
-    if departure_code: query &= Q(departure_airport__airport_code=departure_code)
-    if destination_code: query &= Q(destination_airport__airport_code=destination_code)
-
-    flights = Flight.objects.filter(query)
-
-    # Filter flights by seat availability based on class
-    if seat_class == 'BUSINESS':
-        flights = flights.filter(business_seats__gte=total_passengers)
-    else:  # Default to Economy
-        flights = flights.filter(economy_seats__gte=total_passengers)
+    try:
+        total_passengers = int(num_adults) + int(num_children)
+        on_date = parse_date(request.GET.get('departure_date') or '')
+    except ValueError:
+        return HttpResponse('Invalid passenger count or date.', status=400)
+
+    # Served from the in-memory timetable and reference data; no ORM round-trips on this page.
+    airports = (await reference.acurrent()).airports
+    # A timetable read can reload or catch up from the database, which must not run on the event loop.
+    flights = await sync_to_async(timetable.search)(
+        origin=departure_code, destination=destination_code, seat_class=seat_class,
+        passengers=total_passengers, on_date=on_date,
+    )
 
     context = {
         'flights': flights,
-        'departure_airport': Airport.objects.get(airport_code=departure_code) if departure_code else None,
-        'destination_airport': Airport.objects.get(airport_code=destination_code) if destination_code else None,
+        'departure_airport': airports.get(departure_code),
+        'destination_airport': airports.get(destination_code),
         'num_adults': num_adults,
         'num_children': num_children,
         'num_infants': num_infants,
         'seat_class': seat_class,
         'total_passengers': total_passengers,
     }
-    return render(request, 'search_results.html', context)
+    # Rendering reads the session and the lazy user, which are sync-only.
+    return await sync_to_async(render)(request, 'search_results.html', context)
+
+
+
+# Fields a client may request from the search API, by name.
+SEARCH_API_FIELDS = {
+    'flight_id': lambda f, seat_class: f.flight_id,
+    'airline': lambda f, seat_class: f.airline.airline_name,
+    'airline_code': lambda f, seat_class: f.airline_id,
+    'departure_airport': lambda f, seat_class: f.departure_airport.airport_code,
+    'departure_location': lambda f, seat_class: f.departure_airport.location,
+    'destination_airport': lambda f, seat_class: f.destination_airport.airport_code,
+    'destination_location': lambda f, seat_class: f.destination_airport.location,
+    'departure_time': lambda f, seat_class: f.departure_time,
+    'arrival_time': lambda f, seat_class: f.arrival_time,
+    'price': lambda f, seat_class: f.business_price if seat_class == 'BUSINESS' else f.economy_price,
+    'seats': lambda f, seat_class: f.business_seats if seat_class == 'BUSINESS' else f.economy_seats,
+    'economy_price': lambda f, seat_class: f.economy_price,
+    'economy_seats': lambda f, seat_class: f.economy_seats,
+    'business_price': lambda f, seat_class: f.business_price,
+    'business_seats': lambda f, seat_class: f.business_seats,
+}
+SEARCH_API_DEFAULT_FIELDS = (
+    'flight_id', 'airline', 'departure_airport', 'destination_airport',
+    'departure_time', 'arrival_time', 'price', 'seats',
+)
 
 
+def search_api_view(request):
+    departure_code = request.GET.get('departure_airport')
+    destination_code = request.GET.get('destination_airport')
+    seat_class = request.GET.get('seat_class', 'ECONOMY').upper()
+    fields = [f for f in request.GET.get('fields', '').split(',') if f] or list(SEARCH_API_DEFAULT_FIELDS)
+    unknown = [f for f in fields if f not in SEARCH_API_FIELDS]
+    if unknown:
+        return JsonResponse({'error': f"Unknown field(s): {', '.join(unknown)}."}, status=400)
+    try:
+        total_passengers = int(request.GET.get('num_adults', 1)) + int(request.GET.get('num_children', 0))
+        limit = max(1, min(int(request.GET.get('limit', 20)), 100))
+        on_date = parse_date(request.GET.get('departure_date') or '')
+    except ValueError:
+        return JsonResponse({'error': 'Invalid passenger count, limit or date.'}, status=400)
+
+    flights = Flight.objects.select_related('airline', 'departure_airport', 'destination_airport')
+    if departure_code: flights = flights.filter(departure_airport_id=departure_code)
+    if destination_code: flights = flights.filter(destination_airport_id=destination_code)
+    if on_date: flights = flights.filter(departure_time__date=on_date)
+    if seat_class == 'BUSINESS':
+        flights = flights.filter(business_seats__gte=total_passengers)
+    else:
+        flights = flights.filter(economy_seats__gte=total_passengers)
+
+    try:
+        page, next_cursor = keyset_page(flights, ('departure_time', 'flight_id'), request.GET.get('cursor'), limit)
+    except (ValueError, ValidationError):
+        return JsonResponse({'error': 'Invalid cursor.'}, status=400)
+    return JsonResponse({
+        'results': [{name: SEARCH_API_FIELDS[name](flight, seat_class) for name in fields} for flight in page],
+        'next_cursor': next_cursor,
+    })
+
 # === AUTHENTICATION AND REGISTRATION VIEWS ===
 
 def login_view(request):
@@ -101,6 +196,18 @@ def register_step1(request):
     return render(request, 'register_step1.html', {'form': form})
 
 
+def register_check_api_view(request):
+    """?username=...&email=...: {field: available} for each value given, as the sign-up forms type."""
+    result = {}
+    username = request.GET.get('username', '').strip()
+    if username:
+        result['username'] = not accounts.username_taken(username)
+    email = request.GET.get('email', '').strip()
+    if email:
+        result['email'] = not accounts.email_taken(email)
+    return JsonResponse(result)
+
+
 def register_step2(request):
     if 'step1_data' not in request.session: return redirect('register_step1')
     if request.method == 'POST':
@@ -136,10 +243,23 @@ def register_step4_photo(request):
             step1 = request.session['step1_data']
             step2 = request.session['step2_data']
             step3 = request.session['step3_data']
-            user = User.objects.create(
-                username=step3['username'], password=step3['password'],
-                first_name=step1['first_name'], last_name=step1['last_name'], email=step1['email']
-            )
+            # Email has no unique constraint, so look again now that the account is about to exist.
+            if step1['email'] and User.objects.filter(email__iexact=step1['email']).exists():
+                for key in ('step1_data', 'step2_data', 'step3_data'):
+                    request.session.pop(key, None)
+                messages.error(request, 'An account with that email address was created while you were registering.')
+                return redirect('register_step1')
+            try:
+                with transaction.atomic():
+                    user = User.objects.create(
+                        username=step3['username'], password=step3['password'],
+                        first_name=step1['first_name'], last_name=step1['last_name'], email=step1['email']
+                    )
+            except IntegrityError:
+                # Someone else registered the name after step 3 checked it.
+                del request.session['step3_data']
+                messages.error(request, 'That username was taken while you were registering. Please choose another.')
+                return redirect('register_step3')
             PassengerProfile.objects.create(
                 user=user, phone_number=step2['phone_number'], address=step2['address'],
                 gender=step2.get('gender'), profile_photo=form.cleaned_data.get('profile_photo')
@@ -158,7 +278,8 @@ def register_step4_photo(request):
 
 @login_required
 def dashboard_view(request):
-    bookings = Booking.objects.filter(user=request.user).order_by('-booking_date')
+    # One query against the BookingSummary read model instead of walking relations per booking.
+    bookings = BookingSummary.objects.filter(user=request.user).order_by('-booking_date')
     context = {'bookings': bookings}
     return render(request, 'dashboard.html', context)
 
@@ -195,27 +316,26 @@ def book_flight_view(request, flight_id):
 
     if seat_class == 'BUSINESS':
         price_per_person = flight.business_price
-        seats_available = flight.business_seats
     else:
         price_per_person = flight.economy_price
-        seats_available = flight.economy_seats
 
     total_passengers = adults + children
     total_fare = price_per_person * total_passengers
 
     if request.method == 'POST':
-        if seats_available >= total_passengers:
-            booking = Booking.objects.create(
-                user=request.user, flight=flight, seat_class=seat_class,
-                num_adults=adults, num_children=children, num_infants=infants,
-                total_fare=total_fare, status='PENDING'
-            )
-            if seat_class == 'BUSINESS':
-                flight.business_seats -= total_passengers
+        with transaction.atomic():
+            # The conditional decrement is the availability check; it cannot oversell.
+            if reserve_seats(flight.pk, seat_class, total_passengers):
+                booking = Booking.objects.create(
+                    user=request.user, flight=flight, seat_class=seat_class,
+                    num_adults=adults, num_children=children, num_infants=infants,
+                    total_fare=total_fare, status='PENDING'
+                )
             else:
-                flight.economy_seats -= total_passengers
-            flight.save()
-            messages.success(request, 'Booking created. Please proceed to payment.')
+                booking = None
+        if booking is not None:
+            messages.success(request, f'Booking created. Your seats are held for {SEAT_HOLD_MINUTES} minutes; '
+                                      f'please proceed to payment.')
             return redirect('payment', booking_id=booking.pk)
         else:
             messages.error(request, 'Seats are no longer available. Please try another flight.')
@@ -233,17 +353,25 @@ def book_flight_view(request, flight_id):
 def payment_view(request, booking_id):
     booking = Booking.objects.get(pk=booking_id, user=request.user)
     total_amount = booking.total_fare
+    if hold_expired(booking):
+        release_expired_holds(booking_ids=[booking.pk])
+        messages.error(request, 'Your seat hold has expired and the seats were released. Please book again.')
+        return redirect('dashboard')
     if request.method == 'POST':
-        payment = Payment.objects.create(
-            booking=booking, amount=total_amount, method='Credit Card (Simulated)'
-        )
-        booking.status = 'CONFIRMED'
-        booking.save()
-        Ticket.objects.create(booking=booking)
-        Invoice.objects.create(payment=payment)
-        messages.success(request, 'Payment successful! Your flight is confirmed.')
+        key = request.headers.get('Idempotency-Key') or request.POST.get('idempotency_key')
+        if key and len(key) > 64: key = None
+        # One transaction for the status, payment, ticket and invoice; a retried POST is a no-op.
+        payment, created = confirm_booking(booking, idempotency_key=key)
+        if payment is None:
+            messages.error(request, 'This booking can no longer be paid.')
+            return redirect('dashboard')
+        if created:
+            messages.success(request, 'Payment successful! Your flight is confirmed.')
         return redirect('payment_success', booking_id=booking.pk)
-    context = {'booking': booking, 'total_amount': total_amount}
+    context = {
+        'booking': booking, 'total_amount': total_amount, 'hold_expires_at': hold_expires_at(booking),
+        'idempotency_key': uuid.uuid4().hex,
+    }
     return render(request, 'payment.html', context)
 
 
@@ -254,35 +382,55 @@ def payment_success_view(request, booking_id):
     return render(request, 'payment_success.html', context)
 
 
+def _document_redirect(request, kind, pk):
+    # Tickets and invoices are pre-rendered files; resolving one is a cache lookup.
+    entry = documents.lookup(kind, pk, request.user.pk)
+    if entry is None:
+        raise Http404
+    extension = 'pdf' if request.GET.get('format') == 'pdf' and entry['pdf'] else 'html'
+    return redirect('document', digest=entry[extension], extension=extension)
+
+
 @login_required
 def view_ticket_view(request, ticket_id):
-    ticket = Ticket.objects.get(pk=ticket_id, booking__user=request.user)
-    context = {'ticket': ticket}
-    return render(request, 'ticket.html', context)
+    return _document_redirect(request, 'ticket', ticket_id)
 
 
 @login_required
 def view_invoice_view(request, invoice_id):
-    invoice = Invoice.objects.get(pk=invoice_id, payment__booking__user=request.user)
-    context = {'invoice': invoice}
-    return render(request, 'invoice.html', context)
+    return _document_redirect(request, 'invoice', invoice_id)
+
+
+@login_required
+def document_view(request, digest, extension):
+    # Files live under the owner's id, so another user's digest is simply not found.
+    if extension not in documents.CONTENT_TYPES:
+        raise Http404
+    try:
+        response = FileResponse(
+            open(documents.document_path(request.user.pk, digest, extension), 'rb'),
+            content_type=documents.CONTENT_TYPES[extension],
+        )
+    except FileNotFoundError:
+        raise Http404
+    # The name is the content's hash: a changed booking gets a new URL, never new bytes at this one.
+    response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    response['ETag'] = f'"{digest}"'
+    return response
 
 
 @login_required
 def cancel_booking_view(request, booking_id):
     try:
         booking = Booking.objects.get(pk=booking_id, user=request.user)
-        if booking.status == 'CONFIRMED':
-            flight = booking.flight
-            if booking.seat_class == 'BUSINESS':
-                flight.business_seats += booking.total_passengers
-            else:
-                flight.economy_seats += booking.total_passengers
-            flight.save()
-            booking.status = 'CANCELLED'
-            booking.save()
-            refund_amount = booking.payment.amount * Decimal('0.90')
-            Cancellation.objects.create(booking=booking, refund_amount=refund_amount)
+        with transaction.atomic():
+            # Flip the status conditionally so a double-submitted cancel releases seats once.
+            cancelled = Booking.objects.filter(pk=booking.pk, status='CONFIRMED').update(status='CANCELLED')
+            if cancelled:
+                release_seats(booking.flight_id, booking.seat_class, booking.total_passengers)
+                refund_amount = booking.payment.amount * Decimal('0.90')
+                Cancellation.objects.create(booking=booking, refund_amount=refund_amount)
+        if cancelled:
             messages.success(request, 'Your booking has been successfully cancelled.')
         else:
             messages.error(request, 'This booking cannot be cancelled.')
@@ -291,11 +439,27 @@ def cancel_booking_view(request, booking_id):
     return redirect('dashboard')
 
 
-def flight_detail_view(request, flight_id):
-    flight = Flight.objects.get(pk=flight_id)
-    reviews = Review.objects.filter(flight=flight).order_by('-review_date')
-    context = {'flight': flight, 'reviews': reviews}
-    return render(request, 'flight_detail.html', context)
+REVIEWS_PER_PAGE = 20
+
+
+async def flight_detail_view(request, flight_id):
+    try:
+        flight = await Flight.objects.select_related(
+            'airline', 'departure_airport', 'destination_airport').aget(pk=flight_id)
+    except Flight.DoesNotExist:
+        raise Http404('Flight not found.')
+    # One page of reviews, newest first, and the counters ratings.py keeps: the same
+    # cost for a flight with thousands of reviews as for one with none.
+    reviews = Review.objects.filter(flight_id=flight_id).select_related('user')
+    try:
+        reviews, next_cursor = await sync_to_async(keyset_page)(
+            reviews, ('review_date', 'review_id'), request.GET.get('cursor'), REVIEWS_PER_PAGE, descending=True,
+        )
+    except (ValueError, ValidationError):
+        return HttpResponse('Invalid cursor.', status=400)
+    ratings = await sync_to_async(summaries_for)(flight)
+    context = {'flight': flight, 'reviews': reviews, 'next_cursor': next_cursor, 'ratings': ratings}
+    return await sync_to_async(render)(request, 'flight_detail.html', context)
 
 
 @login_required
@@ -310,7 +474,9 @@ def add_review_view(request, flight_id):
             review = form.save(commit=False)
             review.user = request.user
             review.flight = flight
-            review.save()
+            # The rating counters are updated by the Review signal, in this same transaction.
+            with transaction.atomic():
+                review.save()
             messages.success(request, 'Your review has been submitted.')
             return redirect('flight_detail', flight_id=flight.pk)
     else:
@@ -320,9 +486,7 @@ def add_review_view(request, flight_id):
 
 
 def explorer_view(request):
-    airports = Airport.objects.all()
-    context = {'airports': airports}
-    return render(request, 'explorer_view.html', context)
+    return render(request, 'explorer_view.html')
 
 
 def explorer_results_view(request):
@@ -334,19 +498,21 @@ def explorer_results_view(request):
         messages.error(request, 'Please select a departure airport and provide a budget.')
         return redirect('explorer_view')
 
-    base_query = Flight.objects.filter(departure_airport__airport_code=departure_code)
-    if seat_class == 'BUSINESS':
-        affordable_flights = base_query.filter(business_price__lte=max_budget)
-    else:
-        affordable_flights = base_query.filter(economy_price__lte=max_budget)
+    departure_airport = timetable.airport(departure_code)
+    try:
+        budget = Decimal(max_budget)
+    except ArithmeticError:
+        budget = None
+    if departure_airport is None or budget is None or not budget.is_finite():
+        messages.error(request, 'Please select a departure airport and provide a budget.')
+        return redirect('explorer_view')
 
-    distinct_destinations = affordable_flights.order_by('destination_airport', 'economy_price').distinct(
-        'destination_airport')
-    flights_to_show = affordable_flights.filter(pk__in=[flight.pk for flight in distinct_destinations])
+    # Cheapest flight per destination, pre-sorted by fare: the budget is a binary search.
+    flights_to_show = destination_fares.under_budget(departure_code, seat_class, budget)
 
     context = {
         'flights': flights_to_show,
-        'departure_airport': Airport.objects.get(airport_code=departure_code),
+        'departure_airport': departure_airport,
         'max_budget': max_budget,
         'seat_class': seat_class,
     }
@@ -354,32 +520,111 @@ def explorer_results_view(request):
 
 
 def price_map_view(request):
-    airports = Airport.objects.all()
-    context = {'airports': airports}
-    return render(request, 'price_map.html', context)
+    return render(request, 'price_map.html')
 
 
-def price_map_api_view(request):
+async def price_map_api_view(request):
     origin_airport_code = request.GET.get('origin')
     if not origin_airport_code:
         return JsonResponse({'error': 'Origin airport code is required.'}, status=400)
 
-    cheapest_flights = Flight.objects.filter(
-        departure_airport__airport_code=origin_airport_code
-    ).values(
-        'destination_airport__location'
-    ).annotate(
-        min_price=Min('economy_price')
+    # Precomputed in fares.py from the timetable, which may have to reload: off the event loop.
+    etag, body = await sync_to_async(fare_matrix.payload)(
+        origin_airport_code, request.GET.get('seat_class', 'ECONOMY').upper(),
+    )
+    etag = quote_etag(etag)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+
+def _price_map_layer_params(request):
+    detail = request.GET.get('detail', 'medium')
+    if detail not in DETAIL_LEVELS: detail = 'medium'
+    return request.GET.get('origin'), request.GET.get('seat_class', 'ECONOMY').upper(), detail
+
+
+def _price_map_layer_etag(request):
+    origin_airport_code, seat_class, detail = _price_map_layer_params(request)
+    if origin_airport_code:
+        return f'{detail}-{fare_matrix.prices(origin_airport_code, seat_class)[0]}'
+    return None
+
+
+@condition(etag_func=_price_map_layer_etag)
+def price_map_layer_view(request):
+    origin_airport_code, seat_class, detail = _price_map_layer_params(request)
+    if not origin_airport_code:
+        return JsonResponse({'error': 'Origin airport code is required.'}, status=400)
+
+    # Simplified TopoJSON country outlines with the cheapest fares already joined in (see geo.py).
+    fare_etag, prices = fare_matrix.prices(origin_airport_code, seat_class)
+    raw, compressed = price_map_layers.layer(detail, fare_etag, prices)
+    if 'gzip' in request.headers.get('Accept-Encoding', ''):
+        response = HttpResponse(compressed, content_type='application/json')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(raw, content_type='application/json')
+    patch_vary_headers(response, ('Accept-Encoding',))
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+def fare_calendar_api_view(request):
+    origin_airport_code = request.GET.get('origin')
+    destination_airport_code = request.GET.get('destination')
+    if not origin_airport_code or not destination_airport_code:
+        return JsonResponse({'error': 'Origin and destination airport codes are required.'}, status=400)
+    try:
+        start = parse_date(request.GET.get('start') or '') or timezone.localdate()
+        days = int(request.GET.get('days', 30))
+        calendar = fare_calendar.calendar(origin_airport_code, destination_airport_code, start, days)
+    except ValueError:
+        return JsonResponse({
+            'error': f'Invalid start date, or days outside {fare_calendar.min_days}-{fare_calendar.max_days}.',
+        }, status=400)
+    return JsonResponse({
+        'origin': origin_airport_code,
+        'destination': destination_airport_code,
+        'calendar': calendar,
+    })
+
+
+def connections_api_view(request):
+    origin_airport_code = request.GET.get('origin')
+    destination_airport_code = request.GET.get('destination')
+    if not origin_airport_code or not destination_airport_code:
+        return JsonResponse({'error': 'Origin and destination airport codes are required.'}, status=400)
+    try:
+        day = parse_date(request.GET.get('date') or '') or timezone.localdate()
+        # Connections can land the next day; that has to be a date too.
+        day + timedelta(days=1)
+        passengers = int(request.GET.get('passengers', 1))
+        max_connections = max(0, min(int(request.GET.get('max_connections', 2)), 2))
+    except (ValueError, OverflowError):
+        return JsonResponse({'error': 'Invalid date or passenger count.'}, status=400)
+    seat_class = request.GET.get('seat_class', 'ECONOMY').upper()
+
+    itineraries = connection_search.search(
+        origin_airport_code, destination_airport_code, day,
+        seat_class=seat_class, passengers=passengers, max_connections=max_connections,
     )
+    return JsonResponse({'date': day.isoformat(), 'seat_class': seat_class, 'itineraries': itineraries})
+
+
+# === OPERATIONS VIEWS ===
+
+def metrics_view(request):
+    # Prometheus scrape target, for bearers of METRICS_TOKEN only; closed while none is set.
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if not token or not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse(status=403)
+    return HttpResponse(registry.prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 
-    country_prices = {}
-    for flight in cheapest_flights:
-        try:
-            country = flight['destination_airport__location'].split(',')[-1].strip()
-            price = flight['min_price']
-            if country not in country_prices or price < country_prices[country]:
-                country_prices[country] = price
-        except (IndexError, AttributeError):
-            continue
-
-    return JsonResponse(country_prices)
\ No newline at end of file
+@staff_member_required
+def metrics_json_view(request):
+    return JsonResponse({'views': registry.snapshot()})
\ No newline at end of file
@@ -0,0 +1,29 @@
+// static/js/airport_suggest.js
+// Airport pickers that ask /api/airports/suggest/ as the user types instead of shipping every airport.
+
+function airportPicker(select, url) {
+    let ranking = {};
+    return new TomSelect(select, {
+        create: false,
+        valueField: 'code',
+        labelField: 'label',
+        searchField: [],
+        loadThrottle: 150,
+        shouldLoad: function (query) { return query.trim().length > 0; },
+        // Keep the server's popularity order, and show only the answer to the latest query.
+        score: function () { return function (item) { return ranking[item.code] || 0; }; },
+        load: function (query, callback) {
+            fetch(url + '?' + new URLSearchParams({q: query}))
+                .then(response => response.json())
+                .then(result => {
+                    ranking = {};
+                    result.results.forEach(function (airport, i) {
+                        ranking[airport.code] = result.results.length - i;
+                        airport.label = `${airport.location} (${airport.code})`;
+                    });
+                    callback(result.results);
+                })
+                .catch(() => callback());
+        },
+    });
+}
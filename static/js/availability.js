@@ -0,0 +1,24 @@
+// static/js/availability.js
+// Live "already taken" feedback on the sign-up forms; the forms still validate on submit.
+
+function watchAvailability(inputId, field, url) {
+    const input = document.getElementById(inputId);
+    if (!input) return;
+    const feedback = document.createElement('div');
+    feedback.className = 'invalid-feedback';
+    feedback.textContent = field === 'email' ? 'An account with this email address already exists.' : 'This username is taken.';
+    input.insertAdjacentElement('afterend', feedback);
+    let timer, latest = 0;
+    input.addEventListener('input', function () {
+        clearTimeout(timer);
+        const value = input.value.trim();
+        if (!value) { input.classList.remove('is-invalid'); return; }
+        timer = setTimeout(async function () {
+            const request = ++latest;
+            const response = await fetch(url + '?' + new URLSearchParams({[field]: value}));
+            if (!response.ok || request !== latest) return;
+            const result = await response.json();
+            input.classList.toggle('is-invalid', result[field] === false);
+        }, 300);
+    });
+}